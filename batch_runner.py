@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 21:10
+# @Author  : 周启航-开发
+# @File    : batch_runner.py
+"""
+批量执行 JSONL 中的行程请求
+
+逐行读取输入（不一次性载入内存），以固定并发度交给异步工作流执行，
+每个请求完成后立即追加一行结果到输出 JSONL。输出文件同时作为断点：
+重新运行时跳过已有结果的行，崩溃后可以从中断处继续。
+
+    python batch_runner.py requests.jsonl -o results.jsonl --concurrency 16
+    python batch_runner.py requests.jsonl -o results.jsonl --retry-failed   # 重跑失败的行
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing_extensions import Iterator, Optional, Tuple
+
+# 输入行中依次尝试的请求文本字段和请求ID字段
+TEXT_FIELDS = ("request", "message", "content", "body", "text")
+ID_FIELDS = ("id", "request_id")
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+
+def iter_requests(path: Path, text_field: Optional[str] = None) -> Iterator[Tuple[int, str, str]]:
+    """
+    惰性读取输入文件
+
+    每行可以是JSON对象（从 text_field 或常见字段中取请求文本）、JSON字符串或纯文本。
+
+    Yields:
+        (行号, 请求ID, 请求文本)，无法取到请求文本的行以空文本产出，由调用方记为错误
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = line
+            if isinstance(record, str):
+                yield line_no, str(line_no), record
+                continue
+            if not isinstance(record, dict):
+                yield line_no, str(line_no), ""
+                continue
+            fields = (text_field,) if text_field else TEXT_FIELDS
+            text = next((record[name] for name in fields if isinstance(record.get(name), str)), "")
+            request_id = next((str(record[name]) for name in ID_FIELDS if record.get(name) is not None), str(line_no))
+            yield line_no, request_id, text
+
+
+def load_checkpoint(output_path: Path, retry_failed: bool = False) -> set:
+    """
+    从已有输出中读取已完成的行号
+
+    末尾不完整的行（进程在写入时崩溃）会被忽略，并在继续写入前补齐换行。
+    retry_failed 时先重写输出文件，只保留每行最后一条状态为 ok 的结果，
+    重跑的行写入新结果后输出中不会出现同一行的新旧两条记录。
+    """
+    done = set()
+    if not output_path.exists():
+        return done
+    with open(output_path, "rb") as f:
+        data = f.read()
+    kept = {}
+    for raw in data.splitlines():
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            continue
+        if retry_failed and record.get("status") != "ok":
+            kept.pop(record.get("line"), None)
+            continue
+        done.add(record.get("line"))
+        kept[record.get("line")] = raw
+    if retry_failed:
+        done = set(kept)
+        # 先写临时文件再替换，重写过程中崩溃不会损坏原有输出
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.writelines(raw + b"\n" for raw in kept.values())
+        os.replace(tmp_path, output_path)
+    elif data and not data.endswith(b"\n"):
+        with open(output_path, "ab") as f:
+            f.write(b"\n")
+    return done
+
+
+def status_from_result(result: dict) -> str:
+    """
+    ok：生成了预订；deadline_exceeded：超出时间预算，返回了部分结果；
+    missing_fields：请求中缺少乘客姓名等预订必需的信息；failed：工作流返回了错误提示
+    """
+    if booking_from_result(result):
+        return "ok"
+    if result.get("deadline_exceeded"):
+        return "deadline_exceeded"
+    messages = result.get("researcher_messages") or []
+    if messages and getattr(messages[-1], "tool_call_id", None) == "booking_missing_fields":
+        return "missing_fields"
+    return "failed"
+
+
+def booking_from_result(result: dict) -> Optional[dict]:
+    messages = result.get("researcher_messages") or []
+    if not messages or getattr(messages[-1], "tool_call_id", None) != "booking_complete":
+        return None
+    try:
+        return json.loads(messages[-1].content)
+    except (TypeError, ValueError):
+        return None
+
+
+async def _invoke(text: str, use_sync_graph: bool, timeout: Optional[float] = None) -> dict:
+    from langchain_core.messages import HumanMessage
+    from deadline import deadline_after, deadline_config
+    from supervisor_agent import get_researcher_agent, get_async_researcher_agent
+
+    inputs = {"researcher_messages": [HumanMessage(content=text)]}
+    # 工作流在截止时间前返回部分结果，外层的 wait_for 只是兜底
+    config = deadline_config(deadline=deadline_after(timeout))
+    if use_sync_graph:
+        return await asyncio.to_thread(get_researcher_agent().invoke, inputs, config)
+    return await get_async_researcher_agent().ainvoke(inputs, config)
+
+
+async def _process(line_no: int, request_id: str, text: str, timeout: Optional[float], use_sync_graph: bool) -> dict:
+    record = {"line": line_no, "id": request_id}
+    started = time.perf_counter()
+    try:
+        if not text:
+            raise ValueError("输入行中没有请求文本")
+        result = await asyncio.wait_for(_invoke(text, use_sync_graph, timeout), timeout)
+        booking = booking_from_result(result)
+        last_message = (result.get("researcher_messages") or [None])[-1]
+        record.update({
+            "status": status_from_result(result),
+            "request_id": result.get("request_id"),
+            "booking": booking,
+            "detail": None if booking else getattr(last_message, "content", None),
+            "task_results": result.get("task_results", {}),
+        })
+    except asyncio.TimeoutError:
+        record.update({"status": "error", "error": f"超时（{timeout}s）"})
+    except Exception as e:
+        record.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    record["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_batch(input_path: Path, output_path: Path, concurrency: int = BATCH_CONCURRENCY,
+                    timeout: Optional[float] = None, retry_failed: bool = False,
+                    use_sync_graph: bool = False, text_field: Optional[str] = None) -> dict:
+    """
+    批量执行输入文件中的请求
+
+    读取协程把请求放入容量为 2*concurrency 的队列，队列满时暂停读取（背压）；
+    concurrency 个工作协程从队列取请求执行，结果由单个写入协程按完成顺序追加到输出文件。
+
+    Args:
+        input_path: 输入 JSONL 文件
+        output_path: 输出 JSONL 文件，同时作为断点
+        concurrency: 同时执行的请求数
+        timeout: 单个请求的超时（秒），None 表示不限
+        retry_failed: 是否重跑输出中状态不是 ok 的行
+        use_sync_graph: 在线程中执行同步工作流，而不是异步工作流
+        text_field: 请求文本字段名，默认依次尝试 TEXT_FIELDS
+
+    Returns:
+        汇总统计
+    """
+    done = load_checkpoint(output_path, retry_failed)
+    work_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    result_queue: asyncio.Queue = asyncio.Queue()
+    skipped = 0
+
+    async def produce():
+        nonlocal skipped
+        for line_no, request_id, text in iter_requests(input_path, text_field):
+            if line_no in done:
+                skipped += 1
+                continue
+            await work_queue.put((line_no, request_id, text))
+        for _ in range(concurrency):
+            await work_queue.put(None)
+
+    async def work():
+        while True:
+            item = await work_queue.get()
+            if item is None:
+                return
+            await result_queue.put(await _process(*item, timeout=timeout, use_sync_graph=use_sync_graph))
+
+    latencies, statuses = [], {}
+
+    async def write():
+        with open(output_path, "a", encoding="utf-8") as f:
+            while True:
+                record = await result_queue.get()
+                if record is None:
+                    return
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                # 每条结果立即落盘，崩溃时最多丢失正在执行的请求
+                f.flush()
+                latencies.append(record["latency_ms"])
+                statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+
+    started = time.perf_counter()
+    writer = asyncio.create_task(write())
+    await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    await result_queue.put(None)
+    await writer
+    elapsed = time.perf_counter() - started
+
+    processed = len(latencies)
+    return {
+        "processed": processed,
+        "skipped": skipped,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "max": max(latencies),
+            "mean": round(statistics.mean(latencies), 1),
+        } if latencies else {},
+    }
+
+
+def print_summary(summary: dict):
+    print(f"处理 {summary['processed']} 条（跳过已完成 {summary['skipped']} 条），"
+          f"耗时 {summary['elapsed_s']}s，吞吐 {summary['throughput_rps']} 条/秒")
+    print("状态: " + ", ".join(f"{status}={count}" for status, count in sorted(summary["statuses"].items())))
+    if summary["latency_ms"]:
+        latency = summary["latency_ms"]
+        print(f"延迟 ms: p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} "
+              f"max={latency['max']} mean={latency['mean']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="批量执行 JSONL 中的行程请求")
+    parser.add_argument("input", type=Path, help="输入 JSONL 文件")
+    parser.add_argument("-o", "--output", type=Path, help="输出 JSONL 文件，默认为 <输入>.results.jsonl")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--timeout", type=float, default=None, help="单个请求的超时（秒）")
+    parser.add_argument("--retry-failed", action="store_true", help="重跑输出中失败的行")
+    parser.add_argument("--sync", action="store_true", help="在线程中执行同步工作流")
+    parser.add_argument("--field", help="请求文本所在的字段名")
+    args = parser.parse_args(argv)
+
+    output = args.output or args.input.with_suffix(".results.jsonl")
+    summary = asyncio.run(run_batch(args.input, output, max(1, args.concurrency), args.timeout,
+                                    args.retry_failed, args.sync, args.field))
+    print_summary(summary)
+    print(f"结果已写入 {output}")
+    return 0 if not summary["statuses"].get("error") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
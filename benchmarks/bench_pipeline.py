@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 19:30
+# @Author  : 周启航-开发
+# @File    : bench_pipeline.py
+"""
+研究员 Agent 基准测试
+
+使用确定性的大模型和航班接口替身，分别测量端到端和单节点的耗时、
+每个请求的大模型调用次数、HTTP调用次数和内存分配峰值。
+
+    python -m benchmarks.bench_pipeline                       # 运行并打印结果
+    python -m benchmarks.bench_pipeline --save                # 保存为基线
+    python -m benchmarks.bench_pipeline --check               # 与基线对比，退化时返回非0
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.fakes import (FakeChatModel, FakeFlightServer, LatencyModel,
+                              install_fakes, prepare_environment, reset_caches)
+
+prepare_environment()
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+import supervisor_agent  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "pipeline.json"
+FAST_PATH_REQUEST = "帮我预订十月二十号从北京去武汉的机票和酒店，住两晚，我的名字是王伟"
+LLM_PLANNER_REQUEST = "下个月找个时间带家人出去玩几天，机票酒店都帮我安排好，我的名字是王伟"
+
+
+def _inputs(request: str) -> dict:
+    return {"researcher_messages": [HumanMessage(content=request)]}
+
+
+def _planned_state(request: str) -> dict:
+    state = _inputs(request)
+    state.update(supervisor_agent.planning_agent_node(state))
+    return state
+
+
+def _executed_state(request: str) -> dict:
+    state = _planned_state(request)
+    state.update(supervisor_agent.plan_execution_node(state))
+    return state
+
+
+def build_scenarios() -> dict:
+    """场景名 -> (准备函数, 被测函数)；准备阶段不计入耗时和调用次数"""
+    return {
+        "e2e_fast_path": (lambda: _inputs(FAST_PATH_REQUEST), supervisor_agent.get_researcher_agent().invoke),
+        "e2e_llm_planner": (lambda: _inputs(LLM_PLANNER_REQUEST), supervisor_agent.get_researcher_agent().invoke),
+        "e2e_async_fast_path": (lambda: _inputs(FAST_PATH_REQUEST),
+                                lambda state: asyncio.run(supervisor_agent.get_async_researcher_agent().ainvoke(state))),
+        "node_planning_agent_node": (lambda: _inputs(FAST_PATH_REQUEST), supervisor_agent.planning_agent_node),
+        "node_plan_execution": (lambda: _planned_state(FAST_PATH_REQUEST), supervisor_agent.plan_execution_node),
+        "node_book_flight_and_hotel": (lambda: _executed_state(FAST_PATH_REQUEST),
+                                       supervisor_agent.book_flight_and_hotel),
+    }
+
+
+def _percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_scenario(prepare, target, model: FakeChatModel, server: FakeFlightServer, iterations: int) -> dict:
+    """冷缓存下重复执行场景，返回耗时分位数、平均调用次数和内存分配峰值"""
+    wall_ms, llm_calls, http_calls = [], [], []
+    for _ in range(iterations):
+        reset_caches()
+        state = prepare()
+        model.calls.reset()
+        server.calls.reset()
+        started = time.perf_counter()
+        target(state)
+        wall_ms.append((time.perf_counter() - started) * 1000)
+        llm_calls.append(model.calls.count)
+        http_calls.append(server.calls.count)
+
+    # 内存分配单独测一次，避免 tracemalloc 的开销影响耗时数据
+    reset_caches()
+    state = prepare()
+    tracemalloc.start()
+    target(state)
+    _, peak = tracemalloc.get_traced_memory()
+    allocated_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "p50_ms": round(statistics.median(wall_ms), 3),
+        "p95_ms": round(_percentile(wall_ms, 0.95), 3),
+        "mean_ms": round(statistics.mean(wall_ms), 3),
+        "llm_calls_per_request": statistics.mean(llm_calls),
+        "http_calls_per_request": statistics.mean(http_calls),
+        "peak_alloc_kb": round(peak / 1024, 1),
+        "live_blocks": allocated_blocks,
+    }
+
+
+def run_benchmarks(iterations: int, llm_latency_ms: float, flight_latency_ms: float, distribution: str,
+                   only: list = None) -> dict:
+    model = FakeChatModel(latency=LatencyModel(llm_latency_ms, distribution))
+    server = FakeFlightServer(latency=LatencyModel(flight_latency_ms, distribution, seed=17)).start()
+    install_fakes(model, server)
+    results = {}
+    try:
+        for name, (prepare, target) in build_scenarios().items():
+            if only and name not in only:
+                continue
+            # 业务代码中的 print 会拖慢测量，这里统一丢弃
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[name] = run_scenario(prepare, target, model, server, iterations)
+    finally:
+        server.stop()
+    return {
+        "config": {"iterations": iterations, "llm_latency_ms": llm_latency_ms,
+                   "flight_latency_ms": flight_latency_ms, "distribution": distribution},
+        "scenarios": results,
+    }
+
+
+def check_against_baseline(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    与基线对比
+
+    调用次数不允许超过基线；p50 耗时允许超过基线 tolerance 比例（另加 2ms 抖动余量）。
+
+    Returns:
+        退化描述列表，为空表示通过
+    """
+    regressions = []
+    for name, expected in baseline.get("scenarios", {}).items():
+        actual = report["scenarios"].get(name)
+        if actual is None:
+            continue
+        for field in ("llm_calls_per_request", "http_calls_per_request"):
+            if actual[field] > expected[field]:
+                regressions.append(f"{name}: {field} {expected[field]} -> {actual[field]}")
+        limit = expected["p50_ms"] * (1 + tolerance) + 2
+        if actual["p50_ms"] > limit:
+            regressions.append(f"{name}: p50_ms {expected['p50_ms']} -> {actual['p50_ms']} (上限 {limit:.1f})")
+    return regressions
+
+
+def print_report(report: dict):
+    header = f"{'scenario':<28}{'p50 ms':>10}{'p95 ms':>10}{'llm/req':>9}{'http/req':>10}{'peak KB':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, result in report["scenarios"].items():
+        print(f"{name:<28}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+              f"{result['llm_calls_per_request']:>9.2f}{result['http_calls_per_request']:>10.2f}"
+              f"{result['peak_alloc_kb']:>10.1f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="研究员 Agent 基准测试")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--flight-latency-ms", type=float, default=30)
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--scenario", action="append", help="只运行指定场景，可重复")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="将结果保存为基线")
+    parser.add_argument("--check", action="store_true", help="与基线对比，退化时返回非0")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="p50 耗时允许的相对退化比例")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.iterations, args.llm_latency_ms, args.flight_latency_ms,
+                            args.distribution, args.scenario)
+    print_report(report)
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"基线已保存到 {args.baseline}")
+
+    if args.check:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("config") != report["config"]:
+            print("警告：当前配置与基线配置不同，对比结果仅供参考")
+        regressions = check_against_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("性能退化：")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("与基线对比通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
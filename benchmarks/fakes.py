@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 19:00
+# @Author  : 周启航-开发
+# @File    : fakes.py
+"""确定性的大模型和航班接口替身，用于基准测试和压测，不访问任何外部服务"""
+import asyncio
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from langchain_core.messages import AIMessage
+
+
+class LatencyModel:
+    """
+    可配置的延迟分布
+
+    Args:
+        mean_ms: 平均延迟（毫秒）
+        distribution: fixed（固定值）、uniform（0.5~1.5倍均匀分布）或 lognormal（长尾分布）
+        seed: 随机种子，保证多次运行的延迟序列一致
+    """
+
+    def __init__(self, mean_ms: float = 0.0, distribution: str = "fixed", seed: int = 7):
+        self.mean_ms = mean_ms
+        self.distribution = distribution
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """返回一次延迟（秒）"""
+        if self.mean_ms <= 0:
+            return 0.0
+        with self._lock:
+            if self.distribution == "uniform":
+                value = self._random.uniform(0.5, 1.5) * self.mean_ms
+            elif self.distribution == "lognormal":
+                # sigma=0.5 时均值为 exp(mu + 0.125)，据此反推 mu
+                value = self._random.lognormvariate(0, 0.5) * self.mean_ms / 1.1331
+            else:
+                value = self.mean_ms
+        return value / 1000
+
+
+class CallCounter:
+    """线程安全的调用计数器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def increment(self):
+        with self._lock:
+            self.count += 1
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+
+
+class FakeChatModel:
+    """
+    确定性的聊天模型替身
+
+    根据提示词内容返回规划器、酒店查询和批量规范化的固定格式回复，
+    支持 invoke/ainvoke/stream/with_structured_output，并统计调用次数。
+    """
+
+    def __init__(self, latency: LatencyModel = None, error_rate: float = 0.0, seed: int = 11):
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.calls = CallCounter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _maybe_fail(self):
+        if self.error_rate <= 0:
+            return
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise RuntimeError("fake llm: 429 Too Many Requests")
+
+    def _reply(self, messages) -> str:
+        from prompts import planning_prompt
+        from fast_planner import build_plan, extract_itinerary
+
+        text = messages[-1].content
+        if messages[0].content == planning_prompt:
+            # 与真实规划器一样只使用请求中给出的乘客姓名
+            name = re.search(r"我的名字是([^，。,\s]+)", text)
+            itinerary = extract_itinerary(text) or {
+                "origin": "北京", "destination": "武汉", "date": "2025-10-20",
+                "nights": 2, "need_hotel": True, "passenger_name": name.group(1) if name else "",
+            }
+            return json.dumps(build_plan(itinerary), ensure_ascii=False)
+        if "酒店清单" in text:
+            return json.dumps([{"name": "全季酒店", "price_per_night": 300},
+                               {"name": "亚朵酒店", "price_per_night": 420}], ensure_ascii=False)
+        return "2025-10-20"
+
+    def invoke(self, messages, *args, **kwargs):
+        self.calls.increment()
+        time.sleep(self.latency.sample())
+        self._maybe_fail()
+        return AIMessage(content=self._reply(messages))
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        self.calls.increment()
+        await asyncio.sleep(self.latency.sample())
+        self._maybe_fail()
+        return AIMessage(content=self._reply(messages))
+
+    def stream(self, messages, *args, **kwargs):
+        self.calls.increment()
+        self._maybe_fail()
+        reply = self._reply(messages)
+        # 总延迟平均分摊到每个分片，模拟逐token生成
+        chunks = [reply[i:i + 16] for i in range(0, len(reply), 16)]
+        delay = self.latency.sample() / max(1, len(chunks))
+        for chunk in chunks:
+            time.sleep(delay)
+            yield AIMessage(content=chunk)
+
+    def bind_tools(self, *args, **kwargs):
+        return self
+
+    def with_structured_output(self, schema):
+        return _FakeStructuredModel(self, schema)
+
+
+class _FakeStructuredModel:
+    """批量规范化的结构化输出替身：日期返回固定日期，城市返回 XXX"""
+
+    _ITEM_RE = re.compile(r'id="(\d+)" kind="(\w+)" text="([^"]*)"')
+
+    def __init__(self, parent: FakeChatModel, schema):
+        self.parent = parent
+        self.schema = schema
+
+    def _build(self, messages):
+        from state import NormalizedItem
+        items = self._ITEM_RE.findall(messages[-1].content)
+        return self.schema(items=[NormalizedItem(id=item_id, value="2025-10-20" if kind == "date" else "XXX")
+                                  for item_id, kind, _ in items])
+
+    def invoke(self, messages, *args, **kwargs):
+        self.parent.calls.increment()
+        time.sleep(self.parent.latency.sample())
+        self.parent._maybe_fail()
+        return self._build(messages)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        self.parent.calls.increment()
+        await asyncio.sleep(self.parent.latency.sample())
+        self.parent._maybe_fail()
+        return self._build(messages)
+
+
+class FakeFlightServer:
+    """
+    本地航班接口替身，返回与真实接口结构一致的JSON
+
+    Args:
+        latency: 每次请求的延迟分布
+        error_rate: 返回 503 的概率
+        offers: 每次查询返回的航班数
+    """
+
+    def __init__(self, latency: LatencyModel = None, error_rate: float = 0.0, offers: int = 20, seed: int = 13):
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.offers = offers
+        self.calls = CallCounter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/flight/query"
+
+    def _flights(self, departure: str, arrival: str, date: str) -> list:
+        airlines = [("CA", "中国国际航空公司"), ("MU", "中国东方航空"), ("CZ", "中国南方航空"), ("HU", "海南航空")]
+        flights = []
+        for index in range(self.offers):
+            code, name = airlines[index % len(airlines)]
+            hour = 6 + index * 16 // max(1, self.offers)
+            flights.append({
+                "airline": code, "airlineName": name, "flightNo": f"{code}{8200 + index}",
+                "departure": departure, "departureName": f"{departure}机场",
+                "departureDate": date, "departureTime": f"{hour:02d}:{(index * 7) % 60:02d}",
+                "arrival": arrival, "arrivalName": f"{arrival}机场",
+                "arrivalDate": date, "arrivalTime": f"{hour + 2:02d}:{(index * 7) % 60:02d}",
+                "duration": f"02h{(index * 5) % 60:02d}m", "transferNum": index % 2,
+                "ticketPrice": 480 + (index * 37) % 400, "segments": [],
+            })
+        return flights
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.calls.increment()
+                time.sleep(server.latency.sample())
+                with server._lock:
+                    failed = server._random.random() < server.error_rate
+                if failed:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                query = parse_qs(urlparse(self.path).query)
+                body = json.dumps({"result": {"flightInfo": server._flights(
+                    query.get("departure", [""])[0], query.get("arrival", [""])[0],
+                    query.get("departureDate", [""])[0])}}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeFlightServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def prepare_environment():
+    """在导入业务模块之前调用：补齐必要的环境变量，并把学习到的IATA别名写到临时目录"""
+    os.environ.setdefault("SILICON_API_KEY", "fake-key")
+    # 每个请求的业务日志会干扰测量和输出，只保留错误
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ.setdefault("SILICON_BASE_URL", "http://127.0.0.1:9/v1")
+    # 默认不加载本地酒店库存，压测使用示例库存以保持与基线一致
+    os.environ.setdefault("HOTEL_INVENTORY_PATH", os.path.join(os.path.dirname(__file__), "fixtures", "hotels.csv"))
+    os.environ.setdefault("IATA_LEARNED_ALIASES_PATH",
+                          os.path.join(tempfile.gettempdir(), "minicascade_bench_aliases.json"))
+
+
+def install_fakes(model: FakeChatModel, flight_server: FakeFlightServer):
+    """将共享的大模型客户端和航班接口地址替换为替身"""
+    import utils
+    from providers import registry
+
+    registry.override("chat_model", model)
+    utils.flight_api_url = flight_server.url
+
+
+def reset_caches():
+    """清空进程内缓存，保证每次测量都是冷启动路径"""
+    import utils
+    import supervisor_agent
+    from cache import ResultCache, InMemoryBackend, build_flight_cache
+
+    utils._flight_cache = build_flight_cache()
+    supervisor_agent._plan_cache = ResultCache(InMemoryBackend(max_entries=supervisor_agent.PLAN_CACHE_MAX_ENTRIES),
+                                               ttl=supervisor_agent.PLAN_CACHE_TTL, stale_ttl=0)
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 16:40
+# @Author  : 周启航-开发
+# @File    : load_test.py
+"""
+研究员 Agent 压测
+
+使用可注入延迟和错误率的大模型、航班接口替身，按固定并发（闭环）或固定到达速率（开环，泊松到达）
+驱动工作流，逐档输出吞吐、错误率、端到端耗时和排队等待的 p50/p95/p99，以及每个节点、工具、
+大模型和 HTTP 调用的耗时分位数，最后打印吞吐-并发曲线，用于确定工作池规模和发现并发退化。
+
+    python -m benchmarks.load_test --concurrency 1,2,4,8,16             # 闭环，同步工作流
+    python -m benchmarks.load_test --target async --concurrency 8,32    # 闭环，异步工作流
+    python -m benchmarks.load_test --mode open --rate 5,10,20,40        # 开环，每秒到达数
+    python -m benchmarks.load_test --target pool --workers 2 --worker-concurrency 4 --queue-depth 8
+    python -m benchmarks.load_test --llm-error-rate 0.05 --flight-error-rate 0.05 --json report.json
+    python -m benchmarks.load_test --mode open --rate 40 --deadline-ms 300 --llm-latency-ms 200
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.fakes import (FakeChatModel, FakeFlightServer, LatencyModel,
+                              install_fakes, prepare_environment, reset_caches)
+
+prepare_environment()
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+import supervisor_agent  # noqa: E402
+from batch_runner import status_from_result  # noqa: E402
+from deadline import deadline_after, deadline_config  # noqa: E402
+from instrumentation import InMemorySpanExporter, add_span_exporter, remove_span_exporter  # noqa: E402
+
+_CITIES = ["北京", "上海", "广州", "深圳", "成都", "武汉", "杭州", "西安"]
+_NIGHTS = ["一", "两", "三"]
+_SPAN_KINDS = ("node", "tool", "llm", "http")
+
+
+def build_requests(distinct: int, llm_share: float, seed: int) -> list:
+    """
+    生成请求文本池
+
+    快速路径请求按航线、日期和晚数组合出 distinct 个不同文本，控制缓存命中率；
+    llm_share 比例的请求无法被本地规则解析，走大模型规划。
+
+    Returns:
+        [(类型, 请求文本)]
+    """
+    rng = random.Random(seed)
+    fast, planner = [], []
+    for index in range(max(1, distinct)):
+        origin, destination = rng.sample(_CITIES, 2)
+        fast.append(f"帮我预订十月{20 + index % 10}号从{origin}去{destination}的机票和酒店，"
+                    f"住{_NIGHTS[index % len(_NIGHTS)]}晚，我的名字是王伟")
+        planner.append(f"下个月找个时间带家人出去玩几天，机票酒店都帮我安排好，预算{3000 + index * 100}元，我的名字是王伟")
+    return [("llm_planner", rng.choice(planner)) if rng.random() < llm_share else ("fast_path", rng.choice(fast))
+            for _ in range(max(1, distinct) * 4)]
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _summary_ms(values: list) -> dict:
+    return {"p50_ms": round(_percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 2)}
+
+
+class GraphTarget:
+    """
+    被压测的调用方式
+
+    sync 在线程池中调用同步工作流，async 在事件循环中调用异步工作流，
+    pool 通过 serving.WorkerPool（进程内后端）提交，与 HTTP 服务的准入控制和排队一致。
+    deadline 为每个请求从到达起的时间预算（秒），None 时使用 REQUEST_DEADLINE_SECONDS。
+    """
+
+    def __init__(self, kind: str, slots: int, workers: int = 1, worker_concurrency: int = 1, queue_depth: int = 0,
+                 deadline: float = None):
+        self.kind = kind
+        self.slots = slots
+        self.deadline = deadline
+        self._executor = None
+        self._semaphore = None
+        self._pool = None
+        if kind == "sync":
+            self._graph = supervisor_agent.get_researcher_agent()
+            self._executor = ThreadPoolExecutor(max_workers=slots, thread_name_prefix="load")
+        elif kind == "async":
+            self._graph = supervisor_agent.get_async_researcher_agent()
+        else:
+            from serving import WorkerPool
+
+            self._pool = WorkerPool(backend="inprocess", workers=workers, concurrency=worker_concurrency,
+                                    max_queue_depth=queue_depth).start()
+
+    def _run_sync(self, text: str, arrived: float, deadline) -> dict:
+        started = time.perf_counter()
+        try:
+            status = status_from_result(self._graph.invoke({"researcher_messages": [HumanMessage(content=text)]},
+                                                           deadline_config(deadline=deadline)))
+        except Exception as e:
+            status = f"error:{type(e).__name__}"
+        return {"status": status, "queue_wait": started - arrived}
+
+    async def call(self, text: str, arrived: float) -> dict:
+        """执行一个请求，返回 status 和 queue_wait（到达后等待执行的秒数）"""
+        # 截止时间从到达时开始计算，排队等待也消耗预算
+        deadline = deadline_after(self.deadline)
+        if self.kind == "sync":
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._run_sync, text, arrived,
+                                                                    deadline)
+        if self.kind == "async":
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.slots)
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await self._graph.ainvoke({"researcher_messages": [HumanMessage(content=text)]},
+                                                       deadline_config(deadline=deadline))
+                    status = status_from_result(result)
+                except Exception as e:
+                    status = f"error:{type(e).__name__}"
+            return {"status": status, "queue_wait": started - arrived}
+        from serving import QueueFullError
+
+        try:
+            _, future = self._pool.submit(text, deadline=deadline)
+        except QueueFullError:
+            return {"status": "rejected", "queue_wait": 0.0}
+        result = await asyncio.wrap_future(future)
+        status = result["status"] if result["status"] != "error" else f"error:{result['error'].split(':')[0]}"
+        return {"status": status, "queue_wait": result["queue_wait"]}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._pool is not None:
+            self._pool.drain()
+
+
+async def _closed_loop(target: GraphTarget, requests: list, concurrency: int, duration: float, rng) -> list:
+    deadline = time.perf_counter() + duration
+    records = []
+
+    async def client():
+        while time.perf_counter() < deadline:
+            kind, text = rng.choice(requests)
+            arrived = time.perf_counter()
+            record = await target.call(text, arrived)
+            record.update({"kind": kind, "latency": time.perf_counter() - arrived})
+            records.append(record)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return records
+
+
+async def _open_loop(target: GraphTarget, requests: list, rate: float, duration: float, rng) -> list:
+    """泊松到达：到达时间不受处理速度影响，处理不过来的请求在目标内部排队或被拒绝"""
+    started = time.perf_counter()
+    records, tasks = [], []
+
+    async def one(kind: str, text: str, arrived: float):
+        record = await target.call(text, arrived)
+        record.update({"kind": kind, "latency": time.perf_counter() - arrived})
+        records.append(record)
+
+    offset = rng.expovariate(rate)
+    while offset < duration:
+        delay = started + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind, text = rng.choice(requests)
+        tasks.append(asyncio.create_task(one(kind, text, started + offset)))
+        offset += rng.expovariate(rate)
+    await asyncio.gather(*tasks)
+    return records
+
+
+def summarize(records: list, spans: list, elapsed: float, llm_calls: int, http_calls: int) -> dict:
+    """汇总一档负载的结果"""
+    completed = [record for record in records if record["status"] != "rejected"]
+    ok = [record for record in records if record["status"] == "ok"]
+    statuses = {}
+    for record in records:
+        statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+    by_span = {}
+    for item in spans:
+        if item.kind in _SPAN_KINDS:
+            by_span.setdefault(f"{item.kind}:{item.name}", []).append(item.duration_seconds)
+    by_kind = {}
+    for record in completed:
+        by_kind.setdefault(record["kind"], []).append(record["latency"])
+    total = len(records)
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(completed) / elapsed, 2) if elapsed else 0.0,
+        "goodput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(1 - len(ok) / total, 4) if total else 0.0,
+        "statuses": statuses,
+        "latency": _summary_ms([record["latency"] for record in completed]),
+        "latency_by_request_kind": {kind: _summary_ms(values) for kind, values in sorted(by_kind.items())},
+        "queue_wait": _summary_ms([record["queue_wait"] for record in completed]),
+        "llm_calls_per_request": round(llm_calls / total, 2) if total else 0.0,
+        "http_calls_per_request": round(http_calls / total, 2) if total else 0.0,
+        "spans": {name: {"count": len(values), **_summary_ms(values)} for name, values in sorted(by_span.items())},
+    }
+
+
+def warm_up(requests: list):
+    """编译同步和异步工作流并加载机场索引、酒店库存，避免第一档包含冷启动耗时"""
+    inputs = {"researcher_messages": [HumanMessage(content=requests[0][1])]}
+    with open(os.devnull, "w", encoding="utf-8") as sink, contextlib.redirect_stdout(sink):
+        supervisor_agent.get_researcher_agent().invoke(inputs)
+        asyncio.run(supervisor_agent.get_async_researcher_agent().ainvoke(inputs))
+
+
+def run_level(args, mode: str, level: float, model: FakeChatModel, server: FakeFlightServer,
+              exporter: InMemorySpanExporter, requests: list) -> dict:
+    """在冷缓存下运行一档负载：闭环时 level 为并发数，开环时为每秒到达数"""
+    reset_caches()
+    exporter.clear()
+    model.calls.reset()
+    server.calls.reset()
+    slots = int(level) if mode == "closed" else args.max_in_flight
+    deadline = args.deadline_ms / 1000 if args.deadline_ms else None
+    target = GraphTarget(args.target, slots, args.workers, args.worker_concurrency, args.queue_depth, deadline)
+    rng = random.Random(args.seed)
+    # 业务代码中的 print 会拖慢测量，这里统一丢弃
+    with open(os.devnull, "w", encoding="utf-8") as sink, contextlib.redirect_stdout(sink):
+        started = time.perf_counter()
+        try:
+            if mode == "closed":
+                records = asyncio.run(_closed_loop(target, requests, int(level), args.duration, rng))
+            else:
+                records = asyncio.run(_open_loop(target, requests, level, args.duration, rng))
+            elapsed = time.perf_counter() - started
+        finally:
+            target.close()
+    return {"level": level, **summarize(records, exporter.get_finished_spans(), elapsed,
+                                        model.calls.count, server.calls.count)}
+
+
+def _parse_levels(value: str) -> list:
+    return [float(item) for item in value.split(",") if item.strip()]
+
+
+def print_level(mode: str, result: dict, show_spans: bool):
+    unit = "并发" if mode == "closed" else "到达/秒"
+    latency, queue_wait = result["latency"], result["queue_wait"]
+    print(f"[{unit} {result['level']:g}] 请求 {result['requests']}，吞吐 {result['throughput_rps']:.1f}/s，"
+          f"有效吞吐 {result['goodput_rps']:.1f}/s，错误率 {result['error_rate']:.1%}，状态 {result['statuses']}")
+    print(f"  端到端 p50/p95/p99 = {latency['p50_ms']:.1f}/{latency['p95_ms']:.1f}/{latency['p99_ms']:.1f} ms，"
+          f"排队 p50/p95/p99 = {queue_wait['p50_ms']:.1f}/{queue_wait['p95_ms']:.1f}/{queue_wait['p99_ms']:.1f} ms，"
+          f"每请求 LLM {result['llm_calls_per_request']:.2f} 次 / HTTP {result['http_calls_per_request']:.2f} 次")
+    if not show_spans:
+        return
+    for name, stats in result["spans"].items():
+        print(f"    {name:<36}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+              f"{stats['p99_ms']:>10.1f}")
+
+
+def print_curve(mode: str, levels: list):
+    """打印吞吐-负载曲线；吞吐增幅低于 10% 而 p95 仍在上升的第一档标记为饱和点"""
+    unit = "concurrency" if mode == "closed" else "arrival/s"
+    header = f"{unit:>12}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'err':>8}  throughput"
+    print(header)
+    print("-" * (len(header) + 30))
+    peak = max((result["throughput_rps"] for result in levels), default=0.0) or 1.0
+    saturated = False
+    for index, result in enumerate(levels):
+        marker = ""
+        if index and not saturated:
+            previous = levels[index - 1]
+            if (result["throughput_rps"] < previous["throughput_rps"] * 1.1
+                    and result["latency"]["p95_ms"] > previous["latency"]["p95_ms"]):
+                saturated, marker = True, "  <- 饱和"
+        bar = "#" * max(1, round(30 * result["throughput_rps"] / peak))
+        print(f"{result['level']:>12g}{result['throughput_rps']:>9.1f}{result['latency']['p50_ms']:>10.1f}"
+              f"{result['latency']['p95_ms']:>10.1f}{result['latency']['p99_ms']:>10.1f}"
+              f"{result['error_rate']:>8.1%}  {bar}{marker}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="研究员 Agent 压测")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed",
+                        help="closed：固定并发；open：固定到达速率（泊松到达）")
+    parser.add_argument("--concurrency", type=_parse_levels, default=[1, 2, 4, 8, 16], help="闭环并发档位，逗号分隔")
+    parser.add_argument("--rate", type=_parse_levels, default=[5, 10, 20, 40], help="开环每秒到达数档位，逗号分隔")
+    parser.add_argument("--duration", type=float, default=5, help="每档持续的秒数")
+    parser.add_argument("--target", choices=["sync", "async", "pool"], default="sync")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="开环时 sync/async 同时执行的请求上限")
+    parser.add_argument("--workers", type=int, default=2, help="pool：工作线程组数")
+    parser.add_argument("--worker-concurrency", type=int, default=4, help="pool：每组并发数")
+    parser.add_argument("--queue-depth", type=int, default=16, help="pool：排队上限，超出后拒绝")
+    parser.add_argument("--llm-share", type=float, default=0.2, help="走大模型规划的请求比例")
+    parser.add_argument("--distinct", type=int, default=64, help="不同请求文本的数量，越小缓存命中越多")
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--flight-latency-ms", type=float, default=30)
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--flight-error-rate", type=float, default=0.0)
+    parser.add_argument("--deadline-ms", type=float, default=0,
+                        help="每个请求的时间预算（毫秒），超出后返回部分结果并计为 deadline_exceeded")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--spans", action="store_true", help="打印每档的节点、工具、大模型和 HTTP 耗时分位数")
+    parser.add_argument("--json", type=Path, help="把完整结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    levels = args.concurrency if args.mode == "closed" else args.rate
+    model = FakeChatModel(latency=LatencyModel(args.llm_latency_ms, args.distribution), error_rate=args.llm_error_rate)
+    server = FakeFlightServer(latency=LatencyModel(args.flight_latency_ms, args.distribution, seed=17),
+                              error_rate=args.flight_error_rate).start()
+    install_fakes(model, server)
+    exporter = InMemorySpanExporter()
+    add_span_exporter(exporter)
+    requests = build_requests(args.distinct, args.llm_share, args.seed)
+    results = []
+    try:
+        warm_up(requests)
+        for level in levels:
+            result = run_level(args, args.mode, level, model, server, exporter, requests)
+            print_level(args.mode, result, args.spans)
+            results.append(result)
+    finally:
+        remove_span_exporter(exporter)
+        server.stop()
+
+    print()
+    print_curve(args.mode, results)
+    if args.json:
+        config = {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()}
+        args.json.write_text(json.dumps({"config": config, "levels": results}, ensure_ascii=False, indent=2) + "\n",
+                             encoding="utf-8")
+        print(f"结果已保存到 {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 20:50
+# @Author  : 周启航-开发
+# @File    : startup.py
+"""
+冷启动耗时报告
+
+在独立子进程中用 python -X importtime 导入业务模块，汇总导入耗时最多的模块，
+并分别测量首次编译工作流和首次创建大模型客户端的耗时。
+
+    python -m benchmarks.startup                              # 默认测量 supervisor_agent
+    python -m benchmarks.startup --module utils --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 子进程中在导入完成后执行，输出 "阶段 耗时ms"
+_FIRST_USE_PROBE = """
+import time
+import supervisor_agent
+started = time.perf_counter()
+supervisor_agent.get_researcher_agent()
+print("compile_graph", (time.perf_counter() - started) * 1000)
+started = time.perf_counter()
+supervisor_agent.get_chat_model()
+print("create_chat_model", (time.perf_counter() - started) * 1000)
+"""
+
+
+def _child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("SILICON_API_KEY", "fake-key")
+    env.setdefault("SILICON_BASE_URL", "http://127.0.0.1:9/v1")
+    return env
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    解析 -X importtime 的输出
+
+    Returns:
+        [(模块名, 自身耗时us, 累计耗时us)]，保持原始顺序
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        rows.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return rows
+
+
+def measure_import(module: str) -> list:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=_child_env(), capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+
+def measure_first_use() -> dict:
+    result = subprocess.run([sys.executable, "-c", _FIRST_USE_PROBE],
+                            cwd=ROOT, env=_child_env(), capture_output=True, text=True, check=True)
+    phases = {}
+    for line in result.stdout.splitlines():
+        name, _, value = line.partition(" ")
+        if name in ("compile_graph", "create_chat_model"):
+            phases[name] = float(value)
+    return phases
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="冷启动耗时报告")
+    parser.add_argument("--module", default="supervisor_agent", help="要测量导入耗时的模块")
+    parser.add_argument("--top", type=int, default=10, help="列出导入耗时最多的顶层包数")
+    args = parser.parse_args(argv)
+
+    rows = measure_import(args.module)
+    total = next((cumulative for name, _, cumulative in rows if name == args.module), 0)
+    print(f"import {args.module}: {total / 1000:.1f} ms")
+
+    # 按顶层包汇总各模块的自身耗时，累计耗时在嵌套导入时会重复计数
+    by_package = {}
+    for name, self_us, _ in rows:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    print(f"\n{'package':<32}{'self ms':>10}")
+    for name, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<32}{self_us / 1000:>10.1f}")
+
+    if args.module == "supervisor_agent":
+        print()
+        for phase, elapsed in measure_first_use().items():
+            print(f"首次 {phase}: {elapsed:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 22:30
+# @Author  : 周启航-开发
+# @File    : state_size.py
+"""
+测量每一步之后的图状态大小
+
+使用内存检查点在同一个会话（thread）中连续执行多轮请求，按检查点的序列化方式
+统计每个节点执行后的状态字节数，对比默认模式和紧凑模式（STATE_COMPACT）。
+
+    python -m benchmarks.state_size --turns 10
+"""
+import argparse
+import contextlib
+import io
+import sys
+
+from benchmarks.fakes import FakeChatModel, FakeFlightServer, install_fakes, prepare_environment, reset_caches
+
+prepare_environment()
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import InMemorySaver  # noqa: E402
+
+import compact_state  # noqa: E402
+import supervisor_agent  # noqa: E402
+from benchmarks.bench_pipeline import FAST_PATH_REQUEST  # noqa: E402
+
+
+def measure_session(compact: bool, turns: int) -> list:
+    """
+    Returns:
+        每轮的 (该轮各步骤中状态的最大字节数, 该轮结束时的消息数)
+    """
+    compact_state.STATE_COMPACT = compact
+    graph = supervisor_agent.build_researcher_graph(supervisor_agent.planning_agent_node,
+                                                    supervisor_agent.plan_execution_node,
+                                                    supervisor_agent.book_flight_and_hotel,
+                                                    checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "state-size"}}
+    rows = []
+    for _ in range(turns):
+        step_bytes, messages = [], 0
+        for state in graph.stream({"researcher_messages": [HumanMessage(content=FAST_PATH_REQUEST)]},
+                                  config=config, stream_mode="values"):
+            step_bytes.append(compact_state.measure_state_bytes(state))
+            messages = len(state.get("researcher_messages", []))
+        rows.append((max(step_bytes), messages))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="测量每一步之后的图状态大小")
+    parser.add_argument("--turns", type=int, default=10, help="同一会话中连续执行的轮数")
+    args = parser.parse_args(argv)
+
+    server = FakeFlightServer().start()
+    install_fakes(FakeChatModel(), server)
+    original = compact_state.STATE_COMPACT
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            reset_caches()
+            default_rows = measure_session(False, args.turns)
+            compact_rows = measure_session(True, args.turns)
+    finally:
+        compact_state.STATE_COMPACT = original
+        server.stop()
+
+    print(f"{'turn':>5}{'default bytes':>16}{'msgs':>6}{'compact bytes':>16}{'msgs':>6}")
+    for turn, ((default_bytes, default_msgs), (compact_bytes, compact_msgs)) in enumerate(
+            zip(default_rows, compact_rows), start=1):
+        print(f"{turn:>5}{default_bytes:>16}{default_msgs:>6}{compact_bytes:>16}{compact_msgs:>6}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
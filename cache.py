@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 14:45
+# @Author  : 周启航-开发
+# @File    : cache.py
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing_extensions import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+FLIGHT_CACHE_BACKEND = os.getenv("FLIGHT_CACHE_BACKEND", "memory")
+# docker-compose 中的 dragonfly 兼容 Redis 协议，映射在 6381 端口
+FLIGHT_CACHE_REDIS_URL = os.getenv("FLIGHT_CACHE_REDIS_URL", "redis://localhost:6381/0")
+FLIGHT_CACHE_TTL = float(os.getenv("FLIGHT_CACHE_TTL", "300"))
+FLIGHT_CACHE_STALE_TTL = float(os.getenv("FLIGHT_CACHE_STALE_TTL", "600"))
+FLIGHT_CACHE_MAX_ENTRIES = int(os.getenv("FLIGHT_CACHE_MAX_ENTRIES", "1024"))
+
+
+class InMemoryBackend:
+    """进程内缓存后端，超过容量时按LRU淘汰"""
+
+    def __init__(self, max_entries: int = FLIGHT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, stored_at: float, expire_seconds: float):
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisBackend:
+    """Redis 协议缓存后端（Redis/Dragonfly），过期由服务端负责，值以JSON存储"""
+
+    def __init__(self, client=None, url: str = FLIGHT_CACHE_REDIS_URL, prefix: str = "flight:"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        payload = self.client.get(self.prefix + key)
+        if payload is None:
+            return None
+        entry = json.loads(payload)
+        return entry["value"], entry["stored_at"]
+
+    def set(self, key: str, value: Any, stored_at: float, expire_seconds: float):
+        payload = json.dumps({"value": value, "stored_at": stored_at}, ensure_ascii=False)
+        self.client.set(self.prefix + key, payload, ex=max(1, int(expire_seconds)))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+
+class ResultCache:
+    """
+    带TTL和stale-while-revalidate的结果缓存
+
+    未过期的条目直接返回；过期但仍在 stale_ttl 窗口内的条目先返回旧值，
+    同时在后台线程刷新；超出窗口的条目视为未命中并同步计算。
+    """
+
+    def __init__(self, backend, ttl: float = FLIGHT_CACHE_TTL, stale_ttl: float = FLIGHT_CACHE_STALE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _store(self, key: str, value: Any):
+        self.backend.set(key, value, time.time(), self.ttl + self.stale_ttl)
+
+    def _store_if(self, key: str, value: Any, cacheable: Optional[Callable[[Any], bool]]):
+        if cacheable is None or cacheable(value):
+            self._store(key, value)
+
+    def _refresh(self, key: str, compute: Callable[[], Any], cacheable: Optional[Callable[[Any], bool]] = None):
+        try:
+            self._store_if(key, compute(), cacheable)
+            self._count("refreshes")
+        except Exception:
+            self._count("refresh_errors")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        读取缓存，未命中时调用 compute 计算并写入缓存
+
+        Args:
+            key: 缓存键
+            compute: 计算结果的函数，抛出的异常不会被缓存
+            cacheable: 判断结果能否写入缓存，返回 False 的结果只返回给本次调用方
+
+        Returns:
+            缓存或新计算的结果
+        """
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                self._count("hits")
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._count("stale_hits")
+                with self._lock:
+                    start_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start_refresh:
+                    self._refresh_executor.submit(self._refresh, key, compute, cacheable)
+                return value
+
+        self._count("misses")
+        value = compute()
+        self._store_if(key, value, cacheable)
+        return value
+
+    async def _arefresh(self, key: str, acompute: Callable[[], Awaitable[Any]],
+                        cacheable: Optional[Callable[[Any], bool]] = None):
+        try:
+            self._store_if(key, await acompute(), cacheable)
+            self._count("refreshes")
+        except Exception:
+            self._count("refresh_errors")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def aget_or_compute(self, key: str, acompute: Callable[[], Awaitable[Any]],
+                              cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """get_or_compute 的异步版本，后台刷新以任务形式运行在当前事件循环中"""
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                self._count("hits")
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._count("stale_hits")
+                with self._lock:
+                    start_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start_refresh:
+                    asyncio.get_running_loop().create_task(self._arefresh(key, acompute, cacheable))
+                return value
+
+        self._count("misses")
+        value = await acompute()
+        self._store_if(key, value, cacheable)
+        return value
+
+    def invalidate(self, key: str):
+        self.backend.delete(key)
+
+    def stats(self) -> Dict[str, float]:
+        """返回命中/未命中计数和命中率，用于评估缓存容量"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["evictions"] = self.backend.evictions
+        stats["hit_rate"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+def flight_cache_key(home: str, destination: str, date: str) -> str:
+    """航班缓存键：规范化后的出发/到达IATA代码和日期"""
+    return f"{home.strip().upper()}:{destination.strip().upper()}:{date.strip()}"
+
+
+def build_flight_cache() -> ResultCache:
+    """根据 FLIGHT_CACHE_BACKEND 环境变量创建航班查询缓存"""
+    if FLIGHT_CACHE_BACKEND == "redis":
+        backend = RedisBackend()
+    else:
+        backend = InMemoryBackend()
+    return ResultCache(backend)
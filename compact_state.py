@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 22:10
+# @Author  : 周启航-开发
+# @File    : compact_state.py
+import json
+import os
+from typing_extensions import List, Sequence
+
+from langchain_core.messages import BaseMessage, SystemMessage
+from langgraph.graph.message import add_messages
+
+# 紧凑状态模式：消息历史有上限，大的工具结果只在状态字段中保存一份，消息中只放引用
+STATE_COMPACT = os.getenv("STATE_COMPACT", "false").lower() == "true"
+# 紧凑模式下保留的最大消息数（含第一条用户请求和省略提示），至少为 3
+STATE_MAX_MESSAGES = int(os.getenv("STATE_MAX_MESSAGES", "12"))
+
+_TRIM_MARKER_ID = "compact-state-trimmed"
+
+
+def trim_messages_to_budget(messages: List[BaseMessage], budget: int) -> List[BaseMessage]:
+    """
+    将消息列表裁剪到 budget 条以内
+
+    保留第一条消息（用户请求）和最近的消息，中间被裁掉的部分用一条固定ID的系统消息代替，
+    其中记录累计省略的条数；重复裁剪时复用这条消息而不是再插入新的。
+    """
+    budget = max(3, budget)
+    if len(messages) <= budget:
+        return messages
+    head, rest = messages[:1], messages[1:]
+    omitted = 0
+    if rest and rest[0].id == _TRIM_MARKER_ID:
+        omitted = rest[0].additional_kwargs.get("omitted", 0)
+        rest = rest[1:]
+    keep = budget - 2
+    omitted += len(rest) - keep
+    marker = SystemMessage(content=f"（已省略 {omitted} 条较早的消息）", id=_TRIM_MARKER_ID,
+                           additional_kwargs={"omitted": omitted})
+    return head + [marker] + rest[len(rest) - keep:]
+
+
+def bounded_add_messages(left: Sequence[BaseMessage], right: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """add_messages 的有界版本：紧凑模式下合并后裁剪到 STATE_MAX_MESSAGES 条"""
+    merged = add_messages(left, right)
+    if not STATE_COMPACT:
+        return merged
+    return trim_messages_to_budget(merged, STATE_MAX_MESSAGES)
+
+
+def state_reference(field: str, value) -> str:
+    """
+    构造指向状态字段的引用，代替把整个结果复制进消息
+
+    Returns:
+        形如 {"$ref": "task_results", "keys": [...], "bytes": 1234} 的紧凑JSON字符串
+    """
+    reference = {"$ref": field, "bytes": len(dumps_compact(value).encode("utf-8"))}
+    if isinstance(value, dict):
+        reference["keys"] = list(value)[:20]
+    return dumps_compact(reference)
+
+
+def dumps_compact(value) -> str:
+    """不缩进、无多余空格的JSON序列化"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def measure_state_bytes(state: dict) -> int:
+    """按检查点使用的序列化方式计算状态的字节数"""
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    _, payload = JsonPlusSerializer().dumps_typed(dict(state))
+    return len(payload)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 13:40
+# @Author  : 周启航-开发
+# @File    : date_parser.py
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing_extensions import Dict, Optional
+
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+              "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_WEEKDAYS = {"一": 0, "二": 1, "三": 2, "四": 3, "五": 4, "六": 5, "日": 6, "天": 6, "末": 5,
+             "1": 0, "2": 1, "3": 2, "4": 3, "5": 4, "6": 5, "7": 6}
+_DAY_OFFSETS = {"今天": 0, "今日": 0, "明天": 1, "明日": 1, "后天": 2, "大后天": 3, "昨天": -1, "前天": -2}
+
+_NUM = r"[0-9零〇一二两三四五六七八九十]+"
+_ISO_RE = re.compile(r"^\s*(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*[日号]?\s*$")
+_MONTH_DAY_RE = re.compile(rf"^\s*(?:({_NUM})年)?\s*({_NUM})月\s*({_NUM})\s*[日号]?\s*$")
+_DAY_ONLY_RE = re.compile(rf"^\s*(本月|这个月|下个?月)?\s*({_NUM})\s*[日号]\s*$")
+_WEEK_RE = re.compile(r"^\s*(本|这|下下|下)?\s*(?:个)?\s*(?:周|星期|礼拜)([一二三四五六日天末1-7])\s*$")
+_DAYS_LATER_RE = re.compile(rf"^\s*({_NUM})\s*天\s*(?:以后|之后|后)\s*$")
+# 在整句中查找日期描述，顺序决定优先级（"大后天"需排在"后天"之前）
+_DATE_PHRASE_RE = re.compile(
+    r"\d{4}\s*[-/.年]\s*\d{1,2}\s*[-/.月]\s*\d{1,2}\s*[日号]?"
+    rf"|(?:{_NUM}年)?{_NUM}月{_NUM}[日号]?"
+    r"|大后天|今天|今日|明天|明日|后天"
+    r"|(?:下下|下|本|这)?个?(?:周|星期|礼拜)[一二三四五六日天末]"
+    rf"|{_NUM}天(?:以后|之后|后)"
+    rf"|(?:本月|这个月|下个?月)?{_NUM}[日号]"
+)
+
+
+def chinese_to_int(text: str) -> Optional[int]:
+    """
+    将阿拉伯数字或不超过三位的中文数字转换为整数
+
+    Args:
+        text: 数字字符串（如"20"、"二十"、"十五"、"二〇二五"）
+
+    Returns:
+        对应整数，无法识别时返回None
+    """
+    text = text.strip()
+    if text.isdigit():
+        return int(text)
+    if not text or any(ch not in _CN_DIGITS and ch not in "十百" for ch in text):
+        return None
+    # 逐位书写的年份，如"二〇二五"
+    if "十" not in text and "百" not in text:
+        value = 0
+        for ch in text:
+            value = value * 10 + _CN_DIGITS[ch]
+        return value
+    value, current = 0, 0
+    for ch in text:
+        if ch == "百":
+            value += (current or 1) * 100
+            current = 0
+        elif ch == "十":
+            value += (current or 1) * 10
+            current = 0
+        else:
+            current = _CN_DIGITS[ch]
+    return value + current
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_date_locally(date_description: str, today: Optional[date] = None) -> Optional[str]:
+    """
+    使用本地规则解析日期描述，不调用大模型
+
+    支持ISO日期、"十月二十号"/"10月20日"这类月日写法、今天/明天/后天、
+    本周/下周加星期几以及"N天后"等描述。
+
+    Args:
+        date_description: 日期描述
+        today: 参考日期，默认为当天
+
+    Returns:
+        标准日期格式 YYYY-MM-DD，规则无法识别时返回None
+    """
+    if not date_description:
+        return None
+    today = today or datetime.now().date()
+    text = date_description.strip()
+
+    match = _ISO_RE.match(text)
+    if match:
+        parsed = _safe_date(*(int(part) for part in match.groups()))
+        return parsed.isoformat() if parsed else None
+
+    if text in _DAY_OFFSETS:
+        return (today + timedelta(days=_DAY_OFFSETS[text])).isoformat()
+
+    match = _MONTH_DAY_RE.match(text)
+    if match:
+        year_text, month_text, day_text = match.groups()
+        year = chinese_to_int(year_text) if year_text else today.year
+        if year is not None and year < 100:
+            year += 2000
+        parsed = _safe_date(year, chinese_to_int(month_text), chinese_to_int(day_text))
+        return parsed.isoformat() if parsed else None
+
+    match = _DAY_ONLY_RE.match(text)
+    if match:
+        prefix, day_text = match.groups()
+        year, month = today.year, today.month
+        if prefix and prefix.startswith("下"):
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        parsed = _safe_date(year, month, chinese_to_int(day_text))
+        return parsed.isoformat() if parsed else None
+
+    match = _WEEK_RE.match(text)
+    if match:
+        prefix, weekday_text = match.groups()
+        week_offset = {"下": 1, "下下": 2}.get(prefix, 0)
+        monday = today - timedelta(days=today.weekday())
+        parsed = monday + timedelta(weeks=week_offset, days=_WEEKDAYS[weekday_text])
+        # 不带前缀的"周五"指最近的一个周五，已过去则顺延到下周
+        if prefix is None and parsed < today:
+            parsed += timedelta(weeks=1)
+        return parsed.isoformat()
+
+    match = _DAYS_LATER_RE.match(text)
+    if match:
+        days = chinese_to_int(match.group(1))
+        return (today + timedelta(days=days)).isoformat() if days is not None else None
+
+    return None
+
+
+def find_date_phrase(text: str) -> Optional[str]:
+    """
+    在一句话中找出第一个本地规则可以解析的日期描述
+
+    Args:
+        text: 用户请求原文
+
+    Returns:
+        日期描述原文（如"十月二十号"），未找到时返回None
+    """
+    for match in _DATE_PHRASE_RE.finditer(text or ""):
+        if parse_date_locally(match.group(0)):
+            return match.group(0)
+    return None
+
+
+class DailyDateMemo:
+    """按天缓存已解析的日期描述，跨天后自动失效（"明天"的含义每天都会变化）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day: Optional[date] = None
+        self._entries: Dict[str, str] = {}
+
+    def _roll(self, today: date):
+        if self._day != today:
+            self._day = today
+            self._entries = {}
+
+    def get(self, date_description: str, today: date) -> Optional[str]:
+        with self._lock:
+            self._roll(today)
+            return self._entries.get(date_description.strip())
+
+    def put(self, date_description: str, parsed_date: str, today: date):
+        with self._lock:
+            self._roll(today)
+            self._entries[date_description.strip()] = parsed_date
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 17:30
+# @Author  : 周启航-开发
+# @File    : deadline.py
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing_extensions import Any, Awaitable, Callable, Optional
+
+from instrumentation import metrics
+
+# 每个请求的默认时间预算（秒），0 表示不限；调用方也可以在调用配置的 configurable.deadline 中直接指定截止时间
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "60"))
+# 工具调用在截止时间前预留的秒数，留给汇总预订结果
+DEADLINE_RESERVE_SECONDS = float(os.getenv("DEADLINE_RESERVE_SECONDS", "0.2"))
+
+# 当前请求的截止时间（time.time() 时间戳），None 表示不限
+_deadline_var: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+# 同步的阻塞调用无法中途打断，带超时执行时放到这些线程中，超时后调用方放弃等待，
+# 线程由调用自身的超时（如 SDK 的请求超时）结束
+_call_executor = ThreadPoolExecutor(max_workers=int(os.getenv("DEADLINE_CALL_THREADS", "32")),
+                                    thread_name_prefix="deadline-call")
+
+
+class DeadlineExceeded(Exception):
+    """请求的时间预算已用完，stage 为发现超时的环节"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage} 超出请求的时间预算")
+        self.stage = stage
+
+
+def deadline_after(seconds: Optional[float]) -> Optional[float]:
+    """返回 seconds 秒之后的截止时间，seconds 为空或不大于 0 时返回 None"""
+    return time.time() + seconds if seconds and seconds > 0 else None
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline_var.get()
+
+
+def remaining(reserve: float = DEADLINE_RESERVE_SECONDS) -> Optional[float]:
+    """当前请求剩余的秒数（扣除 reserve，不小于 0），没有截止时间时返回 None"""
+    deadline = _deadline_var.get()
+    return None if deadline is None else max(0.0, deadline - reserve - time.time())
+
+
+def expired() -> bool:
+    return remaining() == 0.0
+
+
+def allows(seconds: float) -> bool:
+    """剩余预算是否还够 seconds 秒，用于决定是否值得退避重试"""
+    left = remaining()
+    return left is None or left > seconds
+
+
+def call_timeout(stage: str, default: Optional[float] = None) -> Optional[float]:
+    """
+    计算一次调用的超时
+
+    Args:
+        stage: 调用环节名称，预算用完时写入 DeadlineExceeded
+        default: 调用自身的超时上限，None 表示不限
+
+    Returns:
+        default 与剩余预算中较小的一个，两者都没有时返回 None
+
+    Raises:
+        DeadlineExceeded: 预算已用完
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded(stage)
+    return left if default is None else min(default, left)
+
+
+def raise_if_expired(stage: str, error: Optional[BaseException] = None):
+    """调用超时后检查预算：超时由截止时间导致时改为抛出 DeadlineExceeded，不计为上游过载"""
+    left = remaining()
+    # 计时器可能略早于截止时间触发，留出少量余量
+    if left is not None and left < 0.01:
+        raise DeadlineExceeded(stage) from error
+
+
+def record_deadline_exceeded(stage: str):
+    metrics.inc("minicascade_deadline_exceeded_total", {"stage": stage},
+                help_text="Requests that ran out of their time budget, by the stage that hit the deadline")
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]):
+    """在当前上下文中设置截止时间；外层已有更早的截止时间时沿用外层的"""
+    outer = _deadline_var.get()
+    if deadline is None or (outer is not None and outer <= deadline):
+        yield outer
+        return
+    token = _deadline_var.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline_var.reset(token)
+
+
+def wait_result(future: Future, stage: str) -> Any:
+    """等待其他调用方负责的计算，最多等到截止时间；共享的 future 不会被取消"""
+    try:
+        return future.result(timeout=call_timeout(stage))
+    except TimeoutError:
+        if future.done():
+            raise
+        raise DeadlineExceeded(stage) from None
+
+
+def run_with_timeout(stage: str, timeout: Optional[float], fn: Callable, *args, **kwargs) -> Any:
+    """
+    带超时执行同步的阻塞调用
+
+    Raises:
+        DeadlineExceeded: 截止时间先到
+        TimeoutError: 调用自身的超时先到
+    """
+    if timeout is None:
+        return fn(*args, **kwargs)
+    future = _call_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError as e:
+        if future.done():
+            raise
+        future.cancel()
+        raise_if_expired(stage, e)
+        raise TimeoutError(f"{stage} 调用超时（{timeout:.1f}s）") from None
+
+
+async def await_with_timeout(stage: str, timeout: Optional[float], awaitable: Awaitable) -> Any:
+    """run_with_timeout 的异步版本，超时后取消被等待的协程"""
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except TimeoutError as e:
+        raise_if_expired(stage, e)
+        raise
+
+
+def deadline_config(config: Optional[dict] = None, deadline: Optional[float] = None) -> dict:
+    """
+    为一次图调用设置截止时间
+
+    截止时间放在调用配置中而不是图状态中：状态会随检查点保存，同一会话重试或恢复时
+    不能沿用上一次调用已经过期的截止时间。
+
+    Args:
+        config: 原有的调用配置，不会被修改
+        deadline: 截止时间（time.time() 时间戳），None 时从现在起按 REQUEST_DEADLINE_SECONDS 计算
+
+    Returns:
+        带 configurable.deadline 的调用配置
+    """
+    config = dict(config or {})
+    configurable = dict(config.get("configurable") or {})
+    deadline = deadline or deadline_after(REQUEST_DEADLINE_SECONDS)
+    if deadline:
+        configurable["deadline"] = deadline
+    config["configurable"] = configurable
+    return config
+
+
+def deadline_node(node: Callable) -> Callable:
+    """
+    给图节点设置请求的截止时间
+
+    截止时间依次取自调用配置中的 configurable.deadline（见 deadline_config）和调用方的 deadline_scope，
+    都没有时节点按 REQUEST_DEADLINE_SECONDS 单独计时。节点内的工具调用据此计算各自的超时。
+    同时支持同步和异步节点。
+    """
+    from langgraph.config import get_config
+
+    def _deadline() -> Optional[float]:
+        try:
+            configurable = get_config().get("configurable") or {}
+        except RuntimeError:
+            # 不在图中执行（例如直接调用节点函数）
+            configurable = {}
+        return configurable.get("deadline") or current_deadline() or deadline_after(REQUEST_DEADLINE_SECONDS)
+
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state, *args, **kwargs):
+            with deadline_scope(_deadline()):
+                return await node(state, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state, *args, **kwargs):
+        with deadline_scope(_deadline()):
+            return node(state, *args, **kwargs)
+    return wrapper
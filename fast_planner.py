@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 16:00
+# @Author  : 周启航-开发
+# @File    : fast_planner.py
+import os
+import re
+import unicodedata
+from datetime import date, datetime, timedelta
+from typing_extensions import Optional
+
+from date_parser import chinese_to_int, find_date_phrase, parse_date_locally
+from iata_index import get_iata_index
+
+_ROUTE_RE = re.compile(r"从(?P<origin>[一-龥A-Za-z]{2,12}?)(?:出发)?(?:去|到|飞往|飞|前往)(?P<destination>[一-龥A-Za-z]{2,12})")
+_SHORT_ROUTE_RE = re.compile(r"(?P<origin>[一-龥]{2,8})(?:到|飞往|飞)(?P<destination>[一-龥]{2,8})")
+_NIGHTS_RE = re.compile(r"(?:住|入住|待|呆)?\s*([0-9零一二两三四五六七八九十]+)\s*(?:晚|夜)")
+_NAME_CUE_RE = re.compile(r"我的名字是|我的名字叫|我叫|乘客(?:是|为)?|姓名(?:是|为)?[:：]?")
+# 中文姓名后必须紧跟标点、数字、句末或常见的动词、时间词，如"我叫王伟帮我订…"取"王伟"；
+# 姓名也不能以这些词开头，如"两位乘客明天出发"中没有姓名
+_NAME_STOP = (r"帮|想|要|订|预订|预定|给|去|从|到|飞|买|需|请|坐|乘|的"
+              r"|今天|明天|后天|大后天|下周|下个|这周|本周|星期|[零一二两三四五六七八九十]+月")
+_NAME_RE = re.compile(r"(?:" + _NAME_CUE_RE.pattern + r")\s*"
+                      r"(?:(?!" + _NAME_STOP + r")([一-龥·]{2,4}?)(?=$|[\s\d，。！？、,.!?;；:：]|周|" + _NAME_STOP + r")"
+                      r"|([A-Za-z][A-Za-z .]{1,40}[A-Za-z]))")
+_FLIGHT_WORDS = ("机票", "航班", "飞机", "飞")
+_HOTEL_WORDS = ("酒店", "宾馆", "民宿", "住")
+_PUNCT_RE = re.compile(r"[\s，。！？、,.!?;；:：\"'“”‘’]+")
+# 灵活日期："前后三天"、"上下浮动2天"、"±2天"；只说"日期灵活"、"左右"时使用默认天数
+_FLEX_RE = re.compile(r"(?:前后|上下|浮动|±|\+-|正负)\s*(?:浮动)?\s*([0-9零一二两三四五六七八九十]+)\s*(?:天|日)")
+_FLEX_WORDS = ("日期灵活", "时间灵活", "日期可调", "日期不固定", "左右")
+FLIGHT_FLEX_DEFAULT_DAYS = int(os.getenv("FLIGHT_FLEX_DEFAULT_DAYS", "3"))
+
+
+def _strict_city(candidate: str, from_end: bool) -> Optional[str]:
+    """从候选片段的开头（或结尾）截取最长的、能在机场索引中精确命中的城市名"""
+    index = get_iata_index()
+    for length in range(min(len(candidate), 8), 1, -1):
+        name = candidate[-length:] if from_end else candidate[:length]
+        if index.lookup(name, fuzzy=False):
+            return name
+    return None
+
+
+def _extract_route(text: str):
+    for pattern in (_ROUTE_RE, _SHORT_ROUTE_RE):
+        for match in pattern.finditer(text):
+            origin = _strict_city(match.group("origin"), from_end=pattern is _SHORT_ROUTE_RE)
+            destination = _strict_city(match.group("destination"), from_end=False)
+            if origin and destination and origin != destination:
+                return origin, destination
+    return None
+
+
+def _extract_passenger_name(text: str) -> Optional[str]:
+    """提取乘客姓名；请求中没有姓名时返回空字符串，提到了姓名但无法确定在哪里结束时返回None"""
+    match = _NAME_RE.search(text)
+    if match:
+        return (match.group(1) or match.group(2)).strip()
+    return None if _NAME_CUE_RE.search(text) else ""
+
+
+def _extract_flex_days(text: str) -> int:
+    match = _FLEX_RE.search(text)
+    if match:
+        return chinese_to_int(match.group(1)) or 0
+    return FLIGHT_FLEX_DEFAULT_DAYS if any(word in text for word in _FLEX_WORDS) else 0
+
+
+def extract_itinerary(user_request: str, today: Optional[date] = None) -> Optional[dict]:
+    """
+    使用本地规则从用户请求中提取行程要素
+
+    Args:
+        user_request: 用户请求原文
+        today: 解析相对日期的参考日期，默认为当天
+
+    Returns:
+        包含 origin、destination、date、nights、passenger_name、need_hotel、flex_days 的字典，
+        请求不属于"机票(+酒店)"类型、缺少必要信息或无法确定乘客姓名时返回None
+    """
+    text = unicodedata.normalize("NFKC", user_request or "")
+    if not any(word in text for word in _FLIGHT_WORDS):
+        return None
+    route = _extract_route(text)
+    date_phrase = find_date_phrase(text)
+    if not route or not date_phrase:
+        return None
+    departure_date = parse_date_locally(date_phrase, today)
+
+    need_hotel = any(word in text for word in _HOTEL_WORDS)
+    nights = None
+    if need_hotel:
+        match = _NIGHTS_RE.search(text)
+        nights = chinese_to_int(match.group(1)) if match else None
+        if not nights:
+            return None
+
+    passenger_name = _extract_passenger_name(text)
+    if passenger_name is None:
+        return None
+    return {
+        "origin": route[0],
+        "destination": route[1],
+        "date": departure_date,
+        "nights": nights,
+        "need_hotel": need_hotel,
+        "passenger_name": passenger_name,
+        "flex_days": _extract_flex_days(text),
+    }
+
+
+def build_plan(itinerary: dict) -> dict:
+    """根据提取出的行程要素生成与大模型规划器相同结构的执行计划"""
+    tasks = [{
+        "id": "task1",
+        "description": f"查询{itinerary['date']}从{itinerary['origin']}到{itinerary['destination']}的航班",
+        "tool_needed": "search_flights",
+        "dependencies": [],
+        "parameters": {
+            "home": itinerary["origin"],
+            "destination": itinerary["destination"],
+            "date": itinerary["date"],
+        },
+    }]
+    if itinerary.get("flex_days"):
+        tasks[0]["parameters"]["flex_days"] = itinerary["flex_days"]
+        tasks[0]["description"] += f"（前后{itinerary['flex_days']}天内选最便宜的一天）"
+    if itinerary["need_hotel"]:
+        check_out = datetime.strptime(itinerary["date"], "%Y-%m-%d") + timedelta(days=itinerary["nights"])
+        tasks.append({
+            "id": "task2",
+            "description": f"查询{itinerary['destination']}入住{itinerary['nights']}晚的酒店",
+            "tool_needed": "search_hotels_with_llm",
+            "dependencies": ["task1"],
+            "parameters": {
+                "destination": itinerary["destination"],
+                "check_in_date": itinerary["date"],
+                "check_out_date": check_out.strftime("%Y-%m-%d"),
+            },
+        })
+    plan = {"tasks": tasks}
+    if itinerary["passenger_name"]:
+        plan["passenger_name"] = itinerary["passenger_name"]
+    return plan
+
+
+def plan_signature(user_request: str, itinerary: Optional[dict] = None, today: Optional[date] = None) -> str:
+    """
+    计算请求的规范化签名，作为规划结果的缓存键
+
+    能被规则识别的请求按行程要素（IATA代码、日期、晚数、乘客）生成签名；
+    其余请求按去除空白和标点后的原文加当天日期生成签名，因为相对日期的含义每天都会变化。
+    """
+    if itinerary:
+        index = get_iata_index()
+        return "|".join([
+            "fast",
+            index.lookup(itinerary["origin"]) or itinerary["origin"],
+            index.lookup(itinerary["destination"]) or itinerary["destination"],
+            itinerary["date"],
+            str(itinerary["nights"] or 0),
+            itinerary["passenger_name"],
+            str(itinerary.get("flex_days") or 0),
+        ])
+    today = today or datetime.now().date()
+    normalized = _PUNCT_RE.sub("", unicodedata.normalize("NFKC", user_request or "")).lower()
+    return f"llm|{today.isoformat()}|{normalized}"
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 21:40
+# @Author  : 周启航-开发
+# @File    : flight_offers.py
+import os
+import re
+from typing_extensions import List, Optional, Sequence
+
+import numpy as np
+
+# 综合评分中价格、飞行时长和中转次数的权重，分数越低越好
+FLIGHT_RANK_PRICE_WEIGHT = float(os.getenv("FLIGHT_RANK_PRICE_WEIGHT", "0.6"))
+FLIGHT_RANK_DURATION_WEIGHT = float(os.getenv("FLIGHT_RANK_DURATION_WEIGHT", "0.3"))
+FLIGHT_RANK_TRANSFER_WEIGHT = float(os.getenv("FLIGHT_RANK_TRANSFER_WEIGHT", "0.1"))
+# 偏好航司的评分奖励（从分数中减去）
+FLIGHT_RANK_AIRLINE_BONUS = float(os.getenv("FLIGHT_RANK_AIRLINE_BONUS", "0.15"))
+FLIGHT_TOP_K = int(os.getenv("FLIGHT_TOP_K", "5"))
+
+_DURATION_RE = re.compile(r"(?:(\d+)\s*[hH时])?\s*(?:(\d+)\s*[mM分])?")
+_ISO_DURATION_RE = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?")
+
+
+def parse_duration_minutes(text) -> int:
+    """将 "02h05m"、"2小时5分"、"PT2H5M" 或分钟数转换为分钟，无法解析时返回 -1"""
+    if isinstance(text, (int, float)):
+        return int(text)
+    text = str(text or "").strip()
+    if not text:
+        return -1
+    if text.isdigit():
+        return int(text)
+    match = _ISO_DURATION_RE.fullmatch(text) or _DURATION_RE.fullmatch(text.replace("小时", "时").replace("钟", ""))
+    if not match or not any(match.groups()):
+        return -1
+    hours, minutes = match.groups()
+    return int(hours or 0) * 60 + int(minutes or 0)
+
+
+def parse_clock_minutes(text) -> int:
+    """将 "HH:MM" 转换为当天的分钟数，无法解析时返回 -1"""
+    hours, _, minutes = str(text or "").partition(":")
+    if not hours.strip().isdigit():
+        return -1
+    return int(hours) * 60 + (int(minutes[:2]) if minutes[:2].isdigit() else 0)
+
+
+def parse_price(value) -> float:
+    """将价格转换为浮点数，缺失或无法解析时返回 NaN"""
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return price if np.isfinite(price) and price > 0 else np.nan
+
+
+def parse_count(value) -> int:
+    """将中转次数转换为整数，缺失或无法解析时按 0 计，超出 int8 范围时截断"""
+    try:
+        count = int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+    return min(max(count, 0), np.iinfo(np.int8).max)
+
+
+def map_flight(raw: dict) -> dict:
+    """将航班接口返回的单个航班映射为工具输出的航班信息字典"""
+    return {
+        "flightNo": raw.get("flightNo", "") or (raw.get("airline") or "") + raw.get("flightNumber", ""),
+        "arrivalName": raw.get("arrivalName", ""),
+        "price": raw.get("price", 0) or raw.get("ticketPrice", 0),
+        "duration": raw.get("duration", ""),
+        "departureName": raw.get("departureName", ""),
+        "departureDate": raw.get("departureDate", ""),
+        "departureTime": raw.get("departureTime", ""),
+        "airlineName": raw.get("airlineName", ""),
+        "arrivalDate": raw.get("arrivalDate", ""),
+    }
+
+
+class FlightOffers:
+    """
+    航班报价的列式存储
+
+    价格、飞行时长、起飞时刻、中转次数和航司分别保存为定长数组（航司保存为类别编号），
+    过滤和评分都以整列向量运算完成，原始航班字典只在输出 top-k 时按下标取用。
+    """
+
+    def __init__(self, raw_flights: Sequence[dict]):
+        self.raw = list(raw_flights)
+        # 每列先用推导式取出再一次性转换为数组，避免逐元素写入 numpy 数组的开销；
+        # 单个航班的字段格式异常不影响整批，价格无法解析的航班记为 NaN，在过滤时被排除
+        self.price = np.array([parse_price(flight.get("price") or flight.get("ticketPrice"))
+                               for flight in self.raw], dtype=np.float64)
+        self.duration_min = np.array([parse_duration_minutes(flight.get("duration")) for flight in self.raw],
+                                     dtype=np.int32)
+        self.departure_min = np.array([parse_clock_minutes(flight.get("departureTime")) for flight in self.raw],
+                                      dtype=np.int16)
+        self.transfers = np.array([parse_count(flight.get("transferNum")) for flight in self.raw], dtype=np.int8)
+        codes = [str(flight.get("airline") or "").upper() for flight in self.raw]
+        self.airline_codes: List[str] = list(dict.fromkeys(codes))
+        code_index = {code: index for index, code in enumerate(self.airline_codes)}
+        self.airline = np.array([code_index[code] for code in codes], dtype=np.int16)
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def _airline_mask(self, airlines: Sequence[str]) -> np.ndarray:
+        wanted = [self.airline_codes.index(code.upper()) for code in airlines if code.upper() in self.airline_codes]
+        return np.isin(self.airline, wanted)
+
+    def filter_mask(self,
+                    max_price: Optional[float] = None,
+                    earliest_departure: Optional[str] = None,
+                    latest_departure: Optional[str] = None,
+                    airlines: Optional[Sequence[str]] = None) -> np.ndarray:
+        """返回满足全部条件的布尔掩码；缺少价格的航班总是被排除"""
+        mask = ~np.isnan(self.price)
+        if max_price is not None:
+            mask &= self.price <= max_price
+        if earliest_departure:
+            mask &= self.departure_min >= parse_clock_minutes(earliest_departure)
+        if latest_departure:
+            mask &= (self.departure_min >= 0) & (self.departure_min <= parse_clock_minutes(latest_departure))
+        if airlines:
+            mask &= self._airline_mask(airlines)
+        return mask
+
+    def scores(self,
+               price_weight: float = FLIGHT_RANK_PRICE_WEIGHT,
+               duration_weight: float = FLIGHT_RANK_DURATION_WEIGHT,
+               transfer_weight: float = FLIGHT_RANK_TRANSFER_WEIGHT,
+               preferred_airlines: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        计算综合评分（越低越好）
+
+        价格、时长和中转次数先做 min-max 归一化再加权；时长未知的航班按最长时长计算，
+        偏好航司的航班减去 FLIGHT_RANK_AIRLINE_BONUS。
+        """
+        def normalized(values: np.ndarray) -> np.ndarray:
+            values = values.astype(np.float64)
+            low, high = np.nanmin(values), np.nanmax(values)
+            if not np.isfinite(low) or high <= low:
+                return np.zeros_like(values)
+            return (values - low) / (high - low)
+
+        duration = self.duration_min.astype(np.float64)
+        known = duration >= 0
+        duration[~known] = duration[known].max() if known.any() else 0
+        score = (price_weight * normalized(self.price)
+                 + duration_weight * normalized(duration)
+                 + transfer_weight * normalized(self.transfers))
+        if preferred_airlines:
+            score -= FLIGHT_RANK_AIRLINE_BONUS * self._airline_mask(preferred_airlines)
+        return score
+
+    def top_k(self,
+              k: int = FLIGHT_TOP_K,
+              max_price: Optional[float] = None,
+              earliest_departure: Optional[str] = None,
+              latest_departure: Optional[str] = None,
+              airlines: Optional[Sequence[str]] = None,
+              preferred_airlines: Optional[Sequence[str]] = None) -> List[dict]:
+        """
+        过滤并按综合评分返回最优的 k 个航班
+
+        Args:
+            k: 返回数量
+            max_price: 最高票价
+            earliest_departure: 最早起飞时刻 (HH:MM)
+            latest_departure: 最晚起飞时刻 (HH:MM)
+            airlines: 只保留这些航司（航司代码）
+            preferred_airlines: 偏好航司，不排除其他航司，只提高排名
+
+        Returns:
+            按评分从优到劣排列的航班信息字典列表
+        """
+        if not len(self) or k <= 0:
+            return []
+        candidates = np.flatnonzero(self.filter_mask(max_price, earliest_departure, latest_departure, airlines))
+        if not candidates.size:
+            return []
+        score = self.scores(preferred_airlines=preferred_airlines)[candidates]
+        if candidates.size > k:
+            # 先用 argpartition 取出 k 个候选，只对这 k 个排序
+            selected = np.argpartition(score, k - 1)[:k]
+        else:
+            selected = np.arange(candidates.size)
+        # 评分相同时价格低的在前
+        order = selected[np.lexsort((self.price[candidates[selected]], score[selected]))]
+        return [map_flight(self.raw[index]) for index in candidates[order]]
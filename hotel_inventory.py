@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 23:20
+# @Author  : 周启航-开发
+# @File    : hotel_inventory.py
+import asyncio
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from functools import lru_cache
+from pathlib import Path
+from typing_extensions import Callable, Dict, List, Optional, Sequence
+
+from iata_index import normalize_name
+
+# 本地酒店库存（供应商导出的真实库存），支持 .csv 和 .jsonl；未配置时不使用本地库存。
+# benchmarks/fixtures/hotels.csv 是压测和测试用的示例数据，不能作为生产库存
+HOTEL_INVENTORY_PATH = os.getenv("HOTEL_INVENTORY_PATH", "")
+HOTEL_SEARCH_LIMIT = int(os.getenv("HOTEL_SEARCH_LIMIT", "5"))
+
+
+def _city_key(city: str) -> str:
+    key = normalize_name(city)
+    return key[:-1] if len(key) > 2 and key.endswith("市") else key
+
+
+def _parse_day(value) -> Optional[int]:
+    if isinstance(value, date):
+        return value.toordinal()
+    try:
+        return datetime.strptime(str(value).strip(), "%Y-%m-%d").toordinal()
+    except ValueError:
+        return None
+
+
+class Hotel:
+    """
+    单个酒店的库存记录
+
+    不可订的日期保存为一个整数位图：第 i 位为 1 表示 base_day + i 这一天不可订，
+    检查一段入住期只需要一次移位和按位与。
+    """
+
+    __slots__ = ("hotel_id", "name", "price_per_night", "district", "_blocked", "_base_day",
+                 "_available_from", "_available_to")
+
+    def __init__(self, hotel_id: str, name: str, price_per_night: float, district: str = "",
+                 blocked_days: Sequence[int] = (), available_from: Optional[int] = None,
+                 available_to: Optional[int] = None):
+        self.hotel_id = hotel_id
+        self.name = name
+        self.price_per_night = price_per_night
+        self.district = district
+        self._base_day = min(blocked_days) if blocked_days else 0
+        self._blocked = 0
+        for day in blocked_days:
+            self._blocked |= 1 << (day - self._base_day)
+        self._available_from = available_from
+        self._available_to = available_to
+
+    def is_available(self, check_in: int, check_out: int) -> bool:
+        """检查 [check_in, check_out) 期间每晚是否都可订，参数为日期序数"""
+        if check_out <= check_in:
+            return False
+        if self._available_from is not None and check_in < self._available_from:
+            return False
+        if self._available_to is not None and check_out - 1 > self._available_to:
+            return False
+        if not self._blocked:
+            return True
+        offset = check_in - self._base_day
+        nights_mask = (1 << (check_out - check_in)) - 1
+        window = self._blocked >> offset if offset >= 0 else self._blocked << -offset
+        return not window & nights_mask
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "price_per_night": self.price_per_night,
+                "hotel_id": self.hotel_id, "district": self.district}
+
+
+class CityPartition:
+    """同一城市的酒店，按每晚价格升序排列，价格列表用于二分查找"""
+
+    def __init__(self, hotels: List[Hotel]):
+        self.hotels = sorted(hotels, key=lambda hotel: hotel.price_per_night)
+        self.prices = [hotel.price_per_night for hotel in self.hotels]
+
+    def price_band(self, min_price: Optional[float], max_price: Optional[float]) -> range:
+        low = bisect_left(self.prices, min_price) if min_price is not None else 0
+        high = bisect_right(self.prices, max_price) if max_price is not None else len(self.prices)
+        return range(low, high)
+
+
+class HotelInventory:
+    """按城市分区、按价格排序的本地酒店库存"""
+
+    def __init__(self, hotels_by_city: Dict[str, List[Hotel]]):
+        self._partitions = {city: CityPartition(hotels) for city, hotels in hotels_by_city.items()}
+
+    @classmethod
+    def load(cls, path=HOTEL_INVENTORY_PATH) -> "HotelInventory":
+        """
+        从 CSV 或 JSONL 文件加载库存
+
+        字段：hotel_id、city、name、price_per_night，可选 city_en、district、
+        blackout_dates（"|" 分隔或列表）、available_from、available_to（YYYY-MM-DD）。
+        path 为空时返回空库存。
+
+        Raises:
+            FileNotFoundError: 配置的库存文件不存在
+        """
+        hotels_by_city: Dict[str, List[Hotel]] = {}
+        if not path:
+            return cls(hotels_by_city)
+        path = Path(path)
+        with open(path, encoding="utf-8", newline="") as f:
+            if path.suffix == ".jsonl":
+                rows = [json.loads(line) for line in f if line.strip()]
+            else:
+                rows = list(csv.DictReader(f))
+        for row in rows:
+            blackout = row.get("blackout_dates") or []
+            if isinstance(blackout, str):
+                blackout = blackout.split("|")
+            price = float(row["price_per_night"])
+            hotel = Hotel(
+                hotel_id=str(row.get("hotel_id") or row["name"]),
+                name=row["name"],
+                price_per_night=int(price) if price.is_integer() else price,
+                district=row.get("district") or "",
+                blocked_days=[day for day in map(_parse_day, blackout) if day is not None],
+                available_from=_parse_day(row["available_from"]) if row.get("available_from") else None,
+                available_to=_parse_day(row["available_to"]) if row.get("available_to") else None,
+            )
+            # 中文名和英文名都指向同一个分区
+            keys = {_city_key(row["city"]), _city_key(row.get("city_en") or "")} - {""}
+            for key in keys:
+                hotels_by_city.setdefault(key, []).append(hotel)
+        return cls(hotels_by_city)
+
+    def __contains__(self, city: str) -> bool:
+        return _city_key(city) in self._partitions
+
+    def search(self, city: str, check_in_date: str, check_out_date: str,
+               min_price: Optional[float] = None, max_price: Optional[float] = None,
+               limit: int = HOTEL_SEARCH_LIMIT) -> List[dict]:
+        """
+        查询指定城市和日期内可订的酒店
+
+        价格区间通过二分查找确定；结果的第一个是区间内价格居中的可订酒店，
+        其余按与中间价的距离由近到远排列。
+
+        Returns:
+            酒店信息列表；城市不在库存中或日期无效时返回空列表
+        """
+        partition = self._partitions.get(_city_key(city))
+        check_in, check_out = _parse_day(check_in_date), _parse_day(check_out_date)
+        if partition is None or check_in is None or check_out is None:
+            return []
+        band = partition.price_band(min_price, max_price)
+        if not band:
+            return []
+        # 从价格区间的中位数位置向两侧交替扩展，直到凑够 limit 个可订酒店
+        middle = band.start + (len(band) - 1) // 2
+        results = []
+        for step in range(2 * len(band)):
+            index = middle + (step + 1) // 2 * (1 if step % 2 else -1)
+            if index not in band:
+                continue
+            hotel = partition.hotels[index]
+            if hotel.is_available(check_in, check_out):
+                results.append(hotel.to_dict())
+                if len(results) >= limit:
+                    break
+        return results
+
+
+class HotelProvider(ABC):
+    """酒店查询提供者接口"""
+
+    name = "base"
+
+    @abstractmethod
+    def search(self, city: str, check_in_date: str, check_out_date: str) -> List[dict]:
+        """查询酒店，入住和退房日期为 YYYY-MM-DD"""
+
+    async def asearch(self, city: str, check_in_date: str, check_out_date: str) -> List[dict]:
+        return await asyncio.to_thread(self.search, city, check_in_date, check_out_date)
+
+
+class LocalInventoryProvider(HotelProvider):
+    """本地库存提供者，查询为内存中的二分查找和位运算，无需访问外部服务"""
+
+    name = "inventory"
+
+    def __init__(self, inventory: HotelInventory):
+        self.inventory = inventory
+
+    def search(self, city: str, check_in_date: str, check_out_date: str) -> List[dict]:
+        return self.inventory.search(city, check_in_date, check_out_date)
+
+    async def asearch(self, city: str, check_in_date: str, check_out_date: str) -> List[dict]:
+        return self.search(city, check_in_date, check_out_date)
+
+
+class CallableHotelProvider(HotelProvider):
+    """用同步和异步函数包装的提供者，例如大模型生成的酒店清单"""
+
+    def __init__(self, name: str, search: Callable[[str, str, str], List[dict]],
+                 asearch: Optional[Callable] = None):
+        self.name = name
+        self._search = search
+        self._asearch = asearch
+
+    def search(self, city: str, check_in_date: str, check_out_date: str) -> List[dict]:
+        return self._search(city, check_in_date, check_out_date)
+
+    async def asearch(self, city: str, check_in_date: str, check_out_date: str) -> List[dict]:
+        if self._asearch is None:
+            return await super().asearch(city, check_in_date, check_out_date)
+        return await self._asearch(city, check_in_date, check_out_date)
+
+
+class FallbackHotelProvider(HotelProvider):
+    """依次尝试多个提供者，返回第一个非空结果"""
+
+    name = "fallback"
+
+    def __init__(self, providers: Sequence[HotelProvider]):
+        self.providers = list(providers)
+
+    def search(self, city: str, check_in_date: str, check_out_date: str) -> List[dict]:
+        for provider in self.providers:
+            hotels = provider.search(city, check_in_date, check_out_date)
+            if hotels:
+                return hotels
+        return []
+
+    async def asearch(self, city: str, check_in_date: str, check_out_date: str) -> List[dict]:
+        for provider in self.providers:
+            hotels = await provider.asearch(city, check_in_date, check_out_date)
+            if hotels:
+                return hotels
+        return []
+
+
+@lru_cache(maxsize=1)
+def get_hotel_inventory() -> HotelInventory:
+    """返回进程内共享的酒店库存"""
+    return HotelInventory.load()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 15:20
+# @Author  : 周启航-开发
+# @File    : http_client.py
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+from typing_extensions import Optional
+
+import httpx
+
+from deadline import DeadlineExceeded, allows, await_with_timeout, call_timeout, raise_if_expired
+from instrumentation import span, record_http_status
+from rate_limit import UpstreamGuard, build_guard
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+FLIGHT_API_CONNECT_TIMEOUT = float(os.getenv("FLIGHT_API_CONNECT_TIMEOUT", "3"))
+FLIGHT_API_READ_TIMEOUT = float(os.getenv("FLIGHT_API_READ_TIMEOUT", "10"))
+FLIGHT_API_MAX_RETRIES = int(os.getenv("FLIGHT_API_MAX_RETRIES", "2"))
+FLIGHT_API_MAX_CONNECTIONS = int(os.getenv("FLIGHT_API_MAX_CONNECTIONS", "50"))
+FLIGHT_API_HTTP2 = os.getenv("FLIGHT_API_HTTP2", "false").lower() == "true"
+# 开启后，请求超过近期p95耗时仍未返回时发出一个对冲请求，取先返回的结果
+FLIGHT_API_HEDGE = os.getenv("FLIGHT_API_HEDGE", "false").lower() == "true"
+# 航班接口的请求速率上限（0 表示不限）和自适应并发上限的最大值
+FLIGHT_API_QPS = float(os.getenv("FLIGHT_API_QPS", "0"))
+FLIGHT_API_MAX_CONCURRENCY = int(os.getenv("FLIGHT_API_MAX_CONCURRENCY") or FLIGHT_API_MAX_CONNECTIONS)
+
+# 这些状态码视为上游临时故障，可以重试
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LatencyWindow:
+    """记录最近若干次请求耗时，用于计算对冲请求的触发延迟"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=size)
+        self._min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self._min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class PooledHttpClient:
+    """
+    带连接池、超时、重试和对冲请求的HTTP客户端
+
+    同步与异步入口使用同一套连接池配置（连接数上限、keep-alive、超时和HTTP/2开关），
+    进程内共享一个实例，避免每次请求重新建立TCP/TLS连接。每次请求的超时不超过当前请求剩余的时间预算，
+    剩余预算不够退避后再试时不再重试。
+    """
+
+    def __init__(self,
+                 connect_timeout: float = FLIGHT_API_CONNECT_TIMEOUT,
+                 read_timeout: float = FLIGHT_API_READ_TIMEOUT,
+                 max_retries: int = FLIGHT_API_MAX_RETRIES,
+                 max_connections: int = FLIGHT_API_MAX_CONNECTIONS,
+                 http2: bool = FLIGHT_API_HTTP2,
+                 hedge: bool = FLIGHT_API_HEDGE,
+                 backoff_base: float = 0.2,
+                 backoff_max: float = 2.0,
+                 guard: Optional[UpstreamGuard] = None):
+        self.max_retries = max_retries
+        # 每次实际发出的请求（包括重试和对冲请求）都经过限流，429/超时会收紧并发上限
+        self.guard = guard or build_guard("flight_api", per_second=FLIGHT_API_QPS,
+                                          max_concurrency=FLIGHT_API_MAX_CONCURRENCY)
+        self.hedge = hedge
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.latency = LatencyWindow()
+        self._read_timeout = read_timeout
+        self._connect_timeout = connect_timeout
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_connections,
+                                    keepalive_expiry=30)
+        self._http2 = http2 and self._h2_available()
+        self._client = httpx.Client(timeout=self._timeout, limits=self._limits, http2=self._http2)
+        # 每个事件循环一个 AsyncClient，事件循环被回收时对应的客户端一起释放
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+            weakref.WeakKeyDictionary()
+        self._async_lock = threading.Lock()
+        self._hedge_executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="http-hedge")
+
+    @staticmethod
+    def _h2_available() -> bool:
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            log.info("未安装 h2，航班接口回退到 HTTP/1.1")
+            return False
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # AsyncClient 的连接绑定在创建它的事件循环上，每个事件循环各用一个客户端；
+        # 多个线程各自运行事件循环时加锁，保证同一事件循环只创建一个客户端
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is not None:
+            return client
+        with self._async_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                self._discard_closed_loops()
+                client = httpx.AsyncClient(timeout=self._timeout, limits=self._limits, http2=self._http2)
+                self._async_clients[loop] = client
+        return client
+
+    def _discard_closed_loops(self):
+        # 已关闭的事件循环上无法再 aclose，客户端持有的连接又引用着事件循环，
+        # 不主动移除时弱引用永远不会失效；移除后连接随事件循环一起被回收
+        for loop in [loop for loop in list(self._async_clients.keys()) if loop.is_closed()]:
+            self._async_clients.pop(loop, None)
+
+    def _backoff(self, attempt: int) -> float:
+        """指数退避加全抖动"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _request_timeout(self) -> httpx.Timeout:
+        """按剩余预算收紧本次请求的连接和读取超时"""
+        left = call_timeout("flight_api")
+        if left is None:
+            return self._timeout
+        return httpx.Timeout(min(self._read_timeout, left), connect=min(self._connect_timeout, left))
+
+    def _hedge_delay(self) -> Optional[float]:
+        return self.latency.percentile(0.95) if self.hedge else None
+
+    @staticmethod
+    def _should_retry(error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRYABLE_STATUS
+        return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+    def _get_once(self, url: str, params: dict) -> dict:
+        with self.guard.guard(), span("flight_api", kind="http", url=url) as record:
+            started = time.perf_counter()
+            try:
+                response = self._client.get(url, params=params, timeout=self._request_timeout())
+            except httpx.TimeoutException as e:
+                raise_if_expired("flight_api", e)
+                raise
+            record_http_status(record, response.status_code, "flight_api")
+            response.raise_for_status()
+            self.latency.record(time.perf_counter() - started)
+            return response.json()
+
+    def _get_hedged(self, url: str, params: dict) -> dict:
+        delay = self._hedge_delay()
+        if delay is None:
+            return self._get_once(url, params)
+        futures = [self._hedge_executor.submit(contextvars.copy_context().run, self._get_once, url, params)]
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            futures.append(self._hedge_executor.submit(contextvars.copy_context().run, self._get_once, url, params))
+        # 返回第一个成功的结果，全部失败时抛出最后一个异常
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def get_json(self, url: str, params: Optional[dict] = None) -> dict:
+        """
+        发起GET请求并解析JSON，遇到超时、连接错误或可重试状态码时按抖动退避重试
+
+        Args:
+            url: 请求地址
+            params: 查询参数
+
+        Returns:
+            解析后的JSON数据
+
+        Raises:
+            httpx.HTTPError: 重试耗尽后仍然失败
+            DeadlineExceeded: 请求的时间预算已用完
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._get_hedged(url, params or {})
+            except httpx.HTTPError as e:
+                if attempt >= self.max_retries or not self._should_retry(e):
+                    raise
+                delay = self._backoff(attempt)
+                if not allows(delay):
+                    raise DeadlineExceeded("flight_api") from e
+                time.sleep(delay)
+
+    async def _aget_once(self, url: str, params: dict) -> dict:
+        async with self.guard.aguard():
+            with span("flight_api", kind="http", url=url) as record:
+                started = time.perf_counter()
+                try:
+                    response = await self.async_client.get(url, params=params, timeout=self._request_timeout())
+                except httpx.TimeoutException as e:
+                    raise_if_expired("flight_api", e)
+                    raise
+                record_http_status(record, response.status_code, "flight_api")
+                response.raise_for_status()
+                self.latency.record(time.perf_counter() - started)
+                return response.json()
+
+    async def _aget_hedged(self, url: str, params: dict) -> dict:
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._aget_once(url, params)
+        tasks = [asyncio.ensure_future(self._aget_once(url, params))]
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.append(asyncio.ensure_future(self._aget_once(url, params)))
+        pending = set(tasks)
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def aget_json(self, url: str, params: Optional[dict] = None) -> dict:
+        """get_json 的异步版本，整次请求（包括对冲请求）超出剩余预算时被取消"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await await_with_timeout("flight_api", call_timeout("flight_api"),
+                                                self._aget_hedged(url, params or {}))
+            except httpx.HTTPError as e:
+                if attempt >= self.max_retries or not self._should_retry(e):
+                    raise
+                delay = self._backoff(attempt)
+                if not allows(delay):
+                    raise DeadlineExceeded("flight_api") from e
+                await asyncio.sleep(delay)
+
+    def close(self):
+        self._client.close()
+        self._hedge_executor.shutdown(wait=False)
+
+    async def aclose(self):
+        """关闭当前事件循环上的 AsyncClient，应在事件循环结束前调用"""
+        with self._async_lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+@lru_cache(maxsize=1)
+def get_flight_client() -> PooledHttpClient:
+    """返回进程内共享的航班接口客户端"""
+    return PooledHttpClient()
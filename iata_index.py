@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 14:10
+# @Author  : 周启航-开发
+# @File    : iata_index.py
+import csv
+import difflib
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing_extensions import Dict, Optional
+
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+AIRPORTS_PATH = Path(os.getenv("IATA_AIRPORTS_PATH", DATA_DIR / "airports.csv"))
+# 大模型转换成功的城市名会写回该文件，下次直接命中本地索引
+LEARNED_ALIASES_PATH = Path(os.getenv("IATA_LEARNED_ALIASES_PATH", DATA_DIR / "learned_iata_aliases.json"))
+
+_STRIP_RE = re.compile(r"[\s'’·\-_.]+")
+_SUFFIXES = ("国际机场", "机场", "特别行政区", "自治州", "市", "省", "地区", "站")
+_IATA_RE = re.compile(r"^[A-Za-z]{3}$")
+
+
+def normalize_name(name: str) -> str:
+    """统一大小写并去掉空白、撇号和连接符，作为索引键"""
+    return _STRIP_RE.sub("", name or "").lower()
+
+
+class IataIndex:
+    """
+    城市名到IATA机场代码的内存索引
+
+    同时收录中文名、英文名、拼音、机场全称和别名，先精确查找，
+    再尝试去掉"市"、"机场"等后缀、前缀匹配和拼音/英文模糊匹配。
+    """
+
+    def __init__(self, airports_path: Path = AIRPORTS_PATH, learned_path: Optional[Path] = LEARNED_ALIASES_PATH):
+        self._names: Dict[str, str] = {}
+        self._codes = set()
+        self._learned_path = learned_path
+        self._learned: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._load_airports(airports_path)
+        self._load_learned()
+
+    def _add(self, name: str, code: str, overwrite: bool = False):
+        key = normalize_name(name)
+        if key and (overwrite or key not in self._names):
+            self._names[key] = code
+
+    def _load_airports(self, path: Path):
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                code = row["iata"].strip().upper()
+                self._codes.add(code)
+                self._add(code, code, overwrite=True)
+                for column in ("city_zh", "city_en", "pinyin", "airport_zh"):
+                    self._add(row.get(column, ""), code)
+                for alias in (row.get("aliases") or "").split("|"):
+                    self._add(alias, code)
+
+    def _load_learned(self):
+        if not self._learned_path or not self._learned_path.exists():
+            return
+        try:
+            with open(self._learned_path, encoding="utf-8") as f:
+                self._learned = json.load(f)
+        except (OSError, ValueError):
+            self._learned = {}
+        for name, code in self._learned.items():
+            self._add(name, code)
+
+    def lookup(self, city_name: str, fuzzy: bool = True) -> Optional[str]:
+        """
+        查找城市对应的IATA代码
+
+        Args:
+            city_name: 城市名、机场名、拼音、英文名或IATA代码
+            fuzzy: 是否启用前缀和模糊匹配，关闭时只做精确查找和后缀去除
+
+        Returns:
+            三字母IATA代码，索引中找不到时返回None；不在机场表中的三字母代码不会原样返回
+        """
+        key = normalize_name(city_name)
+        if not key:
+            return None
+        # 机场表中的代码以自身为键收录，已知代码在这里精确命中
+        code = self._names.get(key)
+        if code:
+            return code
+
+        # 去掉"市"、"国际机场"等后缀后再查
+        for suffix in _SUFFIXES:
+            if key.endswith(suffix) and len(key) > len(suffix):
+                code = self._names.get(key[:-len(suffix)])
+                if code:
+                    return code
+
+        if not fuzzy:
+            return None
+
+        # 前缀匹配：中文名按字匹配，如"武汉市洪山区"命中"武汉"，"哈尔"命中唯一的"哈尔滨"；
+        # 拼音/英文只在词边界处匹配，如"Hangzhou Xiaoshan"命中"hangzhou"，避免"xiangyang"误命中"xian"；
+        # 三字母的代码和别名不参与前缀匹配
+        if key.isascii():
+            words = [word for word in _STRIP_RE.split(city_name.lower()) if word]
+            prefixed = [prefix for prefix in ("".join(words[:count]) for count in range(1, len(words)))
+                        if prefix in self._names and not _IATA_RE.match(prefix)]
+        else:
+            prefixed = [name for name in self._names if len(name) >= 2 and not name.isascii() and key.startswith(name)]
+        if prefixed:
+            return self._names[max(prefixed, key=len)]
+        if len(key) >= 2 and not key.isascii():
+            candidates = {code for name, code in self._names.items() if not name.isascii() and name.startswith(key)}
+            if len(candidates) == 1:
+                return candidates.pop()
+
+        # 拼音/英文拼写错误的模糊匹配；三字母代码不作为候选，避免"wuhu"误命中"wuh"
+        if key.isascii():
+            names = [name for name in self._names if name.isascii() and not _IATA_RE.match(name)]
+            for name in difflib.get_close_matches(key, names, n=3, cutoff=0.85):
+                # 等长但字母不同的拼写多半是另一个城市（如"xiangyang"与"xianggang"），只接受字母换位、漏字和多字
+                if len(name) != len(key) or sorted(name) == sorted(key):
+                    return self._names[name]
+        return None
+
+    def learn(self, city_name: str, code: str):
+        """记录大模型给出的转换结果，并持久化到别名文件"""
+        code = code.strip().upper()
+        key = normalize_name(city_name)
+        if not key or not _IATA_RE.match(code):
+            return
+        with self._lock:
+            self._add(city_name, code, overwrite=True)
+            self._learned[city_name.strip()] = code
+            if not self._learned_path:
+                return
+            try:
+                self._learned_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self._learned_path.with_suffix(".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._learned, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self._learned_path)
+            except OSError as e:
+                log.warning("保存IATA别名失败", path=str(self._learned_path), error=str(e))
+
+
+@lru_cache(maxsize=1)
+def get_iata_index() -> IataIndex:
+    """返回进程内共享的IATA索引，首次调用时加载数据"""
+    return IataIndex()
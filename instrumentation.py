@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 20:10
+# @Author  : 周启航-开发
+# @File    : instrumentation.py
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing_extensions import Callable, Dict, List, Optional, Tuple
+
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "true").lower() == "true"
+# 耗时直方图的桶边界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None):
+    """在当前上下文中设置请求ID，期间记录的所有跨度都带上该ID"""
+    token = request_id_var.set(request_id or new_request_id())
+    try:
+        yield request_id_var.get()
+    finally:
+        request_id_var.reset(token)
+
+
+@dataclass
+class Span:
+    """一次计时跨度，字段与 OpenTelemetry Span 对应"""
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    status: str = "ok"
+    attributes: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def duration_seconds(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_otel(self) -> dict:
+        """转换为 OTLP/JSON 格式的 span"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "kind": "SPAN_KIND_CLIENT" if self.kind in ("llm", "http") else "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otel_value(value)}
+                           for key, value in {"span.kind": self.kind, **self.attributes}.items()],
+            "status": {"code": "STATUS_CODE_ERROR" if self.status == "error" else "STATUS_CODE_OK"},
+        }
+
+
+def _otel_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class MetricsRegistry:
+    """线程安全的计数器、仪表和直方图，可按 Prometheus 文本格式导出"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._gauges: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], List[float]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+
+    def inc(self, name: str, labels: Dict[str, str], amount: float = 1.0, help_text: str = ""):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("counter", help_text))
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def set_gauge(self, name: str, labels: Dict[str, str], value: float, help_text: str = ""):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("gauge", help_text))
+            self._gauges[key] = value
+
+    def observe(self, name: str, labels: Dict[str, str], value: float, help_text: str = ""):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help_text))
+            # 每个桶一个计数，末尾两个位置分别为 +Inf 计数和总和
+            values = self._histograms.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            index = bisect_left(self.buckets, value)
+            for bucket in range(index, len(self.buckets)):
+                values[bucket] += 1
+            values[-2] += 1
+            values[-1] += value
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def histogram_count(self, name: str, **labels) -> float:
+        with self._lock:
+            values = self._histograms.get((name, tuple(sorted(labels.items()))))
+            return values[-2] if values else 0.0
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """按 Prometheus 文本暴露格式输出所有指标"""
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text) in sorted(self._help.items()):
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                if metric_type in ("counter", "gauge"):
+                    values = self._counters if metric_type == "counter" else self._gauges
+                    for (metric, labels), value in sorted(values.items()):
+                        if metric == name:
+                            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                    continue
+                for (metric, labels), values in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(self.buckets, values):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {count:g}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {values[-2]:g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {values[-2]:g}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {values[-1]:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value)}"'.replace("\n", " ") for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+class InMemorySpanExporter:
+    """把结束的跨度保存在内存中，便于测试和基准测试读取"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans: List[Span] = []
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def get_finished_spans(self, kind: Optional[str] = None, request_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self.spans)
+        return [span for span in spans
+                if (kind is None or span.kind == kind) and (request_id is None or span.trace_id == request_id)]
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+metrics = MetricsRegistry()
+_exporters: List[object] = []
+
+
+def add_span_exporter(exporter):
+    """注册跨度导出器，导出器需实现 export(span)"""
+    _exporters.append(exporter)
+
+
+def remove_span_exporter(exporter):
+    if exporter in _exporters:
+        _exporters.remove(exporter)
+
+
+def _finish(record: Span):
+    metrics.observe("minicascade_span_duration_seconds",
+                    {"kind": record.kind, "name": record.name, "status": record.status},
+                    record.duration_seconds, "Duration of graph nodes, tools, LLM and HTTP calls")
+    for exporter in list(_exporters):
+        try:
+            exporter.export(record)
+        except Exception as e:
+            # structured_logging 导入了本模块，只能在用到时再导入
+            from structured_logging import get_logger
+            get_logger(__name__).warning("导出跨度失败", span=record.name, exporter=type(exporter).__name__,
+                                         error=str(e))
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """
+    记录一个计时跨度
+
+    Args:
+        name: 跨度名称，如节点名、工具名
+        kind: 跨度类型：node、tool、llm、http 或 internal
+        attributes: 附加属性
+
+    Yields:
+        Span 对象，可继续设置属性；关闭埋点时为 None
+    """
+    if not INSTRUMENTATION_ENABLED:
+        yield None
+        return
+    parent = _current_span.get()
+    request_id = request_id_var.get() or (parent.trace_id if parent else None) or new_request_id()
+    record = Span(name=name, kind=kind, trace_id=request_id, span_id=uuid.uuid4().hex[:16],
+                  parent_span_id=parent.span_id if parent else None, start_ns=time.time_ns(),
+                  attributes={"request_id": request_id, **attributes})
+    token = _current_span.set(record)
+    try:
+        yield record
+    except BaseException as e:
+        record.status = "error"
+        record.attributes["error"] = repr(e)
+        raise
+    finally:
+        record.end_ns = time.time_ns()
+        _current_span.reset(token)
+        _finish(record)
+
+
+def record_llm_usage(record: Optional[Span], response, name: str):
+    """从大模型响应的 usage_metadata 中记录 token 用量"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens", 0)
+    output_tokens = usage.get("output_tokens", 0)
+    metrics.inc("minicascade_llm_calls_total", {"name": name}, help_text="Number of LLM calls")
+    if input_tokens or output_tokens:
+        metrics.inc("minicascade_llm_tokens_total", {"name": name, "direction": "input"}, input_tokens,
+                    "LLM token usage")
+        metrics.inc("minicascade_llm_tokens_total", {"name": name, "direction": "output"}, output_tokens,
+                    "LLM token usage")
+    if record is not None:
+        record.set_attribute("llm.input_tokens", input_tokens)
+        record.set_attribute("llm.output_tokens", output_tokens)
+
+
+def record_http_status(record: Optional[Span], status_code: int, name: str):
+    metrics.inc("minicascade_http_requests_total", {"name": name, "status": str(status_code)},
+                help_text="HTTP requests by status code")
+    if record is not None:
+        record.set_attribute("http.status_code", status_code)
+
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """
+    给图节点加上计时跨度，并把请求ID写入状态以便后续节点沿用
+
+    同时支持同步和异步节点。
+    """
+
+    def _enter(state) -> Tuple[str, bool]:
+        request_id = (state.get("request_id") if isinstance(state, dict) else None) or request_id_var.get()
+        return request_id or new_request_id(), not (isinstance(state, dict) and state.get("request_id"))
+
+    def _attach(update, request_id: str, is_new: bool):
+        if is_new and isinstance(update, dict):
+            update = {**update, "request_id": request_id}
+        return update
+
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_wrapper(state, *args, **kwargs):
+            request_id, is_new = _enter(state)
+            with request_context(request_id), span(name, kind="node"):
+                return _attach(await node(state, *args, **kwargs), request_id, is_new)
+        return async_wrapper
+
+    @functools.wraps(node)
+    def wrapper(state, *args, **kwargs):
+        request_id, is_new = _enter(state)
+        with request_context(request_id), span(name, kind="node"):
+            return _attach(node(state, *args, **kwargs), request_id, is_new)
+    return wrapper
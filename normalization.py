@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 16:40
+# @Author  : 周启航-开发
+# @File    : normalization.py
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing_extensions import Callable, Dict, Iterable, List, Tuple
+
+from langchain_core.messages import HumanMessage
+
+from date_parser import parse_date_locally, DailyDateMemo
+from deadline import wait_result
+from iata_index import get_iata_index
+from instrumentation import span, record_llm_usage
+from prompts import normalization_prompt
+from singleflight import SingleFlight
+from state import NormalizationBatch
+from structured_logging import get_logger
+
+log = get_logger(__name__)
+
+# 跨请求合并规范化任务的等待窗口和单批最大条目数，窗口为0时不等待
+NORMALIZATION_BATCH_WINDOW_MS = float(os.getenv("NORMALIZATION_BATCH_WINDOW_MS", "20"))
+NORMALIZATION_MAX_BATCH = int(os.getenv("NORMALIZATION_MAX_BATCH", "32"))
+
+# 条目类型：(kind, text)，kind 为 "date" 或 "city"
+Item = Tuple[str, str]
+
+
+class MicroBatcher:
+    """
+    将短时间窗口内到达的任务合并为一批执行
+
+    第一个到达的调用者成为本批次的执行者，等待窗口结束（或批次已满）后
+    一次性处理所有任务，再把结果分发给各自的等待者。
+    """
+
+    def __init__(self, run_batch: Callable[[List[Item]], Dict[Item, str]],
+                 window_seconds: float = NORMALIZATION_BATCH_WINDOW_MS / 1000,
+                 max_batch: int = NORMALIZATION_MAX_BATCH):
+        self._run_batch = run_batch
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._full = threading.Event()
+        self._pending: List[Tuple[List[Item], Future]] = []
+        self._pending_items = 0
+
+    def submit(self, items: List[Item]) -> Dict[Item, str]:
+        """提交一组条目并阻塞等待所在批次的结果，最多等到当前请求的截止时间"""
+        future = Future()
+        with self._lock:
+            self._pending.append((items, future))
+            self._pending_items += len(items)
+            is_leader = len(self._pending) == 1
+            if self._pending_items >= self.max_batch:
+                self._full.set()
+        if is_leader:
+            self._flush()
+        return wait_result(future, "normalization")
+
+    def _flush(self):
+        if self.window_seconds > 0:
+            self._full.wait(self.window_seconds)
+        with self._lock:
+            batch, self._pending, self._pending_items = self._pending, [], 0
+            self._full.clear()
+            self.batches += 1
+        unique_items = list(dict.fromkeys(item for items, _ in batch for item in items))
+        try:
+            results = self._run_batch(unique_items)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for items, future in batch:
+            future.set_result({item: results[item] for item in items if item in results})
+
+
+class QueryNormalizer:
+    """
+    航班查询参数的规范化：日期描述转 YYYY-MM-DD，城市名转IATA代码
+
+    能用本地规则（日期解析器、机场索引、按天缓存）解决的条目不调用大模型；
+    剩余条目合并为一次结构化输出调用，并与并发请求的条目做微批合并。
+    """
+
+    def __init__(self, get_model: Callable[[], object]):
+        self._get_model = get_model
+        self._date_memo = DailyDateMemo()
+        self.batcher = MicroBatcher(self._normalize_with_llm)
+        # 已提交给大模型、尚未返回的条目；相同条目的并发请求等待同一次结果
+        self.inflight = SingleFlight("normalization")
+
+    def _normalize_with_llm(self, items: List[Item]) -> Dict[Item, str]:
+        today = datetime.now().date()
+        lines = "\n".join(f'{index}. id="{index}" kind="{kind}" text="{text}"'
+                          for index, (kind, text) in enumerate(items))
+        prompt = normalization_prompt.format(date=today.isoformat(), items=lines)
+        structured_model = self._get_model().with_structured_output(NormalizationBatch)
+        with span("normalization", kind="llm", batch_size=len(items)) as record:
+            response = structured_model.invoke([HumanMessage(content=prompt)])
+            record_llm_usage(record, response, "normalization")
+
+        results = {}
+        for entry in response.items:
+            if not entry.id.isdigit() or int(entry.id) >= len(items):
+                continue
+            kind, text = items[int(entry.id)]
+            value = entry.value.strip()
+            if kind == "date":
+                try:
+                    datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    continue
+                self._date_memo.put(text, value, today)
+            else:
+                value = value.upper()
+                if len(value) != 3 or not value.isalpha():
+                    continue
+                # 写回本地别名库，下次不再调用大模型
+                get_iata_index().learn(text, value)
+            results[(kind, text)] = value
+        return results
+
+    def _resolve_locally(self, dates: Iterable[str], cities: Iterable[str]):
+        today = datetime.now().date()
+        resolved = {"dates": {}, "cities": {}}
+        unresolved: List[Item] = []
+        for text in dates:
+            value = parse_date_locally(text, today) or self._date_memo.get(text, today)
+            if value:
+                resolved["dates"][text] = value
+            else:
+                unresolved.append(("date", text))
+        for text in cities:
+            value = get_iata_index().lookup(text)
+            if value:
+                resolved["cities"][text] = value
+            else:
+                unresolved.append(("city", text))
+        return resolved, unresolved
+
+    def _submit_coalesced(self, items: List[Item]) -> Dict[Item, str]:
+        """
+        提交需要大模型的条目，其他请求正在规范化的相同条目不再重复提交
+
+        本调用负责的条目先提交并发布结果，再等待其他请求负责的条目，因此不会互相等待。
+        日期条目的结果依赖当天日期，键中包含日期。
+        """
+        if not self.inflight.enabled:
+            return self.batcher.submit(items)
+        today = datetime.now().date().isoformat()
+        joined = [(item, *self.inflight.join((*item, today) if item[0] == "date" else item)) for item in items]
+        own = [(item, call) for item, call, leader in joined if leader]
+        if own:
+            try:
+                results = self.batcher.submit([item for item, _ in own])
+            except BaseException as e:
+                for _, call in own:
+                    call.fail(e)
+                raise
+            for item, call in own:
+                call.resolve(results.get(item))
+        merged = {item: call.result() for item, call, _ in joined}
+        return {item: value for item, value in merged.items() if value is not None}
+
+    @staticmethod
+    def _merge(resolved: dict, unresolved: List[Item], results: Dict[Item, str]) -> Dict[str, Dict[str, str]]:
+        for kind, text in unresolved:
+            # 如果转换失败，返回原始字符串
+            resolved["dates" if kind == "date" else "cities"][text] = results.get((kind, text), text)
+        return resolved
+
+    def normalize(self, dates: Iterable[str] = (), cities: Iterable[str] = ()) -> Dict[str, Dict[str, str]]:
+        """
+        规范化日期和城市名
+
+        Args:
+            dates: 日期描述列表
+            cities: 城市名列表
+
+        Returns:
+            {"dates": {原始描述: 日期}, "cities": {原始城市名: IATA代码}}，
+            无法规范化的条目保留原始字符串
+        """
+        resolved, unresolved = self._resolve_locally(dates, cities)
+        results = {}
+        if unresolved:
+            try:
+                results = self._submit_coalesced(unresolved)
+            except Exception as e:
+                log.warning("规范化查询参数失败，保留原始值", items=len(unresolved), error=str(e))
+        return self._merge(resolved, unresolved, results)
+
+    async def anormalize(self, dates: Iterable[str] = (), cities: Iterable[str] = ()) -> Dict[str, Dict[str, str]]:
+        """
+        normalize 的异步版本
+
+        本地规则在事件循环中直接执行；需要大模型的条目交给线程等待微批结果，
+        从而与同步调用方的条目合并在同一批次中。
+        """
+        resolved, unresolved = self._resolve_locally(dates, cities)
+        results = {}
+        if unresolved:
+            try:
+                results = await asyncio.to_thread(self._submit_coalesced, unresolved)
+            except Exception as e:
+                log.warning("规范化查询参数失败，保留原始值", items=len(unresolved), error=str(e))
+        return self._merge(resolved, unresolved, results)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 18:10
+# @Author  : 周启航-开发
+# @File    : plan_stream.py
+import json
+import re
+from typing_extensions import List
+
+_TASKS_START_RE = re.compile(r'"tasks"\s*:\s*\[')
+
+
+def is_valid_task(task) -> bool:
+    """检查任务对象是否包含执行所需的全部字段"""
+    return (isinstance(task, dict)
+            and isinstance(task.get("id"), str) and task["id"]
+            and isinstance(task.get("tool_needed"), str)
+            and isinstance(task.get("dependencies", []), list)
+            and isinstance(task.get("parameters"), dict))
+
+
+class IncrementalPlanParser:
+    """
+    增量解析规划器流式输出的JSON计划
+
+    每收到一段文本就扫描 "tasks" 数组，任务对象的右括号一出现就解析并校验该任务，
+    不必等待整个JSON生成完毕。输出末尾格式错误时，已解析出的任务仍然有效。
+    close 之后 complete 表示输出是否完整：整段 JSON 可解析、tasks 数组已闭合且没有被丢弃的任务。
+    """
+
+    def __init__(self):
+        self.tasks: List[dict] = []
+        self.invalid_tasks = 0
+        self.complete = False
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._array_done = False
+        self._depth = 0
+        self._object_start = -1
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        """
+        追加一段模型输出
+
+        Args:
+            chunk: 新生成的文本
+
+        Returns:
+            本段文本中新完成且校验通过的任务列表
+        """
+        self._buffer += chunk or ""
+        if not self._in_array and not self._array_done:
+            match = _TASKS_START_RE.search(self._buffer)
+            if not match:
+                return []
+            self._in_array = True
+            self._pos = match.end()
+
+        completed = []
+        while self._in_array and self._pos < len(self._buffer):
+            ch = self._buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._object_start = self._pos
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    task = self._parse_object(self._buffer[self._object_start:self._pos + 1])
+                    if task is not None:
+                        completed.append(task)
+            elif ch == "]" and self._depth == 0:
+                self._in_array = False
+                self._array_done = True
+            self._pos += 1
+        return completed
+
+    def _parse_object(self, text: str):
+        try:
+            task = json.loads(text)
+        except ValueError:
+            self.invalid_tasks += 1
+            return None
+        if not is_valid_task(task) or any(existing["id"] == task["id"] for existing in self.tasks):
+            self.invalid_tasks += 1
+            return None
+        task.setdefault("dependencies", [])
+        self.tasks.append(task)
+        return task
+
+    def close(self) -> dict:
+        """
+        结束解析并返回完整计划
+
+        Returns:
+            完整JSON可解析时返回原计划（任务替换为校验通过的任务），否则只包含已解析的任务
+
+        Raises:
+            ValueError: 没有解析出任何有效任务
+        """
+        plan = {}
+        try:
+            parsed = json.loads(self._buffer)
+            if isinstance(parsed, dict):
+                plan = parsed
+        except ValueError:
+            pass
+        self.complete = (bool(plan) and self._array_done and not self.invalid_tasks
+                         and isinstance(plan.get("tasks"), list) and len(plan["tasks"]) == len(self.tasks))
+        if not self.tasks:
+            raise ValueError("规划器输出中没有可执行的任务")
+        plan["tasks"] = list(self.tasks)
+        return plan
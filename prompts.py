@@ -71,8 +71,10 @@ You must return a valid JSON object with the following structure:
             "dependencies": ["list_of_dependent_task_ids"],
             "parameters": {parameter_dictionary}
         }
-    ]
+    ],
+    "passenger_name": "the traveller's name exactly as the user wrote it, or an empty string if the user did not give one"
 }
+Never invent a passenger name.
 </Output Format>
 <Strict Requirements>
 1. Return ONLY the valid JSON object - no explanatory text
@@ -92,7 +94,7 @@ Follow these steps:
 </Planning Strategy>
 <Available Tools> 
 You have access to the following tools for planning:
-1. **search_flights**: Search for flights to a destination on a specific date (parameters: home, destination, date)  home and destination must be chinese
+1. **search_flights**: Search for flights to a destination on a specific date (parameters: home, destination, date; optional: max_price, earliest_departure, latest_departure as HH:MM, preferred_airline as a 2-letter airline code, flex_days as the number of days the date may move either way when the user's date is flexible - only include optional parameters the user asked for)  home and destination must be chinese
 2. **search_hotels_with_llm**: Search for hotels in a destination for specific dates (parameters: destination, check_in_date, check_out_date)  destination must be chinese
 3. **get_today_str**: Get today's date (parameters: date)
 </Available Tools>
@@ -111,3 +113,26 @@ book_prompt = f"""
    5. 格式为JSON对象
    """
 
+# 批量规范化日期和城市名，一次调用同时处理多个请求中无法本地解析的条目
+normalization_prompt = """You normalize travel query fields. For context, today's date is {date}.
+
+<Task>
+For every input item return its normalized value:
+- kind "date": a relative or absolute date description (usually Chinese) -> YYYY-MM-DD. The year follows today's date.
+- kind "city": a city or airport name -> the 3-letter IATA code of that city's main airport.
+  If unsure, return the most common international airport code of that country/region.
+</Task>
+
+<Examples>
+date 下周一 -> 2025-10-20 (today 2025-10-14)
+date 十月二十号 -> 2025-10-20
+city 北京 -> PEK
+city 长沙 -> CSX
+</Examples>
+
+<Items>
+{items}
+</Items>
+
+Return exactly one entry per item, copying its id.
+"""
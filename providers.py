@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 20:40
+# @Author  : 周启航-开发
+# @File    : providers.py
+import os
+import threading
+from typing_extensions import Callable, Dict, Optional
+
+from deadline import await_with_timeout, call_timeout, raise_if_expired, run_with_timeout
+from rate_limit import UpstreamGuard, build_guard
+
+# 默认使用的对话模型
+CHAT_MODEL_NAME = os.getenv("CHAT_MODEL_NAME", "deepseek-ai/DeepSeek-V3")
+CHAT_MODEL_TEMPERATURE = float(os.getenv("CHAT_MODEL_TEMPERATURE", "0.7"))
+# 预估 token 时计入的输出 token 数
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "256"))
+# 单次大模型调用的超时（秒），0 表示只受请求的时间预算限制
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def load_env():
+    """加载 .env 文件，整个进程只执行一次"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _env_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _env_loaded = True
+
+
+class ProviderRegistry:
+    """
+    共享客户端的延迟注册表
+
+    每个名称对应一个工厂函数，首次 get 时才创建实例（同时才导入相关的重量级依赖），
+    之后所有调用方共享同一个实例。override 用于在测试或基准测试中替换实例。
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], object]] = {}
+        self._instances: Dict[str, object] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], object]):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"未注册的提供者: {name}")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def override(self, name: str, instance):
+        """用给定实例替换提供者，直到 reset 为止"""
+        with self._lock:
+            self._instances[name] = instance
+
+    def reset(self, name: str):
+        """丢弃已创建的实例，下次 get 时重新创建"""
+        with self._lock:
+            self._instances.pop(name, None)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+
+def _build_chat_model():
+    load_env()
+    # langchain_openai 及其依赖的 openai SDK 导入耗时较长，推迟到第一次调用模型时
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=CHAT_MODEL_NAME,
+        temperature=CHAT_MODEL_TEMPERATURE,
+        api_key=os.getenv("SILICON_API_KEY"),
+        base_url=os.getenv("SILICON_BASE_URL"),
+        timeout=LLM_REQUEST_TIMEOUT or None,
+    )
+
+
+def _build_llm_guard() -> UpstreamGuard:
+    load_env()
+    # 速率为 0 表示不限；并发上限在遇到 429/超时时自动收紧
+    return build_guard("llm",
+                       per_minute=float(os.getenv("LLM_RPM", "0")),
+                       tokens_per_minute=float(os.getenv("LLM_TPM", "0")),
+                       max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+                       min_concurrency=int(os.getenv("LLM_MIN_CONCURRENCY", "1")))
+
+
+def _message_chars(messages) -> int:
+    if isinstance(messages, str):
+        return len(messages)
+    contents = (getattr(message, "content", message) for message in messages)
+    return sum(len(content) for content in contents if isinstance(content, str))
+
+
+def _usage_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+class GovernedModel:
+    """
+    对话模型的代理，invoke/ainvoke/stream 都经过 LLM 的限流组合
+
+    token 数按字符数预估（中文约 1.5 字符一个 token，另加预期输出），调用结束后用
+    usage_metadata 中的实际用量修正；其他属性直接转发给被代理的模型。
+    每次调用的超时取 LLM_REQUEST_TIMEOUT 与请求剩余预算中较小的一个，预算用完时抛出 DeadlineExceeded。
+    """
+
+    def __init__(self, inner, guard: UpstreamGuard):
+        self.inner = inner
+        self.guard = guard
+
+    def __getattr__(self, name: str):
+        return getattr(self.inner, name)
+
+    def _estimate_tokens(self, messages) -> float:
+        return _message_chars(messages) / 1.5 + LLM_EXPECTED_OUTPUT_TOKENS
+
+    def invoke(self, messages, *args, **kwargs):
+        with self.guard.guard(self._estimate_tokens(messages)) as lease:
+            response = run_with_timeout("llm", call_timeout("llm", LLM_REQUEST_TIMEOUT or None),
+                                        self.inner.invoke, messages, *args, **kwargs)
+            lease.settle(_usage_tokens(response))
+        return response
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        async with self.guard.aguard(self._estimate_tokens(messages)) as lease:
+            response = await await_with_timeout("llm", call_timeout("llm", LLM_REQUEST_TIMEOUT or None),
+                                                self.inner.ainvoke(messages, *args, **kwargs))
+            lease.settle(_usage_tokens(response))
+        return response
+
+    def stream(self, messages, *args, **kwargs):
+        with self.guard.guard(self._estimate_tokens(messages)) as lease:
+            call_timeout("llm")
+            usage = None
+            for chunk in self.inner.stream(messages, *args, **kwargs):
+                # 每个分片到达时检查预算，用完时停止读取（关闭生成器会断开连接）
+                raise_if_expired("llm")
+                usage = _usage_tokens(chunk) or usage
+                yield chunk
+            lease.settle(usage)
+
+    def with_structured_output(self, *args, **kwargs) -> "GovernedModel":
+        return GovernedModel(self.inner.with_structured_output(*args, **kwargs), self.guard)
+
+    def bind_tools(self, *args, **kwargs) -> "GovernedModel":
+        return GovernedModel(self.inner.bind_tools(*args, **kwargs), self.guard)
+
+
+registry = ProviderRegistry()
+registry.register("chat_model", _build_chat_model)
+registry.register("llm_guard", _build_llm_guard)
+_governed_model: Optional[GovernedModel] = None
+
+
+def get_chat_model() -> GovernedModel:
+    """返回进程内共享的对话模型客户端，调用经过 LLM 的限流组合"""
+    global _governed_model
+    model, guard = registry.get("chat_model"), registry.get("llm_guard")
+    governed = _governed_model
+    if governed is None or governed.inner is not model or governed.guard is not guard:
+        governed = _governed_model = GovernedModel(model, guard)
+    return governed
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 09:10
+# @Author  : 周启航-开发
+# @File    : rate_limit.py
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing_extensions import Callable, Deque, Optional
+
+from deadline import DeadlineExceeded, call_timeout
+from instrumentation import metrics
+
+# 这些状态码表示上游过载，触发并发上限的乘性减小
+OVERLOAD_STATUS = {429, 503}
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """判断异常是否表示上游过载：429/503、超时，或 SDK 的限流异常"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    if type(error).__name__ in ("RateLimitError", "APITimeoutError", "TimeoutException", "ReadTimeout",
+                                "ConnectTimeout", "PoolTimeout"):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status in OVERLOAD_STATUS
+
+
+class TokenBucket:
+    """
+    令牌桶限速器，线程和协程共用
+
+    采用预约方式：调用方先扣除令牌（余额可以为负），再按欠额计算需要等待的时间，
+    因此并发调用方按到达顺序依次放行，不会出现惊群。rate 为 0 表示不限速。
+    """
+
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None):
+        self.rate = rate_per_second
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def _reserve_within(self, amount: float, timeout: Optional[float]) -> Optional[float]:
+        wait = self._reserve(amount)
+        if timeout is not None and wait > timeout:
+            # 等不到令牌，撤销预约
+            self.refund(amount)
+            return None
+        return wait
+
+    def acquire(self, amount: float = 1.0, timeout: Optional[float] = None) -> Optional[float]:
+        """取出令牌，必要时阻塞等待，返回等待的秒数；需要等待超过 timeout 秒时不取令牌，返回 None"""
+        if self.rate <= 0:
+            return 0.0
+        wait = self._reserve_within(amount, timeout)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, amount: float = 1.0, timeout: Optional[float] = None) -> Optional[float]:
+        """acquire 的异步版本，等待时不阻塞事件循环"""
+        if self.rate <= 0:
+            return 0.0
+        wait = self._reserve_within(amount, timeout)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+    def refund(self, amount: float):
+        """归还预估多扣的令牌（amount 为负时补扣）"""
+        if self.rate <= 0 or not amount:
+            return
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class AimdLimiter:
+    """
+    AIMD 自适应并发上限
+
+    每次成功调用使上限增加 increase/上限（约每轮往返加 1），遇到过载时上限乘以 decrease，
+    冷却时间内多次过载只减一次。同步和异步调用方在同一个 FIFO 队列中等待。
+    """
+
+    def __init__(self, name: str, max_limit: int, min_limit: int = 1, initial: Optional[int] = None,
+                 increase: float = 1.0, decrease: float = 0.5, cooldown: float = 1.0):
+        self.name = name
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(initial or self.max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.overloads = 0
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._waiters: Deque[Callable[[], None]] = deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _has_capacity(self) -> bool:
+        return self._in_flight < int(self.limit)
+
+    def _wake_waiters(self):
+        # 调用方需持有 self._lock；名额在这里直接分配给等待者
+        while self._waiters and self._has_capacity():
+            self._in_flight += 1
+            self._waiters.popleft()()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """占用一个名额；timeout 秒内没有轮到时放弃排队并返回 False"""
+        with self._lock:
+            if self._has_capacity() and not self._waiters:
+                self._in_flight += 1
+                return True
+            event = threading.Event()
+            self._waiters.append(event.set)
+        if event.wait(timeout):
+            return True
+        with self._lock:
+            if event.set in self._waiters:
+                self._waiters.remove(event.set)
+                return False
+        # 放弃前刚好分配到了名额
+        return True
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            # 等待者已取消时把分配到的名额还回去
+            if future.cancelled():
+                self.release()
+            elif not future.done():
+                future.set_result(None)
+
+        def waker():
+            try:
+                loop.call_soon_threadsafe(grant)
+            except RuntimeError:
+                # 事件循环已关闭
+                self.release()
+
+        with self._lock:
+            if self._has_capacity() and not self._waiters:
+                self._in_flight += 1
+                return
+            self._waiters.append(waker)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = waker in self._waiters
+                if queued:
+                    self._waiters.remove(waker)
+            if not queued and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._wake_waiters()
+
+    def on_success(self):
+        with self._lock:
+            self.limit = min(float(self.max_limit), self.limit + self.increase / max(1.0, self.limit))
+            self._wake_waiters()
+
+    def on_overload(self):
+        now = time.monotonic()
+        with self._lock:
+            self.overloads += 1
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self.limit = max(float(self.min_limit), self.limit * self.decrease)
+        metrics.inc("minicascade_upstream_overload_total", {"upstream": self.name},
+                    help_text="Upstream overload responses (429/503/timeout) that shrank the concurrency limit")
+
+
+class Lease:
+    """一次受控调用的凭据，调用结束后可用实际 token 数修正预估"""
+
+    def __init__(self, guard: "UpstreamGuard", estimated_tokens: float):
+        self._guard = guard
+        self.estimated_tokens = estimated_tokens
+
+    def settle(self, actual_tokens: Optional[float]):
+        if actual_tokens is not None and self._guard.token_bucket is not None:
+            self._guard.token_bucket.refund(self.estimated_tokens - actual_tokens)
+
+
+class UpstreamGuard:
+    """
+    一个上游服务的限流组合：自适应并发上限 + 请求速率令牌桶 +（可选）token 速率令牌桶
+
+    先占并发名额，再取速率令牌；调用抛出过载异常时减小并发上限，成功时缓慢增大。
+    排队等待不超过当前请求剩余的时间预算，等不到时抛出 DeadlineExceeded。
+    """
+
+    def __init__(self, name: str, governor: AimdLimiter, request_bucket: Optional[TokenBucket] = None,
+                 token_bucket: Optional[TokenBucket] = None):
+        self.name = name
+        self.governor = governor
+        self.request_bucket = request_bucket
+        self.token_bucket = token_bucket
+
+    def _record(self, waited: float):
+        metrics.observe("minicascade_rate_limit_wait_seconds", {"upstream": self.name}, waited,
+                        "Time spent waiting for a concurrency slot and rate-limit tokens")
+        metrics.set_gauge("minicascade_concurrency_limit", {"upstream": self.name}, self.governor.limit,
+                          "Current adaptive concurrency limit per upstream")
+
+    def _finish(self, error: Optional[BaseException]):
+        if error is None:
+            self.governor.on_success()
+        elif is_overload_error(error):
+            self.governor.on_overload()
+
+    @contextmanager
+    def guard(self, tokens: float = 0.0):
+        started = time.monotonic()
+        if not self.governor.acquire(call_timeout(self.name)):
+            raise DeadlineExceeded(self.name)
+        try:
+            if self.request_bucket is not None and self.request_bucket.acquire(timeout=call_timeout(self.name)) is None:
+                raise DeadlineExceeded(self.name)
+            if (self.token_bucket is not None and tokens
+                    and self.token_bucket.acquire(tokens, timeout=call_timeout(self.name)) is None):
+                raise DeadlineExceeded(self.name)
+            self._record(time.monotonic() - started)
+            try:
+                yield Lease(self, tokens)
+            except BaseException as e:
+                self._finish(e)
+                raise
+            self._finish(None)
+        finally:
+            self.governor.release()
+
+    @asynccontextmanager
+    async def aguard(self, tokens: float = 0.0):
+        started = time.monotonic()
+        try:
+            # aacquire 在取消时会归还名额
+            await asyncio.wait_for(self.governor.aacquire(), call_timeout(self.name))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(self.name) from None
+        try:
+            if (self.request_bucket is not None
+                    and await self.request_bucket.aacquire(timeout=call_timeout(self.name)) is None):
+                raise DeadlineExceeded(self.name)
+            if (self.token_bucket is not None and tokens
+                    and await self.token_bucket.aacquire(tokens, timeout=call_timeout(self.name)) is None):
+                raise DeadlineExceeded(self.name)
+            self._record(time.monotonic() - started)
+            try:
+                yield Lease(self, tokens)
+            except BaseException as e:
+                self._finish(e)
+                raise
+            self._finish(None)
+        finally:
+            self.governor.release()
+
+
+def build_guard(name: str, per_minute: float = 0.0, per_second: float = 0.0, tokens_per_minute: float = 0.0,
+                max_concurrency: int = 32, min_concurrency: int = 1) -> UpstreamGuard:
+    """按配置创建上游限流组合，速率为 0 表示不限"""
+    rate = per_second or per_minute / 60
+    return UpstreamGuard(
+        name,
+        AimdLimiter(name, max_limit=max_concurrency, min_limit=min_concurrency),
+        # 容量为 1 秒的量，允许小幅突发
+        request_bucket=TokenBucket(rate, capacity=max(1.0, rate)) if rate > 0 else None,
+        token_bucket=TokenBucket(tokens_per_minute / 60, capacity=tokens_per_minute / 6)
+        if tokens_per_minute > 0 else None,
+    )
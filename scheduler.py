@@ -0,0 +1,434 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/18 13:05
+# @Author  : 周启航-开发
+# @File    : scheduler.py
+import asyncio
+import contextvars
+import copy
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing_extensions import Awaitable, Callable, Dict, Hashable, List, Optional
+
+from deadline import DeadlineExceeded
+from instrumentation import metrics
+
+# 单次计划执行时同时运行的最大任务数
+DEFAULT_MAX_PARALLELISM = int(os.getenv("PLAN_MAX_PARALLELISM", "4"))
+
+# 返回任务的推测键：None 表示该任务不做推测执行；依赖完成后键不变则沿用推测结果
+SpeculationKey = Callable[[dict], Optional[Hashable]]
+
+
+class PlanValidationError(ValueError):
+    """执行计划结构非法（重复ID、缺失依赖或循环依赖）"""
+
+
+class TaskFailure(Exception):
+    """任务执行失败，message 为直接返回给用户的提示信息；timed_out 表示因时间预算用完而未完成"""
+
+    def __init__(self, task_id: str, message: str, timed_out: bool = False):
+        super().__init__(message)
+        self.task_id = task_id
+        self.message = message
+        self.timed_out = timed_out
+
+
+def _as_failure(task: dict, error: Exception) -> TaskFailure:
+    if isinstance(error, TaskFailure):
+        return error
+    if isinstance(error, DeadlineExceeded):
+        return TaskFailure(task["id"], f"任务 {task['id']} 超出时间预算（{error.stage}）", timed_out=True)
+    return TaskFailure(task["id"], f"执行任务 {task['id']} 失败: {str(error)}")
+
+
+def _timed_out(task: dict) -> TaskFailure:
+    return TaskFailure(task["id"], f"任务 {task['id']} 在时间预算内未完成", timed_out=True)
+
+
+def topological_waves(tasks: List[dict], executed_tasks: Optional[List[str]] = None) -> List[List[dict]]:
+    """
+    校验执行计划并按拓扑层次分组
+
+    Args:
+        tasks: 执行计划中的任务列表
+        executed_tasks: 已执行的任务ID，这些任务视为已满足的依赖
+
+    Returns:
+        按层次排列的任务列表，同一层内的任务互不依赖，可以并发执行
+
+    Raises:
+        PlanValidationError: 任务ID重复、依赖不存在或存在循环依赖
+    """
+    done = set(executed_tasks or [])
+    by_id: Dict[str, dict] = {}
+    for task in tasks:
+        task_id = task.get("id")
+        if not task_id:
+            raise PlanValidationError("任务缺少 id 字段")
+        if task_id in by_id:
+            raise PlanValidationError(f"任务ID重复: {task_id}")
+        by_id[task_id] = task
+
+    for task in tasks:
+        missing = [dep for dep in task.get("dependencies", []) if dep not in by_id and dep not in done]
+        if missing:
+            raise PlanValidationError(f"任务 {task['id']} 依赖了不存在的任务: {missing}")
+
+    pending = {task_id: task for task_id, task in by_id.items() if task_id not in done}
+    waves = []
+    while pending:
+        ready = [task for task_id, task in pending.items()
+                 if all(dep in done for dep in task.get("dependencies", []))]
+        if not ready:
+            raise PlanValidationError(f"任务之间存在循环依赖: {sorted(pending)}")
+        waves.append(ready)
+        for task in ready:
+            done.add(task["id"])
+            pending.pop(task["id"])
+    return waves
+
+
+class SpeculationStats:
+    """推测执行的进程级统计：命中、未命中（参数已变化）、放弃（依赖失败）和被丢弃结果的耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "abandoned": 0, "wasted_seconds": 0.0}
+
+    def record(self, tool: str, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+        metrics.inc("minicascade_speculation_total", {"tool": tool, "outcome": outcome},
+                    help_text="Speculative task runs by outcome (hit: result kept, miss/abandoned: discarded)")
+
+    def add_waste(self, tool: str, seconds: float):
+        with self._lock:
+            self._counts["wasted_seconds"] += seconds
+        metrics.inc("minicascade_speculation_wasted_seconds_total", {"tool": tool}, seconds,
+                    "Run time of speculative tasks whose result was discarded")
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._counts)
+        decided = stats["hits"] + stats["misses"] + stats["abandoned"]
+        stats["hit_rate"] = stats["hits"] / decided if decided else 0.0
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._counts = {"hits": 0, "misses": 0, "abandoned": 0, "wasted_seconds": 0.0}
+
+
+speculation_stats = SpeculationStats()
+
+
+class Speculation:
+    """
+    一个依赖尚未完成、按当前参数提前启动的任务
+
+    future 可以是线程池的 Future 或 asyncio 任务；依赖完成后若推测键不变，
+    调度器直接沿用 future 的结果，否则丢弃它并用更新后的参数重新执行。
+    """
+
+    def __init__(self, task: dict, key: Hashable, future):
+        self.tool = task.get("tool_needed", "")
+        self.key = key
+        self.future = future
+        self.elapsed: Optional[float] = None
+        started = time.perf_counter()
+
+        def finished(_):
+            self.elapsed = time.perf_counter() - started
+        future.add_done_callback(finished)
+
+    @staticmethod
+    def task_copy(task: dict) -> dict:
+        # 推测执行使用参数的快照，之后依赖完成时对原任务参数的修改不会影响它
+        return {**task, "parameters": copy.deepcopy(task.get("parameters", {})), "speculative": True}
+
+    def adopt(self):
+        speculation_stats.record(self.tool, "hits")
+
+    def discard(self, outcome: str):
+        """丢弃推测结果：尚未开始的直接取消，已完成或运行中的计入浪费的耗时"""
+        speculation_stats.record(self.tool, outcome)
+        self.future.cancel()
+
+        def wasted(future):
+            # 取走被丢弃结果中的异常，避免 asyncio 报告 "exception was never retrieved"
+            if not future.cancelled():
+                future.exception()
+            speculation_stats.add_waste(self.tool, self.elapsed or 0.0)
+        self.future.add_done_callback(wasted)
+
+
+class PlanDispatcher:
+    """
+    增量式任务调度器：任务可以逐个加入，依赖满足的任务立即提交到线程池
+
+    用于规划器流式输出计划时边解析边执行。某个任务失败后不再提交新任务，
+    已在运行的任务会继续完成并保留结果。提供 speculation_key 时，依赖未满足的任务
+    会按当前参数提前执行，见 Speculation。finish 超时后放弃仍在运行的任务，它们之后的结果不再写入。
+    """
+
+    def __init__(self,
+                 run_task: Callable[[dict], object],
+                 executed_tasks: List[str],
+                 task_results: dict,
+                 max_parallelism: Optional[int] = None,
+                 on_task_done: Optional[Callable[[dict, object], None]] = None,
+                 speculation_key: Optional[SpeculationKey] = None):
+        self._run_task = run_task
+        self.executed_tasks = executed_tasks
+        self.task_results = task_results
+        self._on_task_done = on_task_done
+        self._speculation_key = speculation_key
+        self._speculations: Dict[str, Speculation] = {}
+        # 任务在创建调度器时的上下文中运行，使请求ID等上下文变量在工作线程中可见
+        self._context = contextvars.copy_context()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_parallelism or DEFAULT_MAX_PARALLELISM),
+                                            thread_name_prefix="plan-task")
+        self._cond = threading.Condition()
+        self._order: Dict[str, int] = {}
+        self._pending: Dict[str, dict] = {}
+        self._running = 0
+        self._in_flight: Dict[str, tuple] = {}
+        self._closed = False
+        self.failures: List[TaskFailure] = []
+
+    def add(self, task: dict):
+        """
+        加入一个任务，依赖已满足时立即开始执行
+
+        Raises:
+            PlanValidationError: 任务ID重复
+        """
+        with self._cond:
+            if task["id"] in self._order:
+                raise PlanValidationError(f"任务ID重复: {task['id']}")
+            self._order[task["id"]] = len(self._order)
+            if task["id"] in self.executed_tasks:
+                return
+            self._pending[task["id"]] = task
+            self._submit_ready()
+            if task["id"] in self._pending and not self.failures:
+                self._speculate(task)
+
+    def _speculate(self, task: dict):
+        # 调用方需持有 self._cond
+        key = self._speculation_key(task) if self._speculation_key else None
+        if key is None:
+            return
+        future = self._executor.submit(self._context.copy().run, self._run_task, Speculation.task_copy(task))
+        self._speculations[task["id"]] = Speculation(task, key, future)
+
+    def _submit_ready(self):
+        # 调用方需持有 self._cond
+        if self.failures:
+            return
+        for task_id, task in list(self._pending.items()):
+            if task_id not in self._pending:
+                continue
+            if all(dep in self.executed_tasks for dep in task.get("dependencies", [])):
+                self._pending.pop(task_id)
+                self._running += 1
+                speculation = self._speculations.pop(task_id, None)
+                if speculation is not None and self._speculation_key(task) == speculation.key:
+                    speculation.adopt()
+                    self._in_flight[task_id] = (task, speculation.future)
+                    speculation.future.add_done_callback(functools.partial(self._on_done, task))
+                    continue
+                if speculation is not None:
+                    speculation.discard("misses")
+                future = self._executor.submit(self._context.copy().run, self._run_task, task)
+                self._in_flight[task_id] = (task, future)
+                future.add_done_callback(functools.partial(self._on_done, task))
+
+    def _on_done(self, task: dict, future):
+        with self._cond:
+            self._running -= 1
+            self._in_flight.pop(task["id"], None)
+            if self._closed:
+                return
+            try:
+                result = future.result()
+            except Exception as e:
+                self.failures.append(_as_failure(task, e))
+            else:
+                self.executed_tasks.append(task["id"])
+                self.task_results[task["id"]] = result
+                if self._on_task_done:
+                    self._on_task_done(task, result)
+            self._submit_ready()
+            self._cond.notify_all()
+
+    @property
+    def pending_tasks(self) -> List[dict]:
+        """依赖始终未满足、没有被执行的任务"""
+        with self._cond:
+            return list(self._pending.values())
+
+    def finish(self, timeout: Optional[float] = None) -> Optional[TaskFailure]:
+        """
+        等待所有已提交的任务结束并关闭线程池
+
+        Args:
+            timeout: 最多等待的秒数；超时后仍在运行的任务记为超时失败，不再等待它们
+
+        Returns:
+            第一个失败任务对应的 TaskFailure，没有失败时返回 None
+        """
+        with self._cond:
+            finished = self._cond.wait_for(lambda: self._running == 0, timeout)
+            if not finished:
+                self._closed = True
+                for task, future in self._in_flight.values():
+                    future.cancel()
+                    self.failures.append(_timed_out(task))
+            # 依赖失败或始终未满足的任务，其推测结果不再需要
+            for speculation in self._speculations.values():
+                speculation.discard("abandoned")
+            self._speculations.clear()
+        # 超时时不等待仍在运行的线程，它们受各自调用的超时限制，很快会结束
+        self._executor.shutdown(wait=finished, cancel_futures=not finished)
+        if self.failures:
+            return min(self.failures, key=lambda failure: self._order.get(failure.task_id, len(self._order)))
+        return None
+
+
+def execute_plan(tasks: List[dict],
+                 run_task: Callable[[dict], object],
+                 executed_tasks: List[str],
+                 task_results: dict,
+                 max_parallelism: Optional[int] = None,
+                 on_task_done: Optional[Callable[[dict, object], None]] = None,
+                 speculation_key: Optional[SpeculationKey] = None,
+                 timeout: Optional[float] = None) -> Optional[TaskFailure]:
+    """
+    按依赖关系并发执行计划中的任务
+
+    任务在其全部依赖完成后立即提交到线程池，因此总耗时接近关键路径而不是所有工具耗时之和。
+    某个任务失败后不再提交新任务，但会等待已在运行的任务结束并保留它们的结果。
+    超过 timeout 后不再等待，已完成任务的结果保留，未完成的任务记为超时失败。
+
+    Args:
+        tasks: 执行计划中的任务列表
+        run_task: 执行单个任务的函数，失败时抛出 TaskFailure
+        executed_tasks: 已执行的任务ID列表，会被原地更新
+        task_results: 任务执行结果，会被原地更新
+        max_parallelism: 最大并发数，默认读取 PLAN_MAX_PARALLELISM
+        on_task_done: 任务成功后调用的回调，可在依赖任务启动前修改其参数
+        speculation_key: 推测执行的键函数；依赖未满足的任务按当前参数提前执行，
+            依赖完成后键不变则沿用结果，否则重新执行
+        timeout: 整个计划最多执行的秒数，None 表示不限
+
+    Returns:
+        第一个失败任务对应的 TaskFailure（超时的任务 timed_out 为真），全部成功时返回 None
+
+    Raises:
+        PlanValidationError: 执行计划结构非法
+    """
+    topological_waves(tasks, executed_tasks)
+    dispatcher = PlanDispatcher(run_task, executed_tasks, task_results, max_parallelism, on_task_done,
+                                speculation_key)
+    for task in tasks:
+        dispatcher.add(task)
+    return dispatcher.finish(timeout)
+
+
+async def aexecute_plan(tasks: List[dict],
+                        arun_task: Callable[[dict], Awaitable[object]],
+                        executed_tasks: List[str],
+                        task_results: dict,
+                        max_parallelism: Optional[int] = None,
+                        on_task_done: Optional[Callable[[dict, object], None]] = None,
+                        speculation_key: Optional[SpeculationKey] = None,
+                        timeout: Optional[float] = None) -> Optional[TaskFailure]:
+    """
+    execute_plan 的异步版本：任务以 asyncio 任务并发运行，并发数同样受 max_parallelism 限制，
+    超过 timeout 后取消仍在运行的任务
+
+    Args:
+        tasks: 执行计划中的任务列表
+        arun_task: 执行单个任务的协程函数，失败时抛出 TaskFailure
+        executed_tasks: 已执行的任务ID列表，会被原地更新
+        task_results: 任务执行结果，会被原地更新
+        max_parallelism: 最大并发数，默认读取 PLAN_MAX_PARALLELISM
+        on_task_done: 任务成功后调用的回调，可在依赖任务启动前修改其参数
+        speculation_key: 推测执行的键函数，含义同 execute_plan
+        timeout: 整个计划最多执行的秒数，None 表示不限
+
+    Returns:
+        第一个失败任务对应的 TaskFailure，全部成功时返回 None
+
+    Raises:
+        PlanValidationError: 执行计划结构非法
+    """
+    topological_waves(tasks, executed_tasks)
+    pending = {task["id"]: task for task in tasks if task["id"] not in executed_tasks}
+    order = {task["id"]: index for index, task in enumerate(tasks)}
+    semaphore = asyncio.Semaphore(max(1, max_parallelism or DEFAULT_MAX_PARALLELISM))
+    failures: List[TaskFailure] = []
+    running = {}
+    speculations: Dict[str, Speculation] = {}
+
+    async def run_limited(task: dict):
+        async with semaphore:
+            return await arun_task(task)
+
+    def submit_ready():
+        for task_id, task in list(pending.items()):
+            if all(dep in executed_tasks for dep in task.get("dependencies", [])):
+                pending.pop(task_id)
+                speculation = speculations.pop(task_id, None)
+                if speculation is not None and speculation_key(task) == speculation.key:
+                    speculation.adopt()
+                    running[speculation.future] = task
+                    continue
+                if speculation is not None:
+                    speculation.discard("misses")
+                running[asyncio.ensure_future(run_limited(task))] = task
+
+    submit_ready()
+    if speculation_key is not None:
+        for task_id, task in pending.items():
+            key = speculation_key(task)
+            if key is not None:
+                future = asyncio.ensure_future(run_limited(Speculation.task_copy(task)))
+                speculations[task_id] = Speculation(task, key, future)
+    expires_at = time.monotonic() + timeout if timeout is not None else None
+    try:
+        while running:
+            left = max(0.0, expires_at - time.monotonic()) if expires_at is not None else None
+            finished, _ = await asyncio.wait(running, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+            if not finished:
+                # 超时：仍在运行的任务在 finally 中取消
+                failures.extend(_timed_out(task) for task in running.values())
+                break
+            for future in finished:
+                task = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures.append(_as_failure(task, e))
+                    continue
+                executed_tasks.append(task["id"])
+                task_results[task["id"]] = result
+                if on_task_done:
+                    on_task_done(task, result)
+            if not failures:
+                submit_ready()
+    finally:
+        # 调用方被取消时，同时取消仍在运行的任务
+        for future in running:
+            future.cancel()
+        for speculation in speculations.values():
+            speculation.discard("abandoned")
+
+    if failures:
+        return min(failures, key=lambda failure: order.get(failure.task_id, len(order)))
+    return None
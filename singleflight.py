@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 10:30
+# @Author  : 周启航-开发
+# @File    : singleflight.py
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing_extensions import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from deadline import DeadlineExceeded, expired, wait_result
+from instrumentation import metrics
+
+# 关闭后每个调用方各自计算，用于排查问题
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+
+class Call:
+    """
+    一次进行中的计算
+
+    结果保存在 concurrent.futures.Future 中，线程通过 result() 阻塞等待，
+    协程通过 asyncio.wrap_future 等待，因此同步和异步调用方可以共享同一次计算。
+    """
+
+    def __init__(self, group: "SingleFlight", key: Hashable):
+        self._group = group
+        self.key = key
+        self.future: Future = Future()
+        self.waiters = 1
+        self.task: Optional[asyncio.Task] = None
+
+    def resolve(self, value: Any):
+        self._group._forget(self)
+        if not self.future.done():
+            self.future.set_result(value)
+
+    def fail(self, error: BaseException):
+        self._group._forget(self)
+        if not self.future.done():
+            self.future.set_exception(error)
+
+    def result(self) -> Any:
+        """阻塞等待结果，最多等到当前请求的截止时间"""
+        return wait_result(self.future, self._group.name)
+
+    async def aresult(self) -> Any:
+        """
+        等待结果；当前协程被取消时只放弃等待，不影响其他等待者。
+
+        最后一个等待者取消时，如果计算是由协程发起的，也一并取消计算。
+        """
+        waiter = asyncio.wrap_future(self.future)
+        try:
+            return await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            # 放弃等待后仍要取走异常，避免 "exception was never retrieved" 警告
+            waiter.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._group._leave(self)
+            raise
+
+
+class SingleFlight:
+    """
+    合并相同键的并发调用
+
+    同一个键在计算期间到达的调用方不再重复计算，而是等待进行中的那一次并共享结果或异常；
+    计算结束后键立即移除，之后的调用重新计算（结果缓存由 cache.py 负责）。
+    发起者因自己的时间预算用完而失败时，预算更宽裕的等待者重新发起计算，而不是共享这个超时。
+    """
+
+    def __init__(self, name: str, enabled: bool = SINGLEFLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self._calls: Dict[Hashable, Call] = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def join(self, key: Hashable) -> Tuple[Call, bool]:
+        """
+        加入键对应的计算
+
+        Returns:
+            (call, is_leader)；is_leader 为 True 时调用方负责计算，并且必须调用 resolve 或 fail
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = Call(self, key)
+                role = "leaders"
+            else:
+                call.waiters += 1
+                role = "followers"
+            self._stats[role] += 1
+        metrics.inc("minicascade_singleflight_calls_total", {"group": self.name, "role": role[:-1]},
+                    help_text="Single-flight lookups by role (leader computes, follower shares the result)")
+        return call, role == "leaders"
+
+    def _forget(self, call: Call):
+        with self._lock:
+            if self._calls.get(call.key) is call:
+                del self._calls[call.key]
+
+    def _leave(self, call: Call):
+        with self._lock:
+            call.waiters -= 1
+            abandoned = call.waiters <= 0
+            # 先移除键，之后到达的调用方重新计算，而不是拿到取消异常
+            if abandoned and call.task is not None and self._calls.get(call.key) is call:
+                del self._calls[call.key]
+        if abandoned and call.task is not None:
+            call.task.cancel()
+
+    def do(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """同步调用：相同键的并发调用只执行一次 compute"""
+        if not self.enabled:
+            return compute()
+        call, leader = self.join(key)
+        if leader:
+            try:
+                value = compute()
+            except BaseException as e:
+                call.fail(e)
+                raise
+            call.resolve(value)
+            return value
+        try:
+            return call.result()
+        except DeadlineExceeded:
+            if expired():
+                raise
+            return self.do(key, compute)
+
+    async def ado(self, key: Hashable, acompute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        do 的异步版本
+
+        计算以独立任务运行，发起者被取消时其他等待者仍能拿到结果；所有等待者都取消后任务才被取消。
+        """
+        if not self.enabled:
+            return await acompute()
+        call, leader = self.join(key)
+        if leader:
+            call.task = asyncio.get_running_loop().create_task(acompute())
+            call.task.add_done_callback(lambda task: _settle_from_task(call, task))
+        try:
+            return await call.aresult()
+        except DeadlineExceeded:
+            if expired():
+                raise
+            return await self.ado(key, acompute)
+
+    def stats(self) -> Dict[str, float]:
+        """返回发起计算和共享结果的调用次数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        total = stats["leaders"] + stats["followers"]
+        stats["coalesced_rate"] = stats["followers"] / total if total else 0.0
+        return stats
+
+
+def _settle_from_task(call: Call, task: asyncio.Task):
+    if task.cancelled():
+        call.fail(asyncio.CancelledError())
+    elif task.exception() is not None:
+        call.fail(task.exception())
+    else:
+        call.resolve(task.result())
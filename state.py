@@ -5,10 +5,10 @@
 # @File    : state.py
 
 import operator
-from typing_extensions import TypedDict, Annotated, List, Sequence
+from typing_extensions import TypedDict, Annotated, List, Optional, Sequence
 from pydantic import BaseModel, Field
 from langchain_core.messages import BaseMessage
-from langgraph.graph.message import add_messages
+from compact_state import bounded_add_messages
 
 #STATE DEFINITIONS
 
@@ -20,7 +20,7 @@ class ResearcherState(TypedDict):
     tool calls, the research topic being investigated, compressed findings,
     and raw research notes for detailed analysis.
     """
-    researcher_messages: Annotated[Sequence[BaseMessage], add_messages]
+    researcher_messages: Annotated[Sequence[BaseMessage], bounded_add_messages]
     raw_notes: Annotated[List[str], operator.add]
     # 新增递归计数器
     recursion_count: int
@@ -28,6 +28,10 @@ class ResearcherState(TypedDict):
     execution_plan: dict  # 存储任务执行计划
     executed_tasks: list  # 已执行的任务列表
     task_results: dict  # 任务执行结果
+    request_id: str  # 请求ID，关联同一请求的所有埋点跨度
+    # 时间预算用完时所在的环节，后续节点据此跳过剩余工作并返回部分结果；每次调用开始时清空
+    # （截止时间本身在调用配置中，见 deadline.deadline_config）
+    deadline_exceeded: Optional[str]
 
 class ResearcherOutputState(TypedDict):
     """
@@ -37,8 +41,10 @@ class ResearcherOutputState(TypedDict):
     research findings and all raw notes from the research process.
     """
     raw_notes: Annotated[List[str], operator.add]
-    researcher_messages: Annotated[Sequence[BaseMessage], add_messages]
+    researcher_messages: Annotated[Sequence[BaseMessage], bounded_add_messages]
     task_results: dict  # 任务执行结果
+    request_id: str  # 请求ID
+    deadline_exceeded: Optional[str]  # 时间预算用完时所在的环节，未超时时为空
 #STRUCTURED OUTPUT SCHEMAS
 
 class ClarifyWithUser(BaseModel):
@@ -63,3 +69,14 @@ class Summary(BaseModel):
     """Schema for webpage content summarization."""
     summary: str = Field(description="Concise summary of the webpage content")
     key_excerpts: str = Field(description="Important quotes and excerpts from the content")
+
+class NormalizedItem(BaseModel):
+    """Schema for a single normalized date or city item."""
+    id: str = Field(description="The id of the input item, copied verbatim.")
+    value: str = Field(
+        description="YYYY-MM-DD for date items, the 3-letter IATA airport code for city items.",
+    )
+
+class NormalizationBatch(BaseModel):
+    """Schema for batched date and city normalization."""
+    items: List[NormalizedItem] = Field(description="One normalized entry for every input item.")
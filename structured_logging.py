@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 18:10
+# @Author  : 周启航-开发
+# @File    : structured_logging.py
+"""
+结构化日志
+
+基于 structlog，业务代码通过 get_logger 获取日志对象，事件名加键值对记录：
+
+    log = get_logger(__name__)
+    log.debug("已找到航班", flight=offers[0], sample_rate=LOG_PAYLOAD_SAMPLE_RATE)
+
+- 级别过滤：低于 LOG_LEVEL 的方法是空操作，关闭调试日志时热路径上的 debug 调用几乎没有开销；
+- 非阻塞：调用线程只补充请求ID等上下文并放入有界队列，渲染和写出由后台线程完成，
+  队列满时丢弃并计入指标 minicascade_log_dropped_total，不会阻塞请求；
+- 延迟格式化：键值对原样入队，渲染成文本或 JSON 推迟到后台线程。因此入队后不应再修改作为值传入的对象；
+- 采样：事件带 sample_rate 时按该比例随机保留，用于航班、酒店清单这类大体量、高频的事件；
+- 关联：自动带上当前请求ID（instrumentation.request_context）和 structlog.contextvars 中绑定的字段。
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+import structlog
+
+from instrumentation import metrics, request_id_var
+
+# 日志级别：DEBUG 时输出航班、酒店等完整载荷
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# 输出格式：console（便于阅读）或 json（便于日志系统采集）
+LOG_FORMAT = os.getenv("LOG_FORMAT", "console").lower()
+# 等待后台线程写出的日志条数上限，超出后丢弃
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# 大体量载荷事件的采样比例
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+
+_LOGGER_NAME = "minicascade"
+_configure_lock = threading.Lock()
+_listener = None
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """入队时不格式化、队列满时丢弃的 QueueHandler"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 标准 QueueHandler 在调用线程中格式化，这里推迟到后台线程的 ProcessorFormatter
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("minicascade_log_dropped_total", {"level": record.levelname.lower()},
+                        help_text="Log records dropped because the background log queue was full")
+
+
+def _sample(logger, method_name: str, event_dict: dict) -> dict:
+    rate = event_dict.pop("sample_rate", None)
+    if rate is not None and rate < 1.0 and random.random() >= rate:
+        raise structlog.DropEvent
+    return event_dict
+
+
+def _add_request_id(logger, method_name: str, event_dict: dict) -> dict:
+    request_id = request_id_var.get()
+    if request_id and "request_id" not in event_dict:
+        event_dict["request_id"] = request_id
+    return event_dict
+
+
+def _capture_exc_info(logger, method_name: str, event_dict: dict) -> dict:
+    # 异常信息必须在调用线程中取得，后台线程里的 sys.exc_info() 已不是同一个异常
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+def _add_timestamp(logger, method_name: str, event_dict: dict) -> dict:
+    # 使用入队时记录的时间，而不是后台线程渲染时的时间
+    record = event_dict.get("_record")
+    created = record.created if record is not None else datetime.now().timestamp()
+    event_dict["timestamp"] = datetime.fromtimestamp(created).isoformat(timespec="milliseconds")
+    return event_dict
+
+
+def _renderer():
+    if LOG_FORMAT == "json":
+        return structlog.processors.JSONRenderer(ensure_ascii=False, default=str)
+    return structlog.dev.ConsoleRenderer(colors=sys.stderr.isatty())
+
+
+def configure_logging(level: str = None):
+    """
+    配置 structlog 和后台写日志线程
+
+    第一次 get_logger 时自动按 LOG_LEVEL 调用；日志对象在第一次使用后缓存，
+    需要其他级别时应在记录第一条日志之前调用。
+
+    Args:
+        level: 日志级别，默认取 LOG_LEVEL
+    """
+    global _listener
+    level_no = logging.getLevelName((level or LOG_LEVEL).upper())
+    if not isinstance(level_no, int):
+        level_no = logging.INFO
+    with _configure_lock:
+        stdlib_logger = logging.getLogger(_LOGGER_NAME)
+        stdlib_logger.setLevel(level_no)
+        stdlib_logger.propagate = False
+        if _listener is None:
+            log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(structlog.stdlib.ProcessorFormatter(processors=[
+                _add_timestamp,
+                structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                structlog.processors.format_exc_info,
+                _renderer(),
+            ]))
+            stdlib_logger.addHandler(_NonBlockingQueueHandler(log_queue))
+            _listener = QueueListener(log_queue, handler, respect_handler_level=False)
+            _listener.start()
+            atexit.register(shutdown_logging)
+        structlog.configure(
+            processors=[
+                _sample,
+                structlog.contextvars.merge_contextvars,
+                _add_request_id,
+                structlog.processors.add_log_level,
+                _capture_exc_info,
+                structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+            ],
+            # 低于级别的方法直接返回，不执行任何处理器
+            wrapper_class=structlog.make_filtering_bound_logger(level_no),
+            logger_factory=structlog.stdlib.LoggerFactory(),
+            cache_logger_on_first_use=True,
+        )
+
+
+def shutdown_logging():
+    """写出队列中剩余的日志并停止后台线程"""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            logging.getLogger(_LOGGER_NAME).handlers.clear()
+
+
+def get_logger(name: str):
+    """返回 name 模块的结构化日志对象"""
+    if _listener is None:
+        configure_logging()
+    # 直接绑定出具体的日志对象，省去惰性代理在每次调用时的查找
+    return structlog.get_logger(f"{_LOGGER_NAME}.{name}").bind()
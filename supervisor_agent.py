@@ -3,55 +3,228 @@
 # @Time    : 2025/10/14 13:20
 # @Author  : 周启航-开发
 # @File    : research_agent.py
+import asyncio
+import copy
 import json
 import os
 import sys
 from datetime import datetime, timedelta
 import traceback
-from typing_extensions import Literal
-from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
+from typing_extensions import List, Literal, Optional, Tuple
 from langgraph.graph import StateGraph, START, END
 from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage
 
 from utils import get_today_str, think_tool,search_flights,search_hotels_with_llm
 from prompts import research_agent_prompt, planning_prompt, book_prompt
 from state import ResearcherState, ResearcherOutputState
+from scheduler import execute_plan, aexecute_plan, PlanDispatcher, PlanValidationError, TaskFailure, topological_waves
+from plan_stream import IncrementalPlanParser, is_valid_task
+from fast_planner import extract_itinerary, build_plan, plan_signature
+from date_parser import parse_date_locally
+from cache import ResultCache, InMemoryBackend
+from instrumentation import span, record_llm_usage, instrument_node
+from providers import get_chat_model
+import compact_state
+from checkpointing import build_task_result_store, build_graph_checkpointer, task_key
+from deadline import (DeadlineExceeded, deadline_config, deadline_node, expired, record_deadline_exceeded,
+                      remaining)
+from structured_logging import LOG_PAYLOAD_SAMPLE_RATE, get_logger
+
+log = get_logger(__name__)
 
 # SET UP TOOLS AND MODEL BINDINGS
 tools = [think_tool,search_flights,search_hotels_with_llm,get_today_str]
 tools_by_name = {tool.name: tool for tool in tools}
-load_dotenv()
-api_key = os.getenv("SILICON_API_KEY")
-base_url = os.getenv("SILICON_BASE_URL")
-model = ChatOpenAI(
-    model="deepseek-ai/DeepSeek-V3",
-    temperature=0.7,
-    api_key=api_key,
-    base_url=base_url,
-)
-
-model_with_tools = model.bind_tools(tools)
+# 对话模型由 providers 延迟创建并在进程内共享，见 get_chat_model
+
+# 规划结果缓存，按规范化的请求签名索引
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", "3600"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "512"))
+_plan_cache = ResultCache(InMemoryBackend(max_entries=PLAN_CACHE_MAX_ENTRIES), ttl=PLAN_CACHE_TTL, stale_ttl=0)
+# 开启后大模型规划器流式输出，任务一解析出来就开始执行
+PLANNER_STREAMING = os.getenv("PLANNER_STREAMING", "true").lower() == "true"
+# 持久化的任务结果，按工具名和参数索引；CHECKPOINT_BACKEND=none 时为 None
+_task_store = build_task_result_store()
+# 开启后酒店查询不等航班结果，按计划中的入住日期与航班查询同时执行，航班日期不同时再重新查询
+SPECULATIVE_HOTEL_SEARCH = os.getenv("SPECULATIVE_HOTEL_SEARCH", "true").lower() == "true"
 
 # AGENT NODE
 
+def _plan_with_llm(user_request: str) -> dict:
+    """使用大模型规划器生成执行计划，返回内容无法解析时抛出异常"""
+    with span("planner", kind="llm") as record:
+        response = get_chat_model().invoke([SystemMessage(content=planning_prompt),
+                                 HumanMessage(content=user_request)])
+        record_llm_usage(record, response, "planner")
+    return json.loads(response.content)
+
+
+def _cacheable_plan(plan) -> bool:
+    """只缓存每个任务都有效、依赖关系可以执行的计划，避免错误的计划在 PLAN_CACHE_TTL 内被反复使用"""
+    if not isinstance(plan, dict) or not isinstance(plan.get("tasks"), list) or not plan["tasks"]:
+        return False
+    if not all(is_valid_task(task) for task in plan["tasks"]):
+        return False
+    try:
+        topological_waves(plan["tasks"])
+    except PlanValidationError:
+        return False
+    return True
+
+
+def _plan_with_llm_streaming(user_request: str, on_task) -> Tuple[dict, bool]:
+    """
+    流式调用大模型规划器，每个任务对象一生成完毕就交给 on_task 处理
+
+    Returns:
+        (计划, 输出是否完整)；输出被截断或格式错误时计划只包含已成功解析的任务
+    """
+    parser = IncrementalPlanParser()
+    usage_chunk = None
+    with span("planner", kind="llm", streaming=True) as record:
+        for chunk in get_chat_model().stream([SystemMessage(content=planning_prompt),
+                                   HumanMessage(content=user_request)]):
+            # 流式输出的 token 用量通常只出现在最后一个分片中
+            if getattr(chunk, "usage_metadata", None):
+                usage_chunk = chunk
+            for task in parser.feed(chunk.content):
+                on_task(task)
+        record_llm_usage(record, usage_chunk, "planner")
+    plan = parser.close()
+    return plan, parser.complete
+
+
+def _stream_plan_and_dispatch(user_request: str, signature: str) -> dict:
+    """规划器边生成边执行：依赖已满足的任务在计划生成过程中就开始执行"""
+    executed_tasks, task_results = [], {}
+    live_plan = {"tasks": []}
+    dispatcher = PlanDispatcher(_run_plan_task, executed_tasks, task_results,
+                                on_task_done=_on_plan_task_done(live_plan),
+                                speculation_key=_hotel_speculation_key)
+
+    def on_task(task: dict):
+        # 缓存中保存规划器原始输出，执行时使用副本，避免参数更新污染缓存
+        live_task = copy.deepcopy(task)
+        live_plan["tasks"].append(live_task)
+        # 航班任务可能已经先于酒店任务完成，此时需要立即更新酒店查询参数
+        for done_task in list(live_plan["tasks"]):
+            if done_task["tool_needed"] == "search_flights" and task_results.get(done_task["id"]):
+                _update_hotel_params_with_flight_date({"tasks": [live_task]}, task_results[done_task["id"]])
+        try:
+            dispatcher.add(live_task)
+        except PlanValidationError:
+            # 重复的任务留给计划执行节点统一报告
+            pass
+
+    truncated = []
+
+    def compute_plan() -> dict:
+        plan, complete = _plan_with_llm_streaming(user_request, on_task)
+        if not complete:
+            truncated.append(plan)
+        return plan
+
+    plan = None
+    try:
+        # 截断或格式错误的输出中解析出的部分计划只用于本次请求，不写入缓存
+        plan = _plan_cache.get_or_compute(signature, compute_plan,
+                                          cacheable=lambda value: not truncated and _cacheable_plan(value))
+    except DeadlineExceeded as e:
+        timeout_stage = e.stage
+    finally:
+        # 失败的任务不计入 executed_tasks，由计划执行节点重新执行并报告错误；
+        # 时间预算用完时不再等待仍在运行的任务
+        dispatcher.finish(timeout=remaining())
+
+    if plan is None:
+        # 规划器超时：已经提前执行完成的任务结果作为部分结果保留
+        update = _deadline_update(timeout_stage, "planner")
+        update.update({"executed_tasks": executed_tasks, "task_results": task_results})
+        return update
+    if not live_plan["tasks"]:
+        # 命中缓存，没有任务被提前执行
+        return _planning_update(plan)
+    update = _planning_update({**plan, "tasks": live_plan["tasks"]})
+    update["executed_tasks"] = executed_tasks
+    update["task_results"] = task_results
+    return update
+
+
+async def _aplan_with_llm(user_request: str) -> dict:
+    """_plan_with_llm 的异步版本"""
+    with span("planner", kind="llm") as record:
+        response = await get_chat_model().ainvoke([SystemMessage(content=planning_prompt),
+                                        HumanMessage(content=user_request)])
+        record_llm_usage(record, response, "planner")
+    return json.loads(response.content)
+
+
+def _planning_update(plan: dict) -> dict:
+    # 执行节点会原地修改计划参数，不能直接使用缓存中的对象
+    plan = copy.deepcopy(plan)
+    # 紧凑模式下计划只保存在 execution_plan 中，消息里放引用
+    content = compact_state.state_reference("execution_plan", plan) if compact_state.STATE_COMPACT else plan
+    return {
+        "execution_plan": plan,
+        "researcher_messages": [ToolMessage(content=content, name="planner",tool_call_id="planning_task_1")]
+    }
+
+
+def _planning_error_update(error: Exception) -> dict:
+    return {
+        "researcher_messages": [ToolMessage(content=f"规划失败: {str(error)}", name="planner",tool_call_id="planning_task_1")]
+    }
+
+
+def _deadline_update(stage: str, name: str) -> dict:
+    """时间预算用完时的状态更新：记录超时的环节，后续节点跳过剩余工作，由预订节点返回部分结果"""
+    record_deadline_exceeded(stage)
+    return {
+        "deadline_exceeded": stage,
+        "researcher_messages": [ToolMessage(content=f"请求超出时间预算（{stage}）", name=name,
+                                            tool_call_id="deadline_exceeded")]
+    }
+
+
 def planning_agent_node(state: ResearcherState):
     user_request = state["researcher_messages"][0].content
     prompt = f"{planning_prompt}\n\n用户请求: {user_request}\n\n所拥有的工具: {[tool.name for tool in tools]}"
 
-    response = model.invoke([SystemMessage(content=planning_prompt),
-                                      HumanMessage(content=user_request)])
+    # 常见的"机票(+酒店)"请求直接由本地规则生成计划，其余请求再交给大模型规划
+    itinerary = extract_itinerary(user_request)
 
     try:
-        plan = json.loads(response.content)
-        return {
-            "execution_plan": plan,
-            "researcher_messages": [ToolMessage(content=plan, name="planner",tool_call_id="planning_task_1")]
-        }
+        if not itinerary and PLANNER_STREAMING:
+            return _stream_plan_and_dispatch(user_request, plan_signature(user_request))
+        plan = _plan_cache.get_or_compute(
+            plan_signature(user_request, itinerary),
+            lambda: build_plan(itinerary) if itinerary else _plan_with_llm(user_request),
+            cacheable=_cacheable_plan,
+        )
+        return _planning_update(plan)
+    except DeadlineExceeded as e:
+        return _deadline_update(e.stage, "planner")
     except Exception as e:
-        return {
-            "researcher_messages": [ToolMessage(content=f"规划失败: {str(e)}", name="planner",tool_call_id="planning_task_1")]
-        }
+        return _planning_error_update(e)
+
+
+async def aplanning_agent_node(state: ResearcherState):
+    """planning_agent_node 的异步版本"""
+    user_request = state["researcher_messages"][0].content
+    itinerary = extract_itinerary(user_request)
+
+    async def compute_plan():
+        return build_plan(itinerary) if itinerary else await _aplan_with_llm(user_request)
+
+    try:
+        plan = await _plan_cache.aget_or_compute(plan_signature(user_request, itinerary), compute_plan,
+                                                 cacheable=_cacheable_plan)
+        return _planning_update(plan)
+    except DeadlineExceeded as e:
+        return _deadline_update(e.stage, "planner")
+    except Exception as e:
+        return _planning_error_update(e)
 
 
 def book_flight_and_hotel(state: ResearcherState) -> dict:
@@ -66,11 +239,15 @@ def book_flight_and_hotel(state: ResearcherState) -> dict:
     """
     # 获取任务执行结果
     task_results = state.get("task_results", {})
+    execution_plan = state.get("execution_plan", {})
 
     # 提取航班和酒店信息
     flight_info = task_results.get("task1", {})
     hotel_info = task_results.get("task2", [])
 
+    if state.get("deadline_exceeded"):
+        return _partial_booking(state["deadline_exceeded"], execution_plan, flight_info, hotel_info)
+
     # 构造预订确认信息
     if not flight_info or not hotel_info:
         return {
@@ -81,29 +258,16 @@ def book_flight_and_hotel(state: ResearcherState) -> dict:
             )]
         }
 
+    # 乘客姓名只能来自用户请求，缺少时不生成预订
+    passenger_name = (execution_plan.get("passenger_name") or "").strip()
+    if not passenger_name:
+        return _missing_fields_booking(["passenger_name"], execution_plan, flight_info, hotel_info)
+
     # 整合预订信息
     booking_details = {
-        "passenger_name": "王伟",  # 可从原始请求中提取
-        "flight": {
-            "flight_number": flight_info.get("flightNo"),
-            "airline": flight_info.get("airlineName"),
-            "departure": {
-                "airport": flight_info.get("departureName"),
-                "date": flight_info.get("departureDate"),
-                "time": flight_info.get("departureTime")
-            },
-            "arrival": {
-                "airport": flight_info.get("arrivalName"),
-                "date": flight_info.get("arrivalDate")
-            },
-            "duration": flight_info.get("duration"),
-            "price": flight_info.get("price")
-        },
-        "hotel": {
-            "name": hotel_info[0].get("name") if hotel_info else "",
-            "price_per_night": hotel_info[0].get("price_per_night") if hotel_info else 0,
-            "total_nights": 2,  # 固定为两晚
-        }
+        "passenger_name": passenger_name,
+        "flight": _flight_details(flight_info),
+        "hotel": _hotel_details(execution_plan, hotel_info),
     }
 
     # 计算总价
@@ -112,100 +276,218 @@ def book_flight_and_hotel(state: ResearcherState) -> dict:
                   booking_details["hotel"]["total_nights"]
 
     booking_details["total_price"] = total_price
-    print("完成预定信息，最后汇总信息如下：")
-    print(booking_details)
+    log.info("完成预订", flight_number=booking_details["flight"]["flight_number"],
+             hotel=booking_details["hotel"]["name"], total_price=total_price)
+    log.debug("预订汇总信息", booking=booking_details, sample_rate=LOG_PAYLOAD_SAMPLE_RATE)
     # 返回预订确认信息
     return {
         "researcher_messages": [ToolMessage(
-            content=json.dumps(booking_details, ensure_ascii=False, indent=2),
+            content=compact_state.dumps_compact(booking_details) if compact_state.STATE_COMPACT
+            else json.dumps(booking_details, ensure_ascii=False, indent=2),
             name="booking_agent",
             tool_call_id="booking_complete"
         )]
     }
 
 
-def plan_execution_node(state: ResearcherState):
-    """专门处理按计划执行任务的节点"""
-    execution_plan = state.get("execution_plan", {})
-    executed_tasks = state.get("executed_tasks", [])
-    task_results = state.get("task_results", {})
+def _flight_details(flight_info: dict) -> dict:
+    details = {
+        "flight_number": flight_info.get("flightNo"),
+        "airline": flight_info.get("airlineName"),
+        "departure": {
+            "airport": flight_info.get("departureName"),
+            "date": flight_info.get("departureDate"),
+            "time": flight_info.get("departureTime")
+        },
+        "arrival": {
+            "airport": flight_info.get("arrivalName"),
+            "date": flight_info.get("arrivalDate")
+        },
+        "duration": flight_info.get("duration"),
+        "price": flight_info.get("price")
+    }
+    # 灵活日期查询时附上原定日期和每天的价格
+    if flight_info.get("price_calendar"):
+        details["requested_date"] = flight_info.get("requested_date")
+        details["price_calendar"] = flight_info["price_calendar"]
+    return details
 
-    if not execution_plan or "tasks" not in execution_plan:
+
+def _hotel_details(execution_plan: dict, hotel_info: list) -> dict:
+    return {
+        "name": hotel_info[0].get("name") if hotel_info else "",
+        "price_per_night": hotel_info[0].get("price_per_night") if hotel_info else 0,
+        "total_nights": _count_nights(execution_plan),
+    }
+
+
+def _partial_booking(stage: str, execution_plan: dict, flight_info: dict, hotel_info: list) -> dict:
+    """时间预算用完时返回已完成的部分结果，未查到的部分为 null"""
+    partial = {
+        "status": "deadline_exceeded",
+        "stage": stage,
+        "message": "请求超出时间预算，以下为已完成的部分结果",
+        "passenger_name": (execution_plan.get("passenger_name") or "").strip() or None,
+        "flight": _flight_details(flight_info) if flight_info else None,
+        "hotel": _hotel_details(execution_plan, hotel_info) if hotel_info else None,
+    }
+    log.warning("请求超出时间预算，返回部分结果", stage=stage)
+    return {
+        "researcher_messages": [ToolMessage(
+            content=compact_state.dumps_compact(partial) if compact_state.STATE_COMPACT
+            else json.dumps(partial, ensure_ascii=False, indent=2),
+            name="booking_agent",
+            tool_call_id="deadline_exceeded"
+        )]
+    }
+
+
+# 预订必需字段在提示信息中的名称
+_FIELD_LABELS = {"passenger_name": "乘客姓名"}
+
+
+def _missing_fields_booking(fields: List[str], execution_plan: dict, flight_info: dict, hotel_info: list) -> dict:
+    """缺少预订必需的信息时不生成预订，返回缺少的字段和已查到的航班、酒店，由用户补充后重新提交"""
+    result = {
+        "status": "missing_fields",
+        "missing_fields": fields,
+        "message": "缺少预订所需的信息：" + "、".join(_FIELD_LABELS.get(field, field) for field in fields),
+        "flight": _flight_details(flight_info),
+        "hotel": _hotel_details(execution_plan, hotel_info),
+    }
+    log.info("缺少预订所需的信息", missing_fields=fields)
+    return {
+        "researcher_messages": [ToolMessage(
+            content=compact_state.dumps_compact(result) if compact_state.STATE_COMPACT
+            else json.dumps(result, ensure_ascii=False, indent=2),
+            name="booking_agent",
+            tool_call_id="booking_missing_fields"
+        )]
+    }
+
+
+def _count_nights(plan: dict, default: int = 2) -> int:
+    """根据酒店查询任务的入住和退房日期计算入住晚数，无法计算时默认两晚"""
+    for task in plan.get("tasks", []):
+        if task.get("tool_needed") != "search_hotels_with_llm":
+            continue
+        parameters = task.get("parameters", {})
+        check_in = parse_date_locally(str(parameters.get("check_in_date", "")))
+        check_out = parse_date_locally(str(parameters.get("check_out_date", "")))
+        if not check_in or not check_out:
+            return default
+        nights = (datetime.strptime(check_out, "%Y-%m-%d") - datetime.strptime(check_in, "%Y-%m-%d")).days
+        return max(1, nights)
+    return default
+
+
+def _load_task_result(task: dict, record):
+    """从持久化存储中读取参数相同的任务已保存的结果，未命中时返回 None"""
+    if _task_store is None:
+        return None
+    entry = _task_store.get(task_key(task))
+    if record is not None:
+        record.set_attribute("checkpoint_hit", entry is not None)
+    return entry[0] if entry else None
+
+
+def _save_task_result(task: dict, result):
+    # 查询失败的结果不保存，下次重试时重新执行
+    if _task_store is None or (isinstance(result, dict) and result.get("error")):
+        return
+    try:
+        _task_store.put(task_key(task), task["tool_needed"], result)
+    except Exception as e:
+        log.warning("保存任务结果失败", task_id=task["id"], error=str(e))
+
+
+def _run_plan_task(task: dict):
+    """执行计划中的单个任务，查询无结果时抛出 TaskFailure；参数相同的任务已有持久化结果时直接返回"""
+    tool = tools_by_name[task["tool_needed"]]
+    with span(task["tool_needed"], kind="tool", task_id=task["id"],
+              speculative=task.get("speculative", False)) as record:
+        stored = _load_task_result(task, record)
+        if stored is not None:
+            return stored
+        result = _check_task_result(task, tool.invoke(task["parameters"]))
+        _save_task_result(task, result)
+        return result
+
+
+async def _arun_plan_task(task: dict):
+    """_run_plan_task 的异步版本，通过 ainvoke 调用工具，存储读写放到线程中执行"""
+    tool = tools_by_name[task["tool_needed"]]
+    with span(task["tool_needed"], kind="tool", task_id=task["id"],
+              speculative=task.get("speculative", False)) as record:
+        stored = await asyncio.to_thread(_load_task_result, task, record)
+        if stored is not None:
+            return stored
+        result = _check_task_result(task, await tool.ainvoke(task["parameters"]))
+        await asyncio.to_thread(_save_task_result, task, result)
+        return result
+
+
+def _check_task_result(task: dict, result):
+    """航班或酒店查询无结果，或工具返回错误信息（如航班均不符合筛选条件、灵活日期窗口内均无航班）时抛出 TaskFailure"""
+    task_id = task["id"]
+    if isinstance(result, dict) and result.get("error"):
+        raise TaskFailure(task_id, result["message"])
+
+    if task["tool_needed"] == "search_flights" and (result is None or result == {}):
+        error_msg = f"抱歉，未能查询到前往 {task['parameters'].get('destination', task['parameters'].get('location', ''))} 的航班，请您更换日期后重试"
+        raise TaskFailure(task_id, error_msg)
+
+    elif task["tool_needed"] == "search_hotels_with_llm" and (result is None or result == []):
+        error_msg = f"抱歉，未能查询到 {task['parameters'].get('destination', task['parameters'].get('location', ''))} 的可用酒店，请您更换日期或目的地后重试"
+        raise TaskFailure(task_id, error_msg)
+
+    return result
+
+
+def _on_plan_task_done(execution_plan: dict):
+    """返回任务完成回调：航班查询成功后更新酒店查询的参数"""
+    def on_task_done(task: dict, result):
+        if task["tool_needed"] == "search_flights" and result:
+            _update_hotel_params_with_flight_date(execution_plan, result)
+    return on_task_done
+
+
+def _hotel_speculation_key(task: dict):
+    """
+    酒店查询任务的推测键：目的地、入住日期和退房日期
+
+    入住日期按本地规则规范化后比较，航班结果把"十月二十号"改写为"2026-10-20"时仍视为同一查询。
+    其他任务不做推测执行，返回 None。
+    """
+    if not SPECULATIVE_HOTEL_SEARCH or task.get("tool_needed") != "search_hotels_with_llm":
+        return None
+    parameters = task.get("parameters", {})
+    check_in = str(parameters.get("check_in_date", "")).strip()
+    return (str(parameters.get("destination", "")).strip(), parse_date_locally(check_in) or check_in,
+            str(parameters.get("check_out_date", "")).strip())
+
+
+def _plan_execution_update(execution_plan: dict, executed_tasks: list, task_results: dict,
+                           failure: Optional[TaskFailure]) -> dict:
+    """根据执行结果构造计划执行节点的状态更新"""
+    if failure is not None and failure.timed_out:
+        stage = next((task["tool_needed"] for task in execution_plan["tasks"] if task["id"] == failure.task_id),
+                     "plan_execution")
+        update = _deadline_update(stage, "plan_execution")
+        update.update({"executed_tasks": executed_tasks, "task_results": task_results,
+                       "execution_plan": execution_plan})
+        return update
+    if failure is not None:
         return {
             "researcher_messages": [ToolMessage(
-                content="没有找到执行计划",
+                content=failure.message,
                 name="plan_execution",
-                tool_call_id="execution_error_1"  # 添加 tool_call_id
+                tool_call_id=f"task_{failure.task_id}_error"
             )],
             "executed_tasks": executed_tasks,
             "task_results": task_results
         }
 
-    # 按顺序执行任务并检查依赖
-    for task in execution_plan["tasks"]:
-        task_id = task["id"]
-
-        # 检查任务是否已执行
-        if task_id in executed_tasks:
-            continue
-
-        # 检查依赖是否满足
-        dependencies_met = all(
-            dep_id in executed_tasks
-            for dep_id in task["dependencies"]
-        )
-
-        if not dependencies_met:
-            continue  # 依赖未满足，跳过此任务
-
-        # 执行任务
-        try:
-            tool = tools_by_name[task["tool_needed"]]
-
-            result = tool.invoke(task["parameters"])
-
-            if task["tool_needed"] == "search_flights" and (result is None or result == {}):
-                error_msg = f"抱歉，未能查询到前往 {task['parameters'].get('destination', task['parameters'].get('location', ''))} 的航班，请您更换日期后重试"
-                return {
-                    "researcher_messages": [ToolMessage(
-                        content=error_msg,
-                        name="plan_execution",
-                        tool_call_id=f"task_{task_id}_error"  # 添加 tool_call_id
-                    )],
-                    "executed_tasks": executed_tasks,
-                    "task_results": task_results
-                }
-
-            elif task["tool_needed"] == "search_hotels_with_llm" and (result is None or result == []):
-                error_msg = f"抱歉，未能查询到 {task['parameters'].get('destination', task['parameters'].get('location', ''))} 的可用酒店，请您更换日期或目的地后重试"
-                return {
-                    "researcher_messages": [ToolMessage(
-                        content=error_msg,
-                        name="plan_execution",
-                        tool_call_id=f"task_{task_id}_error"  # 添加 tool_call_id
-                    )],
-                    "executed_tasks": executed_tasks,
-                    "task_results": task_results
-                }
-
-            # 存储结果
-            executed_tasks.append(task_id)
-            task_results[task_id] = result
-
-            # 如果是航班查询，更新酒店查询的参数
-            if task["tool_needed"] == "search_flights" and result:
-                _update_hotel_params_with_flight_date(execution_plan, result)
-
-        except Exception as e:
-            return {
-                "researcher_messages": [ToolMessage(
-                    content=f"执行任务 {task_id} 失败: {str(e)}",
-                    name="plan_execution"
-                )],
-                "executed_tasks": executed_tasks,
-                "task_results": task_results
-            }
-
     # 检查是否所有任务都已完成
     all_tasks_completed = len(executed_tasks) == len(execution_plan["tasks"])
 
@@ -213,7 +495,8 @@ def plan_execution_node(state: ResearcherState):
 
     return {
         "researcher_messages": [ToolMessage(
-            content=task_results,
+            content=compact_state.state_reference("task_results", task_results)
+            if compact_state.STATE_COMPACT else task_results,
             name="plan_execution",
             tool_call_id="execution_complete"  # 添加 tool_call_id
         )],
@@ -224,26 +507,194 @@ def plan_execution_node(state: ResearcherState):
     }
 
 
+def _plan_execution_error(content: str, tool_call_id: str, executed_tasks: list, task_results: dict) -> dict:
+    return {
+        "researcher_messages": [ToolMessage(
+            content=content,
+            name="plan_execution",
+            tool_call_id=tool_call_id
+        )],
+        "executed_tasks": executed_tasks,
+        "task_results": task_results
+    }
+
+
+def _budget_spent(execution_plan: dict) -> TaskFailure:
+    """执行前预算已经用完：记为第一个未完成任务超时"""
+    task_id = next((task["id"] for task in execution_plan["tasks"]), "")
+    return TaskFailure(task_id, "执行任务前时间预算已用完", timed_out=True)
+
+
+def plan_execution_node(state: ResearcherState):
+    """专门处理按计划执行任务的节点，互不依赖的任务并发执行"""
+    execution_plan = state.get("execution_plan", {})
+    executed_tasks = state.get("executed_tasks", [])
+    task_results = state.get("task_results", {})
+
+    if state.get("deadline_exceeded"):
+        # 规划阶段已经超时，不再执行任务
+        return {}
+    if not execution_plan or "tasks" not in execution_plan:
+        return _plan_execution_error("没有找到执行计划", "execution_error_1", executed_tasks, task_results)
+    if expired():
+        return _plan_execution_update(execution_plan, executed_tasks, task_results, _budget_spent(execution_plan))
+
+    # 执行前校验依赖关系，缺失依赖或循环依赖直接返回
+    try:
+        failure = execute_plan(
+            execution_plan["tasks"],
+            _run_plan_task,
+            executed_tasks,
+            task_results,
+            on_task_done=_on_plan_task_done(execution_plan),
+            speculation_key=_hotel_speculation_key,
+            timeout=remaining(),
+        )
+    except PlanValidationError as e:
+        return _plan_execution_error(f"执行计划无效: {str(e)}", "execution_error_2", executed_tasks, task_results)
+
+    return _plan_execution_update(execution_plan, executed_tasks, task_results, failure)
+
+
+async def aplan_execution_node(state: ResearcherState):
+    """plan_execution_node 的异步版本，任务以 asyncio 任务并发执行"""
+    execution_plan = state.get("execution_plan", {})
+    executed_tasks = state.get("executed_tasks", [])
+    task_results = state.get("task_results", {})
+
+    if state.get("deadline_exceeded"):
+        return {}
+    if not execution_plan or "tasks" not in execution_plan:
+        return _plan_execution_error("没有找到执行计划", "execution_error_1", executed_tasks, task_results)
+    if expired():
+        return _plan_execution_update(execution_plan, executed_tasks, task_results, _budget_spent(execution_plan))
+
+    try:
+        failure = await aexecute_plan(
+            execution_plan["tasks"],
+            _arun_plan_task,
+            executed_tasks,
+            task_results,
+            on_task_done=_on_plan_task_done(execution_plan),
+            speculation_key=_hotel_speculation_key,
+            timeout=remaining(),
+        )
+    except PlanValidationError as e:
+        return _plan_execution_error(f"执行计划无效: {str(e)}", "execution_error_2", executed_tasks, task_results)
+
+    return _plan_execution_update(execution_plan, executed_tasks, task_results, failure)
+
+
 def _update_hotel_params_with_flight_date(plan: dict, flight_result: dict):
     """根据航班信息更新酒店查询参数"""
+    departure = flight_result.get("departureDate")
+    if not departure:
+        return
     for task in plan["tasks"]:
         if task["tool_needed"] == "search_hotels_with_llm":
+            parameters = task["parameters"]
+            # 航班日期与计划入住日期不同时（例如灵活日期选了更便宜的一天），退房日期同步平移，入住晚数不变
+            check_in = parse_date_locally(str(parameters.get("check_in_date", "")))
+            check_out = parse_date_locally(str(parameters.get("check_out_date", "")))
+            if check_in and check_out and check_in != departure:
+                shift = datetime.strptime(departure, "%Y-%m-%d") - datetime.strptime(check_in, "%Y-%m-%d")
+                parameters["check_out_date"] = (datetime.strptime(check_out, "%Y-%m-%d") + shift).strftime("%Y-%m-%d")
             # 更新酒店查询日期参数
-            task["parameters"]["check_in_date"] = flight_result.get("departureDate",
-                                                                    task["parameters"]["check_in_date"])
-
-# Build the agent workflow
-agent_builder = StateGraph(ResearcherState, output_schema=ResearcherOutputState)
-# Add nodes to the graph
-agent_builder.add_node("planning_agent_node", planning_agent_node)
-agent_builder.add_node("plan_execution", plan_execution_node)  # 新增计划执行节点
-agent_builder.add_node("book_flight_and_hotel", book_flight_and_hotel)
-agent_builder.add_edge(START, "planning_agent_node")
-agent_builder.add_edge("planning_agent_node", "plan_execution")
-agent_builder.add_edge("plan_execution", "book_flight_and_hotel")
-agent_builder.add_edge("book_flight_and_hotel", END)
-# Compile the agent
-researcher_agent = agent_builder.compile()
+            parameters["check_in_date"] = departure
+
+def build_researcher_graph(planning_node, execution_node, booking_node, checkpointer=None):
+    """使用给定的节点实现构建研究员 Agent 工作流，同步和异步版本共享同一拓扑"""
+    # Build the agent workflow
+    agent_builder = StateGraph(ResearcherState, output_schema=ResearcherOutputState)
+    # Add nodes to the graph
+    # 每个节点记录耗时跨度，并在状态中传递请求ID和截止时间
+    agent_builder.add_node("planning_agent_node", instrument_node("planning_agent_node", deadline_node(planning_node)))
+    agent_builder.add_node("plan_execution",
+                           instrument_node("plan_execution", deadline_node(execution_node)))  # 新增计划执行节点
+    agent_builder.add_node("book_flight_and_hotel",
+                           instrument_node("book_flight_and_hotel", deadline_node(booking_node)))
+    agent_builder.add_edge(START, "planning_agent_node")
+    agent_builder.add_edge("planning_agent_node", "plan_execution")
+    agent_builder.add_edge("plan_execution", "book_flight_and_hotel")
+    agent_builder.add_edge("book_flight_and_hotel", END)
+    # Compile the agent
+    return agent_builder.compile(checkpointer=checkpointer)
+
+
+@lru_cache(maxsize=None)
+def get_researcher_agent():
+    """首次调用时编译同步工作流，之后复用同一个编译结果"""
+    return build_researcher_graph(planning_agent_node, plan_execution_node, book_flight_and_hotel)
+
+
+@lru_cache(maxsize=None)
+def get_async_researcher_agent():
+    """异步版本：节点和工具均为协程，适合在单个事件循环中并发处理大量请求"""
+    return build_researcher_graph(aplanning_agent_node, aplan_execution_node, book_flight_and_hotel)
+
+
+@lru_cache(maxsize=None)
+def get_durable_researcher_agent():
+    """
+    带检查点的同步工作流，检查点后端由 CHECKPOINT_BACKEND 决定（未配置时使用进程内检查点）
+
+    调用时需要在 config 中指定 thread_id，见 run_durable。
+    """
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    checkpointer = build_graph_checkpointer() or InMemorySaver()
+    return build_researcher_graph(planning_agent_node, plan_execution_node, book_flight_and_hotel,
+                                  checkpointer=checkpointer)
+
+
+def run_durable(user_request: str, thread_id: str) -> dict:
+    """
+    以可恢复的方式执行请求
+
+    同一 thread_id 上次执行在某个节点中断（进程崩溃或节点抛出异常）时，从中断的节点继续；
+    否则以该请求重新执行，状态中已完成的任务（executed_tasks）和持久化的任务结果都不会重复执行。
+    每次调用都重新计算时间预算，并清除上一次调用留在状态中的超时标记。
+
+    Args:
+        user_request: 用户请求
+        thread_id: 会话ID，重试时使用同一个ID
+
+    Returns:
+        工作流的最终状态
+    """
+    from langgraph.types import Command
+
+    graph = get_durable_researcher_agent()
+    config = {"configurable": {"thread_id": thread_id}}
+    if graph.get_state(config).next:
+        return graph.invoke(Command(update={"deadline_exceeded": None}), deadline_config(config))
+    return graph.invoke({"researcher_messages": [HumanMessage(content=user_request)], "deadline_exceeded": None},
+                        deadline_config(config))
+
+
+def __getattr__(name: str):
+    # 兼容 supervisor_agent.researcher_agent 的写法，访问时才编译图
+    if name == "researcher_agent":
+        return get_researcher_agent()
+    if name == "async_researcher_agent":
+        return get_async_researcher_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def astream_researcher(user_request: str, stream_mode: str = "updates"):
+    """
+    以流式方式异步执行研究员 Agent，逐个产出节点的状态更新
+
+    Args:
+        user_request: 用户请求
+        stream_mode: LangGraph 流式模式，默认按节点产出状态更新
+
+    Yields:
+        LangGraph astream 产出的数据块
+    """
+    inputs = {"researcher_messages": [HumanMessage(content=user_request)]}
+    async for chunk in get_async_researcher_agent().astream(inputs, deadline_config(), stream_mode=stream_mode):
+        yield chunk
 
 
 def main():
@@ -266,7 +717,7 @@ def main():
         print("[MAIN] 开始执行 Agent...")
 
         # 直接获取最终结果而不是流式输出
-        result = researcher_agent.invoke(test_input)
+        result = get_researcher_agent().invoke(test_input, deadline_config())
         # print(result)
         # # 展示任务执行结果
         # task_results = result.get("task_results", {})
@@ -281,5 +732,20 @@ def main():
         print(f"详细错误信息: {traceback.format_exc()}")
         print(f"❌ Agent 执行失败: {str(e)}")
 
+async def amain():
+    """使用异步工作流执行同一个测试用例，并流式打印每个节点的完成情况"""
+    user_request = "帮我预订十月二十号从北京去武汉的机票和酒店，住两晚，我的名字是王伟"
+    print(f"[MAIN] 初始化输入: {user_request}")
+    try:
+        async for chunk in astream_researcher(user_request):
+            print(f"[STREAM] 节点完成: {', '.join(chunk)}")
+        print("✅ Agent 执行成功!")
+    except Exception as e:
+        print(f"详细错误信息: {traceback.format_exc()}")
+        print(f"❌ Agent 执行失败: {str(e)}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--async" in sys.argv:
+        asyncio.run(amain())
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/20 10:10
+# @Author  : 周启航-开发
+# @File    : conftest.py
+import time
+
+import pytest
+
+
+class FakeClock:
+    """替换被测模块中的 time：时间只在测试推进 now 时变化，sleep 只记录时长"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(round(seconds, 6))
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """返回 install(module)：把 module.time 替换为同一个 FakeClock 并返回它"""
+    clock = FakeClock()
+
+    def install(module) -> FakeClock:
+        monkeypatch.setattr(module, "time", clock)
+        return clock
+    return install
+
+
+def _wait_for(predicate, timeout: float = 3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def wait_for():
+    """轮询直到 predicate 为真，超过 timeout 秒时测试失败"""
+    return _wait_for
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 21:55
+# @Author  : 周启航-开发
+# @File    : test_cache.py
+import asyncio
+import threading
+
+import pytest
+
+import cache
+from cache import InMemoryBackend, RedisBackend, ResultCache, flight_cache_key
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(cache)
+
+
+def _counter(*values):
+    calls = []
+
+    def compute():
+        calls.append(len(calls))
+        return values[min(len(calls) - 1, len(values) - 1)]
+    return compute, calls
+
+
+def test_fresh_entries_are_served_from_cache(clock):
+    results = ResultCache(InMemoryBackend(), ttl=10, stale_ttl=20)
+    compute, calls = _counter("v1", "v2")
+    assert results.get_or_compute("k", compute) == "v1"
+    clock.now += 9
+    assert results.get_or_compute("k", compute) == "v1"
+    assert len(calls) == 1
+    assert results.stats()["hits"] == 1
+    assert results.stats()["misses"] == 1
+
+
+def test_stale_entries_are_returned_while_refreshing_in_background(clock, wait_for):
+    results = ResultCache(InMemoryBackend(), ttl=10, stale_ttl=20)
+    compute, calls = _counter("v1", "v2")
+    results.get_or_compute("k", compute)
+    clock.now += 15
+    assert results.get_or_compute("k", compute) == "v1"
+    wait_for(lambda: results.stats()["refreshes"] == 1)
+    assert results.get_or_compute("k", compute) == "v2"
+    assert results.stats()["stale_hits"] == 1
+
+
+def test_concurrent_stale_reads_start_a_single_refresh(clock, wait_for):
+    results = ResultCache(InMemoryBackend(), ttl=10, stale_ttl=20)
+    results.get_or_compute("k", lambda: "v1")
+    clock.now += 15
+    release = threading.Event()
+    refreshes = []
+
+    def slow_compute():
+        refreshes.append(1)
+        release.wait(2)
+        return "v2"
+
+    for _ in range(5):
+        assert results.get_or_compute("k", slow_compute) == "v1"
+    release.set()
+    wait_for(lambda: results.stats()["refreshes"] == 1)
+    assert len(refreshes) == 1
+
+
+def test_entries_past_the_stale_window_are_recomputed(clock):
+    results = ResultCache(InMemoryBackend(), ttl=10, stale_ttl=20)
+    compute, calls = _counter("v1", "v2")
+    results.get_or_compute("k", compute)
+    clock.now += 31
+    assert results.get_or_compute("k", compute) == "v2"
+    assert results.stats()["misses"] == 2
+
+
+def test_errors_are_not_cached(clock):
+    results = ResultCache(InMemoryBackend(), ttl=10, stale_ttl=20)
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        results.get_or_compute("k", fail)
+    assert results.get_or_compute("k", lambda: "v1") == "v1"
+
+
+def test_failed_refresh_keeps_the_stale_value(clock, wait_for):
+    results = ResultCache(InMemoryBackend(), ttl=10, stale_ttl=20)
+    results.get_or_compute("k", lambda: "v1")
+    clock.now += 15
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    assert results.get_or_compute("k", fail) == "v1"
+    wait_for(lambda: results.stats()["refresh_errors"] == 1)
+    assert results.get_or_compute("k", fail) == "v1"
+
+
+def test_uncacheable_results_are_returned_but_not_stored(clock):
+    results = ResultCache(InMemoryBackend(), ttl=10, stale_ttl=20)
+    compute, calls = _counter({"tasks": []}, {"tasks": [1]})
+    cacheable = lambda value: bool(value["tasks"])  # noqa: E731
+    assert results.get_or_compute("k", compute, cacheable=cacheable) == {"tasks": []}
+    assert results.get_or_compute("k", compute, cacheable=cacheable) == {"tasks": [1]}
+    assert results.get_or_compute("k", compute, cacheable=cacheable) == {"tasks": [1]}
+    assert len(calls) == 2
+
+
+def test_invalidate_forces_recompute(clock):
+    results = ResultCache(InMemoryBackend(), ttl=10, stale_ttl=20)
+    compute, calls = _counter("v1", "v2")
+    results.get_or_compute("k", compute)
+    results.invalidate("k")
+    assert results.get_or_compute("k", compute) == "v2"
+
+
+def test_async_stale_entries_refresh_on_the_running_loop(clock):
+    results = ResultCache(InMemoryBackend(), ttl=10, stale_ttl=20)
+    values = iter(["v1", "v2"])
+
+    async def acompute():
+        return next(values)
+
+    async def scenario():
+        first = await results.aget_or_compute("k", acompute)
+        clock.now += 15
+        stale = await results.aget_or_compute("k", acompute)
+        # 让后台刷新任务运行
+        for _ in range(10):
+            await asyncio.sleep(0)
+        return first, stale, await results.aget_or_compute("k", acompute)
+
+    assert asyncio.run(scenario()) == ("v1", "v1", "v2")
+    assert results.stats()["refreshes"] == 1
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = InMemoryBackend(max_entries=2)
+    backend.set("a", 1, 0, 10)
+    backend.set("b", 2, 0, 10)
+    backend.get("a")
+    backend.set("c", 3, 0, 10)
+    assert backend.get("b") is None
+    assert backend.get("a") == (1, 0)
+    assert backend.evictions == 1
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expires[key] = ex
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_redis_backend_round_trips_json_and_sets_expiry():
+    client = FakeRedis()
+    backend = RedisBackend(client=client)
+    backend.set("PEK:WUH:2026-10-20", [{"flightNo": "CA8216"}], 123.0, 30.5)
+    assert backend.get("PEK:WUH:2026-10-20") == ([{"flightNo": "CA8216"}], 123.0)
+    assert client.expires["flight:PEK:WUH:2026-10-20"] == 30
+    backend.delete("PEK:WUH:2026-10-20")
+    assert backend.get("PEK:WUH:2026-10-20") is None
+
+
+def test_flight_cache_key_is_normalized():
+    assert flight_cache_key(" pek", "wuh ", " 2026-10-20 ") == "PEK:WUH:2026-10-20"
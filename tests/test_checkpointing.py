@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/20 16:50
+# @Author  : 周启航-开发
+# @File    : test_checkpointing.py
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+import checkpointing
+from checkpointing import SqliteTaskResultStore, build_graph_checkpointer, task_key
+from deadline import deadline_config
+
+TASK = {"id": "task1", "tool_needed": "search_flights",
+        "parameters": {"home": "PEK", "destination": "WUH", "date": "2026-11-20"}}
+
+
+def test_task_key_ignores_task_id_and_parameter_order():
+    reordered = {"id": "task9", "tool_needed": "search_flights",
+                 "parameters": {"date": "2026-11-20", "destination": "WUH", "home": "PEK"}}
+    assert task_key(TASK) == task_key(reordered)
+    assert task_key(TASK) != task_key({**TASK, "tool_needed": "search_hotels_with_llm"})
+
+
+def test_task_results_survive_a_restart(tmp_path):
+    path = tmp_path / "checkpoints.sqlite"
+    store = SqliteTaskResultStore(path)
+    store.put(task_key(TASK), "search_flights", {"flightNo": "CA8216", "price": 1280})
+    store.close()
+
+    restarted = SqliteTaskResultStore(path)
+    result, _ = restarted.get(task_key(TASK))
+    assert result == {"flightNo": "CA8216", "price": 1280}
+    restarted.close()
+
+
+def test_expired_task_results_are_ignored(tmp_path, fake_clock):
+    clock = fake_clock(checkpointing)
+    store = SqliteTaskResultStore(tmp_path / "checkpoints.sqlite", ttl=60)
+    store.put(task_key(TASK), "search_flights", {"flightNo": "CA8216"})
+    clock.now += 59
+    assert store.get(task_key(TASK)) is not None
+    clock.now += 2
+    assert store.get(task_key(TASK)) is None
+    store.close()
+
+
+def test_graph_run_resumes_from_the_checkpoint_after_a_restart(tmp_path, monkeypatch):
+    pytest.importorskip("langgraph.checkpoint.sqlite")
+    from supervisor_agent import build_researcher_graph
+
+    monkeypatch.setattr(checkpointing, "CHECKPOINT_BACKEND", "sqlite")
+    monkeypatch.setattr(checkpointing, "CHECKPOINT_SQLITE_PATH", tmp_path / "checkpoints.sqlite")
+    calls = []
+
+    def planning(state):
+        calls.append("planning")
+        return {"execution_plan": {"tasks": [TASK]}}
+
+    def execution(state):
+        calls.append("execution")
+        if calls.count("execution") == 1:
+            raise RuntimeError("worker crashed")
+        return {"task_results": {"task1": {"flightNo": "CA8216"}}}
+
+    def booking(state):
+        calls.append("booking")
+        return {"researcher_messages": [AIMessage(content="已预订 CA8216")]}
+
+    config = {"configurable": {"thread_id": "thread-1"}}
+    graph = build_researcher_graph(planning, execution, booking, checkpointer=build_graph_checkpointer())
+    with pytest.raises(RuntimeError, match="worker crashed"):
+        graph.invoke({"researcher_messages": [HumanMessage(content="帮我预订机票")]}, deadline_config(config))
+
+    # 新的检查点实例读取同一个 SQLite 文件，相当于进程重启
+    restarted = build_researcher_graph(planning, execution, booking, checkpointer=build_graph_checkpointer())
+    assert restarted.get_state(config).next == ("plan_execution",)
+    result = restarted.invoke(None, deadline_config(config))
+    assert calls == ["planning", "execution", "execution", "booking"]
+    assert result["task_results"] == {"task1": {"flightNo": "CA8216"}}
+    assert result["researcher_messages"][-1].content == "已预订 CA8216"
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 21:40
+# @Author  : 周启航-开发
+# @File    : test_date_parser.py
+from datetime import date
+
+import pytest
+
+from date_parser import DailyDateMemo, chinese_to_int, find_date_phrase, parse_date_locally
+
+# 2026-10-14 是周三
+TODAY = date(2026, 10, 14)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("20", 20),
+    ("十", 10),
+    ("十五", 15),
+    ("二十", 20),
+    ("三十一", 31),
+    ("两百零五", 205),
+    ("二〇二五", 2025),
+    ("", None),
+    ("廿", None),
+])
+def test_chinese_to_int(text, expected):
+    assert chinese_to_int(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2026-10-20", "2026-10-20"),
+    ("2026/1/5", "2026-01-05"),
+    ("2026年10月20日", "2026-10-20"),
+    ("十月二十号", "2026-10-20"),
+    ("10月20日", "2026-10-20"),
+    ("二〇二七年一月三日", "2027-01-03"),
+    ("今天", "2026-10-14"),
+    ("明天", "2026-10-15"),
+    ("后天", "2026-10-16"),
+    ("大后天", "2026-10-17"),
+    ("昨天", "2026-10-13"),
+    ("三天后", "2026-10-17"),
+    ("十五天以后", "2026-10-29"),
+    ("25号", "2026-10-25"),
+    ("下个月3号", "2026-11-03"),
+])
+def test_absolute_and_relative_dates(text, expected):
+    assert parse_date_locally(text, TODAY) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    # 不带前缀时取最近的一天，已经过去则顺延到下周
+    ("周五", "2026-10-16"),
+    ("周一", "2026-10-19"),
+    ("星期三", "2026-10-14"),
+    ("这周一", "2026-10-12"),
+    ("下周一", "2026-10-19"),
+    ("下个星期天", "2026-10-25"),
+    ("下下周三", "2026-10-28"),
+    ("周末", "2026-10-17"),
+])
+def test_weekdays(text, expected):
+    assert parse_date_locally(text, TODAY) == expected
+
+
+def test_next_month_wraps_into_next_year():
+    assert parse_date_locally("下月5号", date(2026, 12, 20)) == "2027-01-05"
+
+
+@pytest.mark.parametrize("text", ["", "随便", "十二月三十二号", "2026-02-30", "下周八", "2月30日"])
+def test_unparsable_descriptions_return_none(text):
+    assert parse_date_locally(text, TODAY) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("帮我预订十月二十号从北京去武汉的机票", "十月二十号"),
+    ("下周三出发去上海", "下周三"),
+    ("大后天走", "大后天"),
+    ("2026-10-20从北京出发", "2026-10-20"),
+    ("帮我订一张机票", None),
+])
+def test_find_date_phrase(text, expected):
+    assert find_date_phrase(text) == expected
+
+
+def test_daily_memo_expires_when_the_day_changes():
+    memo = DailyDateMemo()
+    memo.put(" 明天 ", "2026-10-15", TODAY)
+    assert memo.get("明天", TODAY) == "2026-10-15"
+    assert memo.get("明天", date(2026, 10, 15)) is None
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/20 16:10
+# @Author  : 周启航-开发
+# @File    : test_fast_planner.py
+from datetime import date
+
+import pytest
+
+from fast_planner import build_plan, extract_itinerary, plan_signature
+
+# 2026-10-14 是周三
+TODAY = date(2026, 10, 14)
+
+
+def test_extracts_a_flight_and_hotel_request():
+    itinerary = extract_itinerary("帮我预订十月二十号从北京去武汉的机票和酒店，住两晚，我的名字是王伟", TODAY)
+    assert itinerary == {
+        "origin": "北京", "destination": "武汉", "date": "2026-10-20", "nights": 2, "need_hotel": True,
+        "passenger_name": "王伟", "flex_days": 0,
+    }
+
+
+@pytest.mark.parametrize("text, name", [
+    ("我叫王伟帮我订明天北京到上海的机票", "王伟"),
+    ("我叫张三想订明天北京到上海的机票", "张三"),
+    ("我叫欧阳娜娜，明天从北京飞上海", "欧阳娜娜"),
+    ("我叫张三丰要订明天北京到上海的机票", "张三丰"),
+    ("明天从北京飞上海，乘客李四3点到机场", "李四"),
+    ("我叫王伟周五从北京飞上海", "王伟"),
+    ("My flight: 我叫Tom Smith，明天从北京飞上海", "Tom Smith"),
+    ("明天从北京飞上海的机票", ""),
+])
+def test_passenger_name_stops_at_verbs_and_particles(text, name):
+    assert extract_itinerary(text, TODAY)["passenger_name"] == name
+
+
+@pytest.mark.parametrize("text", [
+    # 姓名超过四个字，无法确定在哪里结束
+    "我叫诸葛孔明先生要订明天北京到上海的机票",
+    # 提到了乘客但没有给出姓名
+    "两位乘客明天从北京飞上海",
+])
+def test_ambiguous_passenger_name_is_left_to_the_llm_planner(text):
+    assert extract_itinerary(text, TODAY) is None
+
+
+@pytest.mark.parametrize("text", [
+    "帮我订一家北京的酒店",
+    "明天帮我订张机票",
+    "下个月找个时间带家人出去玩几天，机票酒店都帮我安排好",
+    "帮我订明天从北京去武汉的机票和酒店",
+])
+def test_requests_missing_required_fields_are_not_extracted(text):
+    assert extract_itinerary(text, TODAY) is None
+
+
+@pytest.mark.parametrize("text, flex_days", [
+    ("明天从北京飞上海，前后三天都行", 3),
+    ("明天从北京飞上海，日期灵活", 3),
+    ("明天从北京飞上海", 0),
+])
+def test_flex_days(text, flex_days):
+    assert extract_itinerary(text, TODAY)["flex_days"] == flex_days
+
+
+def test_build_plan_matches_the_llm_planner_structure():
+    itinerary = extract_itinerary("我叫王伟，十月二十号从北京去武汉，订机票和酒店住两晚，前后两天", TODAY)
+    plan = build_plan(itinerary)
+    flight, hotel = plan["tasks"]
+    assert plan["passenger_name"] == "王伟"
+    assert flight["tool_needed"] == "search_flights"
+    assert flight["parameters"] == {"home": "北京", "destination": "武汉", "date": "2026-10-20", "flex_days": 2}
+    assert hotel["dependencies"] == ["task1"]
+    assert hotel["parameters"] == {"destination": "武汉", "check_in_date": "2026-10-20",
+                                   "check_out_date": "2026-10-22"}
+
+
+def test_build_plan_without_hotel_or_name():
+    plan = build_plan(extract_itinerary("明天从北京飞上海", TODAY))
+    assert [task["tool_needed"] for task in plan["tasks"]] == ["search_flights"]
+    assert "passenger_name" not in plan
+
+
+def test_plan_signature_uses_iata_codes_for_extracted_requests():
+    first = extract_itinerary("我叫王伟，明天从北京飞上海", TODAY)
+    second = extract_itinerary("明天北京市到上海的机票，乘客王伟", TODAY)
+    assert plan_signature("", first) == plan_signature("", second)
+    assert plan_signature("", first).startswith("fast|PEK|")
+
+
+def test_plan_signature_of_other_requests_ignores_punctuation_and_includes_the_day():
+    assert plan_signature("帮我 安排一下，行程！", today=TODAY) == plan_signature("帮我安排一下行程", today=TODAY)
+    assert plan_signature("帮我安排一下行程", today=TODAY) != plan_signature("帮我安排一下行程", today=date(2026, 10, 15))
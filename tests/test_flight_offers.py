@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/20 14:50
+# @Author  : 周启航-开发
+# @File    : test_flight_offers.py
+import math
+
+import pytest
+
+import supervisor_agent
+import utils
+from flight_offers import FlightOffers, parse_clock_minutes, parse_duration_minutes, parse_price
+from scheduler import TaskFailure
+
+FLIGHTS = [
+    {"flightNo": "CA8216", "airline": "CA", "price": 1280, "duration": "02h10m", "departureTime": "08:00"},
+    {"flightNo": "MU5120", "airline": "MU", "price": 960, "duration": "02h40m", "departureTime": "13:15",
+     "transferNum": 1},
+    {"flightNo": "CZ3151", "airline": "CZ", "price": "1100", "duration": "2小时5分", "departureTime": "19:30"},
+    {"flightNo": "HU7181", "airline": "HU", "price": None, "duration": "02h00m", "departureTime": "10:00"},
+    {"flightNo": "MU2456", "airline": "mu", "price": 1500, "duration": "PT1H55M", "departureTime": "21:40"},
+]
+
+
+def _numbers(offers):
+    return [offer["flightNo"] for offer in offers]
+
+
+@pytest.mark.parametrize("text, minutes", [
+    ("02h05m", 125), ("2小时5分", 125), ("PT2H5M", 125), ("95", 95), (80, 80), ("", -1), ("unknown", -1),
+])
+def test_parse_duration_minutes(text, minutes):
+    assert parse_duration_minutes(text) == minutes
+
+
+def test_parse_clock_minutes_and_price():
+    assert parse_clock_minutes("08:30") == 510
+    assert parse_clock_minutes("") == -1
+    assert parse_price("1280") == 1280.0
+    for value in (None, "", "面议", 0, -5, float("inf")):
+        assert math.isnan(parse_price(value))
+
+
+def test_offers_without_a_price_are_always_filtered_out():
+    offers = FlightOffers(FLIGHTS)
+    assert "HU7181" not in _numbers(offers.top_k(10))
+    assert offers.filter_mask().tolist() == [True, True, True, False, True]
+
+
+def test_filters_combine():
+    offers = FlightOffers(FLIGHTS)
+    assert offers.filter_mask(max_price=1200).tolist() == [False, True, True, False, False]
+    assert offers.filter_mask(earliest_departure="12:00").tolist() == [False, True, True, False, True]
+    assert offers.filter_mask(latest_departure="13:15").tolist() == [True, True, False, False, False]
+    # 航司代码不区分大小写
+    assert offers.filter_mask(airlines=["mu"]).tolist() == [False, True, False, False, True]
+    assert _numbers(offers.top_k(5, max_price=1300, earliest_departure="09:00", airlines=["MU", "CZ"])) == \
+        ["CZ3151", "MU5120"]
+
+
+def test_top_k_orders_by_score_and_truncates():
+    offers = FlightOffers(FLIGHTS)
+    ranked = _numbers(offers.top_k(4))
+    assert ranked[0] == "CZ3151"
+    assert len(ranked) == 4
+    assert _numbers(offers.top_k(2)) == ranked[:2]
+    assert offers.top_k(0) == []
+    assert FlightOffers([]).top_k(5) == []
+
+
+def test_preferred_airline_raises_rank_without_excluding_others():
+    offers = FlightOffers(FLIGHTS)
+    ranked = _numbers(offers.top_k(4, preferred_airlines=["CA"]))
+    assert ranked.index("CA8216") < _numbers(offers.top_k(4)).index("CA8216")
+    assert len(ranked) == 4
+
+
+def test_top_k_maps_the_raw_flight_fields():
+    best = FlightOffers(FLIGHTS).top_k(1, airlines=["CA"])[0]
+    assert best["flightNo"] == "CA8216"
+    assert best["price"] == 1280
+    assert best["departureTime"] == "08:00"
+
+
+def test_response_with_every_offer_filtered_out_fails_the_task():
+    result = utils._flight_from_response({"result": {"flightInfo": FLIGHTS}}, "2026-11-20", "WUH", max_price=500)
+    assert result["error"]
+    assert "5 个航班均不符合筛选条件" in result["message"]
+    task = {"id": "task_1", "tool_needed": "search_flights", "parameters": {"destination": "WUH"}}
+    with pytest.raises(TaskFailure) as failure:
+        supervisor_agent._check_task_result(task, result)
+    assert failure.value.message == result["message"]
+
+
+def test_response_keeps_the_best_offer_at_the_top_level():
+    result = utils._flight_from_response({"result": {"flightInfo": FLIGHTS}}, "2026-11-20", "WUH", top_k=2)
+    assert result["flightNo"] == result["offers"][0]["flightNo"]
+    assert len(result["offers"]) == 2
+    assert result["offer_count"] == 5
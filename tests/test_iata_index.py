@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/20 15:30
+# @Author  : 周启航-开发
+# @File    : test_iata_index.py
+import json
+
+import pytest
+
+from iata_index import IataIndex, normalize_name
+
+
+@pytest.fixture(scope="module")
+def index():
+    return IataIndex(learned_path=None)
+
+
+@pytest.mark.parametrize("name, code", [
+    ("PEK", "PEK"),
+    ("pvg", "PVG"),
+    ("北京", "PEK"),
+    ("北京市", "PEK"),
+    ("武汉天河国际机场", "WUH"),
+    ("大兴机场", "PKX"),
+    ("Beijing", "PEK"),
+    ("Xi'an", "XIY"),
+    ("xian", "XIY"),
+    ("Hong Kong", "HKG"),
+    ("BJS", "PEK"),
+])
+def test_exact_and_suffix_lookup(index, name, code):
+    assert index.lookup(name) == code
+
+
+@pytest.mark.parametrize("name, code", [
+    ("武汉市洪山区", "WUH"),
+    ("哈尔", "HRB"),
+    ("Hangzhou Xiaoshan", "HGH"),
+])
+def test_prefix_lookup(index, name, code):
+    assert index.lookup(name) == code
+
+
+@pytest.mark.parametrize("name, code", [
+    ("beijnig", "PEK"),
+    ("guangzhuo", "CAN"),
+    ("chengud", "CTU"),
+    ("shenzen", "SZX"),
+    ("hangzou", "HGH"),
+])
+def test_fuzzy_lookup_tolerates_typos(index, name, code):
+    assert index.lookup(name) == code
+
+
+@pytest.mark.parametrize("name", [
+    # 拼音前缀是另一个城市的拼音
+    "xiangyang",
+    "xiangtan",
+    "shaoxing",
+    # 与三字母代码 WUH 只差一个字母
+    "wuhu",
+])
+def test_unknown_cities_do_not_resolve_to_a_neighbour(index, name):
+    # 襄阳、湘潭等不在机场表中，交给大模型转换，而不是返回拼写相近的城市
+    assert index.lookup(name) is None
+
+
+def test_unknown_codes_and_empty_names(index):
+    assert index.lookup("ZZZ") is None
+    assert index.lookup("") is None
+    assert index.lookup("  ") is None
+
+
+def test_fuzzy_can_be_disabled(index):
+    assert index.lookup("北京市", fuzzy=False) == "PEK"
+    assert index.lookup("武汉市洪山区", fuzzy=False) is None
+    assert index.lookup("beijnig", fuzzy=False) is None
+
+
+def test_learned_aliases_persist(tmp_path):
+    path = tmp_path / "learned.json"
+    IataIndex(learned_path=path).learn("襄阳", "xfn")
+    assert json.loads(path.read_text(encoding="utf-8")) == {"襄阳": "XFN"}
+    assert IataIndex(learned_path=path).lookup("襄阳市") == "XFN"
+
+
+def test_normalize_name():
+    assert normalize_name(" Xi'an ") == "xian"
+    assert normalize_name("Hong-Kong") == "hongkong"
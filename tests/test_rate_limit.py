@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 22:25
+# @Author  : 周启航-开发
+# @File    : test_rate_limit.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+import rate_limit
+from deadline import DeadlineExceeded, deadline_after, deadline_scope
+from rate_limit import AimdLimiter, TokenBucket, UpstreamGuard, build_guard, is_overload_error
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(rate_limit)
+
+
+class HttpError(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+def test_bucket_allows_a_burst_then_queues_callers_in_order(clock):
+    bucket = TokenBucket(10, capacity=2)
+    waits = [bucket.acquire() for _ in range(4)]
+    assert [round(wait, 6) for wait in waits] == [0.0, 0.0, 0.1, 0.2]
+    assert clock.sleeps == [0.1, 0.2]
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(10, capacity=2)
+    bucket.acquire(2)
+    clock.now += 10
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.1)
+
+
+def test_bucket_gives_up_without_consuming_when_wait_exceeds_timeout(clock):
+    bucket = TokenBucket(10, capacity=1)
+    bucket.acquire()
+    assert bucket.acquire(timeout=0.05) is None
+    # 放弃的预约已撤销，下一个调用方的等待时间不变
+    assert bucket.acquire() == pytest.approx(0.1)
+
+
+def test_bucket_refund_corrects_estimates(clock):
+    bucket = TokenBucket(10, capacity=10)
+    bucket.acquire(10)
+    bucket.refund(5)
+    assert bucket.acquire(5) == 0.0
+    bucket.refund(-1)
+    assert bucket.acquire() == pytest.approx(0.2)
+
+
+def test_zero_rate_bucket_never_waits(clock):
+    bucket = TokenBucket(0)
+    assert [bucket.acquire(100) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert clock.sleeps == []
+
+
+def test_async_bucket_waits_without_blocking_the_loop():
+    bucket = TokenBucket(20, capacity=1)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.ensure_future(ticker())
+        waits = [await bucket.aacquire() for _ in range(3)]
+        task.cancel()
+        return waits, ticks
+
+    waits, ticks = asyncio.run(scenario())
+    assert waits[0] == 0.0
+    assert waits[2] > 0
+    assert ticks > 1
+
+
+def test_aimd_decreases_multiplicatively_once_per_cooldown(clock):
+    limiter = AimdLimiter("test", max_limit=16, min_limit=2, cooldown=1.0)
+    limiter.on_overload()
+    assert limiter.limit == 8
+    limiter.on_overload()
+    assert limiter.limit == 8
+    assert limiter.overloads == 2
+    for _ in range(5):
+        clock.now += 1.0
+        limiter.on_overload()
+    assert limiter.limit == 2
+
+
+def test_aimd_increases_additively_up_to_the_maximum():
+    limiter = AimdLimiter("test", max_limit=3, initial=2)
+    limiter.on_success()
+    assert limiter.limit == pytest.approx(2.5)
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.limit == 3
+
+
+def test_aimd_queues_callers_beyond_the_limit():
+    limiter = AimdLimiter("test", max_limit=1)
+    assert limiter.acquire()
+    assert not limiter.acquire(timeout=0.05)
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(limiter.acquire(timeout=2)))
+    waiter.start()
+    time.sleep(0.05)
+    limiter.release()
+    waiter.join(2)
+    # 名额直接交给排队的调用方
+    assert granted == [True]
+    assert limiter.in_flight == 1
+    limiter.release()
+    assert limiter.in_flight == 0
+
+
+def test_aimd_growing_limit_wakes_waiters():
+    limiter = AimdLimiter("test", max_limit=2, initial=1, increase=2.0)
+    limiter.acquire()
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(limiter.acquire(timeout=2)))
+    waiter.start()
+    time.sleep(0.05)
+    limiter.on_success()
+    waiter.join(2)
+    assert granted == [True]
+    assert limiter.in_flight == 2
+
+
+def test_cancelled_async_waiter_does_not_leak_a_slot():
+    limiter = AimdLimiter("test", max_limit=1)
+
+    async def scenario():
+        await limiter.aacquire()
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limiter.release()
+        return limiter.in_flight
+
+    assert asyncio.run(scenario()) == 0
+
+
+@pytest.mark.parametrize("error, overload", [
+    (HttpError(429), True),
+    (HttpError(503), True),
+    (HttpError(500), False),
+    (TimeoutError(), True),
+    (type("RateLimitError", (Exception,), {})(), True),
+    (ValueError("bad json"), False),
+])
+def test_is_overload_error(error, overload):
+    assert is_overload_error(error) is overload
+
+
+def test_guard_shrinks_the_limit_on_overload_and_releases_the_slot():
+    guard = UpstreamGuard("test", AimdLimiter("test", max_limit=8))
+    with pytest.raises(HttpError):
+        with guard.guard():
+            raise HttpError(429)
+    assert guard.governor.limit == 4
+    assert guard.governor.in_flight == 0
+    with guard.guard():
+        pass
+    assert guard.governor.limit == pytest.approx(4.25)
+
+
+def test_guard_gives_up_when_the_request_budget_runs_out():
+    guard = UpstreamGuard("test", AimdLimiter("test", max_limit=1))
+    assert guard.governor.acquire()
+    started = time.monotonic()
+    with deadline_scope(deadline_after(0.4)):
+        with pytest.raises(DeadlineExceeded):
+            with guard.guard():
+                pass
+    assert time.monotonic() - started < 1.0
+    assert guard.governor.in_flight == 1
+
+
+def test_async_guard_gives_up_when_the_request_budget_runs_out():
+    guard = UpstreamGuard("test", AimdLimiter("test", max_limit=1))
+
+    async def scenario():
+        await guard.governor.aacquire()
+        with deadline_scope(deadline_after(0.4)):
+            with pytest.raises(DeadlineExceeded):
+                async with guard.aguard():
+                    pass
+        guard.governor.release()
+        return guard.governor.in_flight
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_build_guard_only_creates_configured_buckets():
+    assert build_guard("test").request_bucket is None
+    guard = build_guard("test", per_minute=120, tokens_per_minute=6000, max_concurrency=4)
+    assert guard.request_bucket.rate == 2
+    assert guard.token_bucket.rate == 100
+    assert guard.governor.max_limit == 4
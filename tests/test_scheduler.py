@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 21:20
+# @Author  : 周启航-开发
+# @File    : test_scheduler.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from scheduler import (PlanValidationError, TaskFailure, aexecute_plan, execute_plan, speculation_stats,
+                       topological_waves)
+
+
+def _task(task_id, *dependencies, **parameters):
+    return {"id": task_id, "tool_needed": "tool", "dependencies": list(dependencies), "parameters": parameters}
+
+
+def _ids(waves):
+    return [sorted(task["id"] for task in wave) for wave in waves]
+
+
+@pytest.fixture(autouse=True)
+def _reset_speculation_stats():
+    speculation_stats.reset()
+    yield
+    speculation_stats.reset()
+
+
+def test_waves_follow_dependencies():
+    tasks = [_task("d", "b", "c"), _task("b", "a"), _task("c", "a"), _task("a")]
+    assert _ids(topological_waves(tasks)) == [["a"], ["b", "c"], ["d"]]
+
+
+def test_executed_tasks_satisfy_dependencies():
+    tasks = [_task("a"), _task("b", "a")]
+    assert _ids(topological_waves(tasks, executed_tasks=["a"])) == [["b"]]
+
+
+@pytest.mark.parametrize("tasks, message", [
+    ([_task("a", "b"), _task("b", "a")], "循环依赖"),
+    ([_task("a", "a")], "循环依赖"),
+    ([_task("a", "missing")], "不存在"),
+    ([_task("a"), _task("a")], "重复"),
+    ([{"dependencies": []}], "缺少 id"),
+])
+def test_invalid_plans_are_rejected(tasks, message):
+    with pytest.raises(PlanValidationError, match=message):
+        topological_waves(tasks)
+
+
+def test_invalid_plan_runs_nothing():
+    calls = []
+    with pytest.raises(PlanValidationError):
+        execute_plan([_task("a"), _task("b", "c")], calls.append, [], {})
+    assert calls == []
+
+
+def test_independent_tasks_run_concurrently():
+    barrier = threading.Barrier(2, timeout=2)
+
+    def run(task):
+        # 两个任务必须同时在运行才能通过栅栏
+        barrier.wait()
+        return task["id"]
+
+    executed, results = [], {}
+    assert execute_plan([_task("a"), _task("b")], run, executed, results, max_parallelism=2) is None
+    assert results == {"a": "a", "b": "b"}
+    assert sorted(executed) == ["a", "b"]
+
+
+def test_on_task_done_updates_dependent_parameters():
+    seen = {}
+
+    def run(task):
+        seen[task["id"]] = dict(task["parameters"])
+        return task["parameters"].get("value", 1)
+
+    def on_done(task, result):
+        if task["id"] == "a":
+            tasks[1]["parameters"]["value"] = result + 1
+
+    tasks = [_task("a"), _task("b", "a")]
+    results = {}
+    assert execute_plan(tasks, run, [], results, on_task_done=on_done) is None
+    assert seen["b"] == {"value": 2}
+    assert results == {"a": 1, "b": 2}
+
+
+def test_failure_stops_dependents_and_keeps_finished_results():
+    def run(task):
+        if task["id"] == "a":
+            # 失败之后不再提交新任务，这里让 c 先被提交
+            time.sleep(0.05)
+            raise RuntimeError("upstream down")
+        return task["id"]
+
+    executed, results = [], {}
+    failure = execute_plan([_task("a"), _task("b", "a"), _task("c")], run, executed, results)
+    assert isinstance(failure, TaskFailure)
+    assert failure.task_id == "a"
+    assert "upstream down" in failure.message
+    assert not failure.timed_out
+    assert results == {"c": "c"}
+    assert "b" not in executed
+
+
+def test_first_failure_in_plan_order_is_reported():
+    def run(task):
+        if task["id"] == "b":
+            raise TaskFailure("b", "b failed")
+        time.sleep(0.05)
+        raise TaskFailure("a", "a failed")
+
+    failure = execute_plan([_task("a"), _task("b")], run, [], {}, max_parallelism=2)
+    assert failure.task_id == "a"
+
+
+def test_timeout_keeps_finished_results():
+    release = threading.Event()
+
+    def run(task):
+        if task["id"] == "slow":
+            release.wait(2)
+        return task["id"]
+
+    results = {}
+    started = time.perf_counter()
+    failure = execute_plan([_task("fast"), _task("slow")], run, [], results, max_parallelism=2, timeout=0.1)
+    elapsed = time.perf_counter() - started
+    release.set()
+    assert failure.task_id == "slow"
+    assert failure.timed_out
+    assert results == {"fast": "fast"}
+    assert elapsed < 1
+
+
+def _speculative_run(calls, lock):
+    def run(task):
+        with lock:
+            calls.append((task["id"], task["parameters"].get("city"), task.get("speculative", False)))
+        if task["id"] == "flight":
+            time.sleep(0.05)
+            return "PEK"
+        return task["parameters"]["city"]
+    return run
+
+
+def test_speculation_is_adopted_when_key_is_unchanged():
+    calls, lock = [], threading.Lock()
+    tasks = [_task("flight"), _task("hotel", "flight", city="北京")]
+    results = {}
+    failure = execute_plan(tasks, _speculative_run(calls, lock), [], results,
+                           speculation_key=lambda task: task["parameters"].get("city"))
+    assert failure is None
+    assert results == {"flight": "PEK", "hotel": "北京"}
+    assert [call for call in calls if call[0] == "hotel"] == [("hotel", "北京", True)]
+    assert speculation_stats.snapshot()["hits"] == 1
+
+
+def test_speculation_is_rolled_back_when_dependency_changes_parameters():
+    calls, lock = [], threading.Lock()
+    tasks = [_task("flight"), _task("hotel", "flight", city="北京")]
+
+    def on_done(task, result):
+        if task["id"] == "flight":
+            tasks[1]["parameters"]["city"] = "上海"
+
+    results = {}
+    failure = execute_plan(tasks, _speculative_run(calls, lock), [], results, on_task_done=on_done,
+                           speculation_key=lambda task: task["parameters"].get("city"))
+    assert failure is None
+    # 推测结果按旧参数计算，被丢弃后用新参数重新执行
+    assert results["hotel"] == "上海"
+    assert sorted(call for call in calls if call[0] == "hotel") == [("hotel", "上海", False), ("hotel", "北京", True)]
+    assert speculation_stats.snapshot()["misses"] == 1
+
+
+def test_speculation_is_abandoned_when_dependency_fails():
+    def run(task):
+        if task["id"] == "flight":
+            time.sleep(0.05)
+            raise RuntimeError("no flights")
+        return task["parameters"]["city"]
+
+    results = {}
+    failure = execute_plan([_task("flight"), _task("hotel", "flight", city="北京")], run, [], results,
+                           speculation_key=lambda task: task["parameters"].get("city"))
+    assert failure.task_id == "flight"
+    assert results == {}
+    assert speculation_stats.snapshot()["abandoned"] == 1
+
+
+def test_async_plan_respects_dependencies_and_failures():
+    order = []
+
+    async def run(task):
+        await asyncio.sleep(0.01)
+        order.append(task["id"])
+        if task["id"] == "c":
+            raise RuntimeError("boom")
+        return task["id"]
+
+    tasks = [_task("a"), _task("b", "a"), _task("c", "a"), _task("d", "b", "c")]
+    executed, results = [], {}
+    failure = asyncio.run(aexecute_plan(tasks, run, executed, results))
+    assert failure.task_id == "c"
+    assert order[0] == "a"
+    assert "d" not in order
+    assert results == {"a": "a", "b": "b"}
+
+
+def test_async_timeout_cancels_running_tasks():
+    cancelled = []
+
+    async def run(task):
+        if task["id"] == "slow":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(task["id"])
+                raise
+        return task["id"]
+
+    results = {}
+    failure = asyncio.run(aexecute_plan([_task("fast"), _task("slow")], run, [], results, timeout=0.1))
+    assert failure.timed_out
+    assert results == {"fast": "fast"}
+    assert cancelled == ["slow"]
+
+
+def test_async_speculation_is_rolled_back_when_dependency_changes_parameters():
+    calls = []
+    tasks = [_task("flight"), _task("hotel", "flight", city="北京")]
+
+    async def run(task):
+        calls.append((task["id"], task["parameters"].get("city"), task.get("speculative", False)))
+        if task["id"] == "flight":
+            await asyncio.sleep(0.05)
+            return "PEK"
+        return task["parameters"]["city"]
+
+    def on_done(task, result):
+        if task["id"] == "flight":
+            tasks[1]["parameters"]["city"] = "上海"
+
+    results = {}
+    failure = asyncio.run(aexecute_plan(tasks, run, [], results, on_task_done=on_done,
+                                        speculation_key=lambda task: task["parameters"].get("city")))
+    assert failure is None
+    assert results["hotel"] == "上海"
+    assert ("hotel", "北京", True) in calls
+    assert speculation_stats.snapshot()["misses"] == 1
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 22:40
+# @Author  : 周启航-开发
+# @File    : test_serving.py
+import threading
+import time
+
+import pytest
+
+import serving
+from serving import DrainingError, QueueFullError, WorkerPool
+
+
+class GatedGraph:
+    """替代编译好的工作流：放行前一直阻塞，记录收到的请求"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = []
+
+    def invoke(self, inputs, config):
+        self.started.append(inputs["researcher_messages"][0].content)
+        self.gate.wait(5)
+        return {"researcher_messages": []}
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    fake = GatedGraph()
+    monkeypatch.setattr(serving, "_warm_graph", lambda: fake.invoke)
+    yield fake
+    fake.gate.set()
+
+
+@pytest.fixture
+def make_pool(graph):
+    pools = []
+
+    def make(**kwargs):
+        kwargs.setdefault("workers", 1)
+        kwargs.setdefault("concurrency", 1)
+        kwargs.setdefault("max_queue_depth", 1)
+        pool = WorkerPool(backend="inprocess", **kwargs).start()
+        pools.append(pool)
+        return pool
+
+    yield make
+    graph.gate.set()
+    for pool in pools:
+        pool.drain(timeout=2)
+
+
+def test_jobs_complete_and_release_their_slot(make_pool, graph, wait_for):
+    pool = make_pool()
+    graph.gate.set()
+    _, future = pool.submit("帮我预订机票")
+    result = future.result(timeout=3)
+    assert result["status"] == "failed"
+    assert result["worker"] == "inprocess"
+    wait_for(lambda: pool.outstanding == 0)
+
+
+def test_submissions_beyond_capacity_are_rejected(make_pool, graph, wait_for):
+    pool = make_pool()
+    assert pool.capacity == 2
+    futures = [pool.submit(f"请求{index}")[1] for index in range(2)]
+    with pytest.raises(QueueFullError):
+        pool.submit("请求2")
+    graph.gate.set()
+    for future in futures:
+        future.result(timeout=3)
+    wait_for(lambda: pool.outstanding == 0)
+    # 名额释放后重新接收请求
+    assert pool.submit("请求3")[1].result(timeout=3)["status"] == "failed"
+
+
+def test_abandoned_jobs_free_their_slot(make_pool, graph, wait_for):
+    pool = make_pool()
+    job_id, future = pool.submit("请求0")
+    pool.submit("请求1")
+    pool.abandon(job_id)
+    assert future.cancelled()
+    assert pool.outstanding == 1
+    pool.submit("请求2")
+    graph.gate.set()
+    wait_for(lambda: pool.outstanding == 0)
+
+
+def test_jobs_past_the_job_timeout_fail_and_free_their_slot(make_pool, graph):
+    pool = make_pool(job_timeout=0.3)
+    _, future = pool.submit("请求0")
+    result = future.result(timeout=5)
+    assert result["status"] == "error"
+    assert "TimeoutError" in result["error"]
+    assert pool.outstanding == 0
+
+
+def test_drain_waits_for_accepted_jobs_and_rejects_new_ones(make_pool, graph, wait_for):
+    pool = make_pool()
+    _, future = pool.submit("请求0")
+    wait_for(lambda: graph.started)
+    drained = []
+    drainer = threading.Thread(target=lambda: drained.append(pool.drain(timeout=5)))
+    drainer.start()
+    wait_for(lambda: pool.draining)
+    with pytest.raises(DrainingError):
+        pool.submit("请求1")
+    assert not future.done()
+    graph.gate.set()
+    drainer.join(5)
+    assert drained == [True]
+    assert future.result(timeout=0)["status"] == "failed"
+    assert pool.workers_alive() == 0
+
+
+def test_drain_timeout_fails_unfinished_jobs(make_pool, graph, wait_for):
+    pool = make_pool()
+    _, future = pool.submit("请求0")
+    wait_for(lambda: graph.started)
+    # 工作线程在 drain 等待它退出时才放行
+    threading.Timer(0.5, graph.gate.set).start()
+    assert pool.drain(timeout=0.1) is False
+    with pytest.raises(DrainingError):
+        future.result(timeout=0)
+
+
+def test_http_timeout_abandons_the_job(graph):
+    from fastapi.testclient import TestClient
+
+    pool = WorkerPool(backend="inprocess", workers=1, concurrency=1, max_queue_depth=0)
+    with TestClient(serving.create_app(pool, request_timeout=0.2)) as client:
+        response = client.post("/itineraries", json={"request": "帮我预订机票"})
+        assert response.status_code == 504
+        # 超时的请求不再占用准入名额
+        assert pool.outstanding == 0
+        assert client.get("/healthz").json()["outstanding"] == 0
+        graph.gate.set()
+
+
+class SlowPublishTransport(serving.InProcessTransport):
+    """发布作业时阻塞，模拟 RabbitMQ 的同步发布"""
+
+    def send_job(self, job: dict):
+        time.sleep(0.5)
+        super().send_job(job)
+
+
+def test_blocking_publish_does_not_stall_other_requests(graph):
+    import asyncio
+
+    import httpx
+
+    graph.gate.set()
+    pool = WorkerPool(transport=SlowPublishTransport(), backend="inprocess", workers=1, concurrency=1).start()
+    app = serving.create_app(pool, request_timeout=5)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            started = time.monotonic()
+            submit = asyncio.ensure_future(client.post("/itineraries", json={"request": "帮我预订机票"}))
+            await asyncio.sleep(0.05)
+            health = await client.get("/healthz")
+            # 发布阻塞事件循环时，健康检查要等到发布结束才能返回
+            health_latency = time.monotonic() - started
+            return (await submit).status_code, health.status_code, health_latency
+
+    try:
+        submit_status, health_status, health_latency = asyncio.run(scenario())
+    finally:
+        pool.drain(timeout=2)
+    assert (submit_status, health_status) == (200, 200)
+    assert health_latency < 0.3
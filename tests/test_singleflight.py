@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/19 22:10
+# @Author  : 周启航-开发
+# @File    : test_singleflight.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from deadline import DeadlineExceeded, deadline_after, deadline_scope
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_computation(wait_for):
+    group = SingleFlight("test", enabled=True)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(2)
+        return "PEK"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(group.do, "PEK:WUH", compute) for _ in range(8)]
+        wait_for(lambda: group.stats()["followers"] == 7)
+        release.set()
+        assert [future.result() for future in futures] == ["PEK"] * 8
+    assert len(calls) == 1
+    assert group.stats()["in_flight"] == 0
+
+
+def test_different_keys_are_computed_separately():
+    group = SingleFlight("test", enabled=True)
+    assert group.do("a", lambda: 1) == 1
+    assert group.do("b", lambda: 2) == 2
+    assert group.stats()["leaders"] == 2
+
+
+def test_finished_keys_are_recomputed():
+    group = SingleFlight("test", enabled=True)
+    values = iter([1, 2])
+    assert group.do("k", lambda: next(values)) == 1
+    assert group.do("k", lambda: next(values)) == 2
+
+
+def test_errors_are_shared_and_not_remembered(wait_for):
+    group = SingleFlight("test", enabled=True)
+    release = threading.Event()
+
+    def fail():
+        release.wait(2)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(group.do, "k", fail) for _ in range(3)]
+        wait_for(lambda: group.stats()["followers"] == 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError, match="upstream down"):
+                future.result()
+    assert group.do("k", lambda: "ok") == "ok"
+
+
+def test_disabled_group_computes_for_every_caller():
+    group = SingleFlight("test", enabled=False)
+    calls = []
+    for _ in range(3):
+        group.do("k", lambda: calls.append(1))
+    assert len(calls) == 3
+
+
+def test_follower_recomputes_when_leader_runs_out_of_its_own_budget(wait_for):
+    group = SingleFlight("test", enabled=True)
+    follower_joined = threading.Event()
+
+    def leader_compute():
+        follower_joined.wait(2)
+        raise DeadlineExceeded("flight_api")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(group.do, "k", leader_compute)
+        wait_for(lambda: group.stats()["in_flight"] == 1)
+        follower = executor.submit(group.do, "k", lambda: "PEK")
+        wait_for(lambda: group.stats()["followers"] == 1)
+        follower_joined.set()
+        with pytest.raises(DeadlineExceeded):
+            leader.result()
+        # 跟随者没有截止时间，不共享发起者的超时，而是自己重新计算
+        assert follower.result() == "PEK"
+
+
+def test_follower_stops_waiting_at_its_deadline(wait_for):
+    group = SingleFlight("test", enabled=True)
+    release = threading.Event()
+
+    def slow():
+        release.wait(2)
+        return "late"
+
+    def follower():
+        with deadline_scope(deadline_after(0.4)):
+            return group.do("k", slow)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(group.do, "k", slow)
+        wait_for(lambda: group.stats()["in_flight"] == 1)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            executor.submit(follower).result()
+        assert time.monotonic() - started < 1.0
+        release.set()
+        assert leader.result() == "late"
+
+
+def test_async_callers_share_one_task():
+    group = SingleFlight("test", enabled=True)
+    calls = []
+
+    async def acompute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "PEK"
+
+    async def scenario():
+        return await asyncio.gather(*(group.ado("k", acompute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["PEK"] * 5
+    assert len(calls) == 1
+
+
+def test_cancelled_leader_does_not_cancel_other_waiters():
+    group = SingleFlight("test", enabled=True)
+
+    async def acompute():
+        await asyncio.sleep(0.05)
+        return "PEK"
+
+    async def scenario():
+        leader = asyncio.ensure_future(group.ado("k", acompute))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(group.ado("k", acompute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return leader, await follower
+
+    leader, result = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert result == "PEK"
+
+
+def test_computation_is_cancelled_when_every_waiter_leaves():
+    group = SingleFlight("test", enabled=True)
+
+    async def scenario():
+        stopped = asyncio.Event()
+
+        async def acompute():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        waiters = [asyncio.ensure_future(group.ado("k", acompute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.wait_for(stopped.wait(), 1)
+        # 键已移除，新的调用方重新计算而不是拿到取消异常
+        return await group.ado("k", _value("fresh"))
+
+    assert asyncio.run(scenario()) == "fresh"
+
+
+def _value(value):
+    async def acompute():
+        return value
+    return acompute
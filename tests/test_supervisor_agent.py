@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/20 14:20
+# @Author  : 周启航-开发
+# @File    : test_supervisor_agent.py
+from datetime import datetime, timedelta
+
+import pytest
+
+import supervisor_agent
+import utils
+from scheduler import TaskFailure
+
+
+class IdentityNormalizer:
+    """参数已是规范格式，原样返回，不调用大模型"""
+
+    def normalize(self, dates=(), cities=()):
+        return {"dates": {date: date for date in dates}, "cities": {city: city for city in cities}}
+
+
+@pytest.fixture
+def flight_api(monkeypatch):
+    """替换航班接口：每个日期都返回同一批航班，记录查询过的日期"""
+    queried = []
+
+    def fetch(home_code, destination_code, date):
+        queried.append(date)
+        return {"result": {"flightInfo": [
+            {"flightNo": "CA8216", "airline": "CA", "price": 1280, "duration": "02h10m", "departureTime": "08:00"},
+            {"flightNo": "MU5120", "airline": "MU", "price": 1460, "duration": "02h05m", "departureTime": "19:30"},
+        ]}}
+
+    monkeypatch.setattr(utils, "_normalizer", IdentityNormalizer())
+    monkeypatch.setattr(utils, "_fetch_flight_data", fetch)
+    monkeypatch.setattr(supervisor_agent, "_task_store", None)
+    return queried
+
+
+def _flight_task(**parameters) -> dict:
+    date = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d")
+    return {"id": "task_1", "tool_needed": "search_flights",
+            "parameters": {"home": "PEK", "destination": "WUH", "date": date, **parameters}}
+
+
+def test_flex_search_without_a_viable_day_fails_the_task(flight_api):
+    task = _flight_task(max_price=1000, flex_days=2)
+    with pytest.raises(TaskFailure) as failure:
+        supervisor_agent._run_plan_task(task)
+    assert len(flight_api) == 5
+    assert failure.value.task_id == "task_1"
+    assert "期间均未查询到符合条件的航班" in failure.value.message
+
+
+def test_flex_search_returns_the_cheapest_day(flight_api):
+    result = supervisor_agent._run_plan_task(_flight_task(max_price=1300, flex_days=1))
+    assert result["flightNo"] == "CA8216"
+    assert sorted(result["price_calendar"].values()) == [1280] * 3
+
+
+def test_stored_task_results_are_reused_after_a_restart(flight_api, tmp_path, monkeypatch):
+    from checkpointing import SqliteTaskResultStore
+
+    path = tmp_path / "checkpoints.sqlite"
+    monkeypatch.setattr(supervisor_agent, "_task_store", SqliteTaskResultStore(path))
+    task = _flight_task()
+    first = supervisor_agent._run_plan_task(task)
+    supervisor_agent._task_store.close()
+
+    monkeypatch.setattr(supervisor_agent, "_task_store", SqliteTaskResultStore(path))
+    assert supervisor_agent._run_plan_task(task) == first
+    # 重启后参数相同的任务直接使用保存的结果，不再请求航班接口
+    assert len(flight_api) == 1
+    supervisor_agent._task_store.close()
@@ -3,31 +3,61 @@
 # @Time    : 2025/10/14 13:30
 # @Author  : 周启航-开发
 # @File    : utils.py
+import asyncio
+import contextvars
 import json
 import os
-import platform
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
-from datetime import datetime
-from typing_extensions import Annotated, List, Literal
-from langchain_openai import ChatOpenAI
-from langchain.chat_models import init_chat_model
+from datetime import datetime, timedelta
+from typing_extensions import Annotated, Dict, List, Literal, Optional
 from langchain_core.messages import HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool, InjectedToolArg
-from dotenv import load_dotenv
-import requests
-
-load_dotenv()
-api_key = os.getenv("SILICON_API_KEY")
-base_url = os.getenv("SILICON_BASE_URL")
-model = ChatOpenAI(
-    model="deepseek-ai/DeepSeek-V3",
-    temperature=0.7,
-    api_key=api_key,
-    base_url=base_url,
-)
+
+from providers import load_env, get_chat_model, registry
+
+# 下面的模块在导入时读取环境变量，需要先加载 .env
+load_env()
+
+from normalization import QueryNormalizer  # noqa: E402
+from cache import build_flight_cache, flight_cache_key  # noqa: E402
+from http_client import get_flight_client  # noqa: E402
+from instrumentation import span, record_llm_usage  # noqa: E402
+from flight_offers import FlightOffers, FLIGHT_TOP_K  # noqa: E402
+from singleflight import SingleFlight  # noqa: E402
+from deadline import DeadlineExceeded, expired, remaining  # noqa: E402
+from structured_logging import LOG_PAYLOAD_SAMPLE_RATE, get_logger  # noqa: E402
+from hotel_inventory import (CallableHotelProvider, FallbackHotelProvider,  # noqa: E402
+                             LocalInventoryProvider, get_hotel_inventory)
+
+log = get_logger(__name__)
+
 flight_api_key=os.getenv("FLIGHT_API_KEY")
 flight_api_url=os.getenv("FLIGHT_API_URL")
+# 本地酒店库存中查不到时是否回退到大模型生成酒店清单
+HOTEL_LLM_FALLBACK = os.getenv("HOTEL_LLM_FALLBACK", "true").lower() == "true"
+# 日期和城市名的规范化，本地规则优先，剩余条目跨请求批量交给大模型
+_normalizer = QueryNormalizer(get_chat_model)
+# 航班查询结果缓存，按IATA代码和日期索引
+_flight_cache = build_flight_cache()
+# 相同航线和日期、相同城市和入住日期的并发查询只访问一次上游
+_flight_calls = SingleFlight("flight_api")
+_hotel_calls = SingleFlight("hotel_search")
+# 灵活日期查询：前后最多查询的天数，以及同步路径中并发查询各天航班的线程数
+FLIGHT_FLEX_MAX_DAYS = int(os.getenv("FLIGHT_FLEX_MAX_DAYS", "7"))
+_flex_executor = ThreadPoolExecutor(max_workers=int(os.getenv("FLIGHT_FLEX_MAX_PARALLELISM", "8")),
+                                    thread_name_prefix="flex-date")
+
+
+def flight_cache_stats() -> dict:
+    """返回航班缓存的命中/未命中计数"""
+    return _flight_cache.stats()
+
+
+def singleflight_stats() -> dict:
+    """返回各个 single-flight 分组的合并统计"""
+    return {group.name: group.stats() for group in (_flight_calls, _hotel_calls, _normalizer.inflight)}
 
 
 @tool(parse_docstring=True)
@@ -38,11 +68,9 @@ def get_today_str() -> str:
     Returns:
         当前日期时间字符串
     """
-    if platform.system() == "Windows":
-        print(datetime.now().strftime("%Y-%m-%d"))
-        return datetime.now().strftime("%Y-%m-%d")
-    else:
-        return datetime.now().strftime("%Y-%m-%d")
+    today = datetime.now().strftime("%Y-%m-%d")
+    log.debug("当前日期", today=today)
+    return today
 
 def parse_relative_date(date_description: str) -> str:
     """
@@ -54,38 +82,8 @@ def parse_relative_date(date_description: str) -> str:
     Returns:
         标准日期格式 YYYY-MM-DD
     """
-    from datetime import datetime
-
-    # 获取当前日期作为参考
-    current_date = datetime.now()
-
-    prompt = f"""
-    请将以下相对时间描述转换为标准的YYYY-MM-DD日期格式：
-
-    当前日期：{current_date.strftime('%Y-%m-%d')}
-    相对时间描述：{date_description}
-
-    要求：
-    1. 只返回转换后的日期，格式为YYYY-MM-DD
-    2. 不要添加任何解释性文字
-    3. 确保日期格式正确
-    4. 年份以当前日期描述为准
-
-    示例：
-    下周一 -> 2025-10-20
-    十月二十号 -> 2025-10-20
-    明天 -> 2025-10-15
-    """
-
-    try:
-        response = model.invoke([HumanMessage(content=prompt)])
-        parsed_date = response.content.strip()
-        # 验证日期格式
-        datetime.strptime(parsed_date, '%Y-%m-%d')
-        return parsed_date
-    except Exception:
-        # 如果解析失败，返回原始字符串
-        return date_description
+    # 本地规则无法识别时，与其他待规范化条目合并为一次大模型调用
+    return _normalizer.normalize(dates=[date_description])["dates"][date_description]
 
 
 # RESEARCH TOOLS
@@ -117,119 +115,243 @@ def think_tool(reflection: str) -> str:
     return f"Reflection recorded: {reflection}"
 
 def _convert_city_to_iata(city_name: str) -> str:
-    """使用大模型将城市名转换为IATA代码"""
-    prompt = f"""
-    请将以下城市名称转换为对应的IATA机场代码：
-
-    城市：{city_name}
-
-    要求：
-    1. 只返回该城市最主要的机场IATA代码
-    2. 不要添加任何解释性文字
-    3. 只返回3个字母的IATA代码
-    4. 如果不确定，请返回该国家/地区的常用国际机场代码
-
-    示例：
-    北京 -> PEK
-    上海 -> PVG
-    长沙 -> CSX
-    """
+    """将城市名转换为IATA代码，优先查本地机场索引，未收录的城市再使用大模型转换"""
+    return _normalizer.normalize(cities=[city_name])["cities"][city_name]
 
-    try:
-        response = model.invoke([HumanMessage(content=prompt)])
-        iata_code = response.content.strip().upper()
-        # 验证是否为有效的3字母代码
-        if len(iata_code) == 3 and iata_code.isalpha():
-            return iata_code
-        return city_name  # 如果转换失败，返回原始城市名
-    except Exception:
-        return city_name  # 出错时返回原始城市名
-@tool(parse_docstring=True)
-def search_flights(home:str,destination: str, date: str) -> dict:
-    """
-    查询指定日期飞往某地的航班信息。返回一个包含航班号和价格的字典，如果无航班则返回None。
 
-    Args:
-        home: 出发地
-        destination: 目的地
-        date: 出发日期 (YYYY-MM-DD格式)
+def _query_flight_api(home: str, destination: str, date: str) -> dict:
+    """请求航班接口并返回解析后的响应数据，HTTP错误时抛出异常"""
+    # # 接口请求入参配置
+    requestParams = {
+        'key': flight_api_key,
+        'departure': home,
+        'arrival': destination,
+        'departureDate': date,
+    }
+    # 通过共享连接池发起请求，超时和临时故障会按退避策略重试
+    return get_flight_client().get_json(flight_api_url, params=requestParams)
 
-    Returns:
-        航班信息字典或None
-    """
-    date=parse_relative_date(date)
-    print(f"正在查询 {date} 前往 {destination} 的航班...")
-    # 将城市名转换为IATA代码的提示
-    # 转换城市名为IATA代码
-    home= _convert_city_to_iata(home)
-    destination = _convert_city_to_iata(destination)
 
-    # # 接口请求入参配置
+async def _aquery_flight_api(home: str, destination: str, date: str) -> dict:
+    """_query_flight_api 的异步版本，与同步版本共享连接池配置"""
     requestParams = {
         'key': flight_api_key,
         'departure': home,
         'arrival': destination,
         'departureDate': date,
     }
-    try:
-        # 发起接口网络请求
-        response = requests.get(flight_api_url, params=requestParams)
-        response.raise_for_status()  # 检查HTTP错误
-
-        # 解析响应数据
-        data = response.json()
-        if not data['result']:  # 假设查询条件
-            # 直接返回错误信息而不是 None
+    return await get_flight_client().aget_json(flight_api_url, params=requestParams)
+
+
+def _flight_from_response(data: dict, date: str, destination: str, top_k: int = FLIGHT_TOP_K, **filters):
+    """
+    将航班接口响应映射为航班信息字典
+
+    全部报价转为列式存储后过滤并按综合评分排序，最优航班的字段放在顶层（与原先的单航班结构一致），
+    前 top_k 个航班放在 offers 中。
+    """
+    if not data['result']:  # 假设查询条件
+        # 直接返回错误信息而不是 None
+        return {
+            "error": True,
+            "message": f"抱歉，未能查询到 {date} 前往 {destination} 的航班，请您更换日期后重试"
+        }
+    # 根据API实际响应结构调整返回值
+    # 修改后的代码
+    if data and 'result' in data and 'flightInfo' in data['result']:
+        flight_info_list = data['result']['flightInfo']
+        if not flight_info_list:
             return {
                 "error": True,
-                "message": f"抱歉，未能查询到 {date} 前往 {destination} 的航班，请您更换日期后重试"
+                "message": f"未能查询到 {date} 前往 {destination} 的航班"
             }
-        # 根据API实际响应结构调整返回值
-        # 修改后的代码
-        if data and 'result' in data and 'flightInfo' in data['result']:
-            flight_info_list = data['result']['flightInfo']
-            if not flight_info_list:
-                return {
-                    "error": True,
-                    "message": f"未能查询到 {date} 前往 {destination} 的航班"
-                }
-
-            # 获取第一个航班信息
-            first_flight = flight_info_list[0]
-            print(f"已找到以下航班: {first_flight}")
-            # 正确映射字段
+
+        offers = FlightOffers(flight_info_list).top_k(top_k, **filters)
+        if not offers:
             return {
-                "flightNo": first_flight.get("flightNo", "") or first_flight.get("airline") + first_flight.get(
-                    "flightNumber", ""),
-                "arrivalName": first_flight.get("arrivalName", ""),
-                "price": first_flight.get("price", 0) or first_flight.get("ticketPrice", 0),
-                "duration": first_flight.get("duration", ""),
-                "departureName": first_flight.get("departureName", ""),
-                "departureDate": first_flight.get("departureDate", ""),
-                "departureTime": first_flight.get("departureTime", ""),
-                "airlineName": first_flight.get("airlineName", ""),
-                "arrivalDate": first_flight.get("arrivalDate", "")
+                "error": True,
+                "message": f"{date} 前往 {destination} 的 {len(flight_info_list)} 个航班均不符合筛选条件"
             }
+        log.debug("已找到航班", date=date, destination=destination, offer_count=len(flight_info_list),
+                  flight=offers[0], sample_rate=LOG_PAYLOAD_SAMPLE_RATE)
+        return {**offers[0], "offers": offers, "offer_count": len(flight_info_list)}
+    return None
+
+
+def _fetch_flight_data(home_code: str, destination_code: str, date: str) -> dict:
+    """读取航班接口响应：相同航线和日期走缓存，请求失败时不写入缓存；未命中时并发的相同查询只请求一次接口"""
+    key = flight_cache_key(home_code, destination_code, date)
+    return _flight_cache.get_or_compute(
+        key, lambda: _flight_calls.do(key, lambda: _query_flight_api(home_code, destination_code, date)))
+
 
+async def _afetch_flight_data(home_code: str, destination_code: str, date: str) -> dict:
+    key = flight_cache_key(home_code, destination_code, date)
+    return await _flight_cache.aget_or_compute(
+        key, lambda: _flight_calls.ado(key, lambda: _aquery_flight_api(home_code, destination_code, date)))
+
+
+def _search_day(home_code: str, destination_code: str, date: str, ranking: dict) -> Optional[dict]:
+    """查询并排序一天的航班，请求出错时返回 None；时间预算用完时抛出 DeadlineExceeded"""
+    try:
+        return _flight_from_response(_fetch_flight_data(home_code, destination_code, date), date, destination_code,
+                                     **ranking)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"查询航班时发生错误: {e}")
+        log.warning("查询航班时发生错误", date=date, error=str(e))
     return None
 
+
+async def _asearch_day(home_code: str, destination_code: str, date: str, ranking: dict) -> Optional[dict]:
+    try:
+        return _flight_from_response(await _afetch_flight_data(home_code, destination_code, date), date,
+                                     destination_code, **ranking)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        log.warning("查询航班时发生错误", date=date, error=str(e))
+    return None
+
+
+def _flex_window(date: str, flex_days: int) -> List[str]:
+    """
+    灵活日期的查询窗口：date 前后 flex_days 天（上限 FLIGHT_FLEX_MAX_DAYS），跳过今天之前的日期
+
+    Returns:
+        按与 date 的距离由近到远排列的日期列表；date 不是 YYYY-MM-DD 时返回空列表
+    """
+    try:
+        center = datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        return []
+    days = max(0, min(int(flex_days or 0), FLIGHT_FLEX_MAX_DAYS))
+    today = datetime.now().date()
+    offsets = sorted(range(-days, days + 1), key=lambda offset: (abs(offset), offset))
+    window = [center + timedelta(days=offset) for offset in offsets]
+    return [day.isoformat() for day in window if day >= today]
+
+
+def _is_viable(result: Optional[dict]) -> bool:
+    return bool(result) and not result.get("error") and result.get("price") not in (None, "")
+
+
+def _merge_flex_results(date: str, results: Dict[str, Optional[dict]], timed_out: bool = False) -> Optional[dict]:
+    """
+    合并窗口内各天的查询结果
+
+    每天取综合评分最优的航班，在这些航班中选票价最低的一天（票价相同时选离原定日期近的），
+    顶层字段与单日查询一致，另附按日期排列的价格日历（无航班或未查完的日期为 null）。
+
+    Raises:
+        DeadlineExceeded: timed_out 为真（时间预算用完时仍有日期未查完）且已查完的日期都没有航班
+    """
+    calendar = {day: results[day]["price"] if _is_viable(results[day]) else None for day in sorted(results)}
+    viable = [day for day in results if _is_viable(results[day])]
+    if not viable and timed_out:
+        raise DeadlineExceeded("search_flights")
+    if not viable:
+        days = sorted(results)
+        return {
+            "error": True,
+            "message": f"抱歉，{days[0]} 至 {days[-1]} 期间均未查询到符合条件的航班，请您更换日期后重试",
+            "price_calendar": calendar,
+        }
+    center = datetime.strptime(date, "%Y-%m-%d")
+    best_day = min(viable, key=lambda day: (float(results[day]["price"]),
+                                            abs((datetime.strptime(day, "%Y-%m-%d") - center).days)))
+    if best_day != date:
+        log.info("灵活日期：其他日期票价更低", best_day=best_day, requested_date=date)
+    if timed_out:
+        log.info("灵活日期：时间预算用完，只比较了已查完的日期", days=len(viable))
+    return {**results[best_day], "requested_date": date, "price_calendar": calendar}
+
+
+def _ranking_options(max_price, earliest_departure, latest_departure, preferred_airline, top_k) -> dict:
+    return {
+        "top_k": top_k or FLIGHT_TOP_K,
+        "max_price": max_price,
+        "earliest_departure": earliest_departure or None,
+        "latest_departure": latest_departure or None,
+        "preferred_airlines": [preferred_airline] if preferred_airline else None,
+    }
+
+
 @tool(parse_docstring=True)
-def search_hotels_with_llm(destination: str, check_in_date: str, check_out_date: str) -> List[dict]:
+def search_flights(home:str,destination: str, date: str, max_price: Optional[float] = None,
+                   earliest_departure: str = "", latest_departure: str = "", preferred_airline: str = "",
+                   top_k: int = FLIGHT_TOP_K, flex_days: int = 0) -> dict:
     """
-        根据地点和日期查询酒店。返回酒店列表，如果无酒店则返回空列表。
+    查询指定日期飞往某地的航班信息。返回综合评分最优的航班（含航班号和价格），offers 中为前 top_k 个航班，如果无航班则返回None。
+    flex_days 大于 0 时同时查询前后 flex_days 天，返回票价最低那天的航班，并附带每天的价格日历。
 
-        Args:
-            destination: 目的地城市
-            check_in_date: 入住日期 (YYYY-MM-DD格式)
-            check_out_date: 退房日期 (YYYY-MM-DD格式)
+    Args:
+        home: 出发地
+        destination: 目的地
+        date: 出发日期 (YYYY-MM-DD格式)
+        max_price: 最高票价，不限制时留空
+        earliest_departure: 最早起飞时刻 (HH:MM)，不限制时留空
+        latest_departure: 最晚起飞时刻 (HH:MM)，不限制时留空
+        preferred_airline: 偏好航司的两字代码，如 CA
+        top_k: 返回的候选航班数
+        flex_days: 日期可前后浮动的天数，0 表示只查询指定日期
 
-        Returns:
-            酒店信息列表，每个元素包含酒店名称和每晚价格
+    Returns:
+        航班信息字典或None
     """
-    check_in_date = parse_relative_date(check_in_date)
-    prompt = f"""
+    # 日期和出发/到达城市一起规范化，本地无法解析的条目只需一次大模型调用
+    normalized = _normalizer.normalize(dates=[date], cities=[home, destination])
+    date = normalized["dates"][date]
+    log.debug("正在查询航班", date=date, destination=destination)
+    # 转换城市名为IATA代码
+    home_code = normalized["cities"][home]
+    destination_code = normalized["cities"][destination]
+    ranking = _ranking_options(max_price, earliest_departure, latest_departure, preferred_airline, top_k)
+
+    window = _flex_window(date, flex_days) if flex_days else []
+    if len(window) > 1:
+        # 日期和城市只规范化一次，窗口内各天并发查询；时间预算用完时只用已查完的日期
+        futures = {day: _flex_executor.submit(contextvars.copy_context().run, _search_day, home_code, destination_code,
+                                              day, ranking) for day in window}
+        done, not_done = wait(futures.values(), timeout=remaining())
+        for future in not_done:
+            future.cancel()
+        results = {day: future.result() if future in done and future.exception() is None else None
+                   for day, future in futures.items()}
+        return _merge_flex_results(date, results, timed_out=bool(not_done) or expired())
+    return _search_day(home_code, destination_code, date, ranking)
+
+
+async def _asearch_flights(home: str, destination: str, date: str, max_price: Optional[float] = None,
+                           earliest_departure: str = "", latest_departure: str = "", preferred_airline: str = "",
+                           top_k: int = FLIGHT_TOP_K, flex_days: int = 0) -> dict:
+    """search_flights 的异步实现，供 ainvoke 使用"""
+    normalized = await _normalizer.anormalize(dates=[date], cities=[home, destination])
+    date = normalized["dates"][date]
+    log.debug("正在查询航班", date=date, destination=destination)
+    home_code = normalized["cities"][home]
+    destination_code = normalized["cities"][destination]
+    ranking = _ranking_options(max_price, earliest_departure, latest_departure, preferred_airline, top_k)
+
+    window = _flex_window(date, flex_days) if flex_days else []
+    if len(window) > 1:
+        tasks = {day: asyncio.ensure_future(_asearch_day(home_code, destination_code, day, ranking)) for day in window}
+        try:
+            done, not_done = await asyncio.wait(tasks.values(), timeout=remaining())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        results = {day: task.result() if task in done and task.exception() is None else None
+                   for day, task in tasks.items()}
+        return _merge_flex_results(date, results, timed_out=bool(not_done) or expired())
+    return await _asearch_day(home_code, destination_code, date, ranking)
+
+
+search_flights.coroutine = _asearch_flights
+
+
+def _hotel_prompt(destination: str, check_in_date: str, check_out_date: str) -> str:
+    return f"""
     请提供位于{destination}在{check_in_date}至{check_out_date}期间可用的酒店清单,并从中选择一个处于中间价位的。
     每个条目需包含以下信息:
     - 酒店名称 (name)
@@ -243,14 +365,91 @@ def search_hotels_with_llm(destination: str, check_in_date: str, check_out_date:
     [ {{"name": "酒店A", "price_per_night": 价格}}, {{"name": "酒店B", "price_per_night": 价格}} ]
     请直接返回JSON数组，不要添加任何其他内容: 
     """
-    response = model.invoke([HumanMessage(content=prompt)])
+
+
+def _parse_hotels(content: str) -> List[dict]:
     try:
-        hotels = json.loads(response.content)
-        print(f"已找到以下酒店: {hotels}")
+        hotels = json.loads(content)
+        log.debug("已找到酒店", hotels=hotels, sample_rate=LOG_PAYLOAD_SAMPLE_RATE)
         return hotels
     except Exception as e:
-        print(f"解析LLM响应出错: {e}")
+        log.warning("解析LLM响应出错", error=str(e))
         return []
 
 
+def _llm_hotel_search(destination: str, check_in_date: str, check_out_date: str) -> List[dict]:
+    """让大模型生成酒店清单，作为本地库存查不到时的兜底"""
+    with span("hotel_search", kind="llm") as record:
+        response = get_chat_model().invoke([HumanMessage(content=_hotel_prompt(destination, check_in_date,
+                                                                              check_out_date))])
+        record_llm_usage(record, response, "hotel_search")
+    return _parse_hotels(response.content)
+
+
+async def _allm_hotel_search(destination: str, check_in_date: str, check_out_date: str) -> List[dict]:
+    with span("hotel_search", kind="llm") as record:
+        response = await get_chat_model().ainvoke([HumanMessage(content=_hotel_prompt(destination, check_in_date,
+                                                                                       check_out_date))])
+        record_llm_usage(record, response, "hotel_search")
+    return _parse_hotels(response.content)
+
+
+def _build_hotel_provider():
+    providers = [LocalInventoryProvider(get_hotel_inventory())]
+    if HOTEL_LLM_FALLBACK:
+        providers.append(CallableHotelProvider("llm", _llm_hotel_search, _allm_hotel_search))
+    return FallbackHotelProvider(providers)
+
+
+# 酒店查询提供者：本地库存优先，大模型兜底；测试时可通过 registry.override 替换
+registry.register("hotel_provider", _build_hotel_provider)
+
+
+@tool(parse_docstring=True)
+def search_hotels_with_llm(destination: str, check_in_date: str, check_out_date: str) -> List[dict]:
+    """
+        根据地点和日期查询酒店。返回酒店列表，如果无酒店则返回空列表。
+
+        Args:
+            destination: 目的地城市
+            check_in_date: 入住日期 (YYYY-MM-DD格式)
+            check_out_date: 退房日期 (YYYY-MM-DD格式)
+
+        Returns:
+            酒店信息列表，每个元素包含酒店名称和每晚价格，第一个为中间价位的酒店
+    """
+    # 入住和退房日期一起规范化，本地无法解析的条目只需一次大模型调用
+    normalized = _normalizer.normalize(dates=[check_in_date, check_out_date])
+    check_in_date, check_out_date = _stay_dates(normalized, check_in_date, check_out_date)
+    return _hotel_calls.do((destination.strip(), check_in_date, check_out_date),
+                           lambda: registry.get("hotel_provider").search(destination, check_in_date, check_out_date))
+
+
+async def _asearch_hotels_with_llm(destination: str, check_in_date: str, check_out_date: str) -> List[dict]:
+    """search_hotels_with_llm 的异步实现，供 ainvoke 使用"""
+    normalized = await _normalizer.anormalize(dates=[check_in_date, check_out_date])
+    check_in_date, check_out_date = _stay_dates(normalized, check_in_date, check_out_date)
+    return await _hotel_calls.ado(
+        (destination.strip(), check_in_date, check_out_date),
+        lambda: registry.get("hotel_provider").asearch(destination, check_in_date, check_out_date))
+
+
+def _stay_dates(normalized: dict, check_in_date: str, check_out_date: str) -> tuple:
+    """
+    取出规范化后的入住和退房日期并校验
+
+    Raises:
+        ValueError: 日期不是 YYYY-MM-DD 格式，或退房日期不晚于入住日期
+    """
+    check_in = normalized["dates"][check_in_date]
+    check_out = normalized["dates"][check_out_date]
+    try:
+        nights = (datetime.strptime(check_out, "%Y-%m-%d") - datetime.strptime(check_in, "%Y-%m-%d")).days
+    except ValueError:
+        raise ValueError(f"无法识别的入住或退房日期: {check_in_date} / {check_out_date}") from None
+    if nights <= 0:
+        raise ValueError(f"退房日期 {check_out} 必须晚于入住日期 {check_in}")
+    return check_in, check_out
+
 
+search_hotels_with_llm.coroutine = _asearch_hotels_with_llm